@@ -0,0 +1,4 @@
+"""
+Benchmarks
+Standalone performance scripts that run the application against local stand-ins
+"""
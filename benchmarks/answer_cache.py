@@ -0,0 +1,115 @@
+"""
+Benchmarks - Semantic Answer Cache
+Latency and LLM cost of a workload of paraphrased FAQ questions, with the
+answer cache disabled and enabled.
+
+Usage:
+    python -m benchmarks.answer_cache [--requests 500] [--faqs 20]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import get_settings
+
+# Paraphrases only add filler words, so they stay close in the stub embedding space
+FILLERS = ["", "please", "hi", "hello please", "thanks"]
+
+
+def build_workload(args: argparse.Namespace) -> list[tuple[str, str]]:
+    """(project, question) pairs: a few popular questions asked in many ways"""
+    rng = random.Random(args.seed)
+    questions = [
+        f"how do I reset the password of the module {i} in the portal" for i in range(args.faqs)
+    ]
+    workload = []
+    for _ in range(args.requests):
+        question = rng.choice(questions)
+        filler = rng.choice(FILLERS)
+        project = rng.choice(args.projects)
+        workload.append((project, f"{filler} {question}".strip()))
+    return workload
+
+
+async def run(enabled: bool, args: argparse.Namespace) -> dict:
+    settings = get_settings()
+    settings.answer_cache_enabled = enabled
+    settings.answer_cache_threshold = args.threshold
+
+    llm = StubLLM(latency=args.llm_latency, tokens=args.tokens)
+    vector_store = StubVectorStore(latency=args.search_latency)
+    graph = ConversationGraph(vector_store=vector_store, llm=llm)  # type: ignore[arg-type]
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+
+    async def one(ticket: int, project: str, question: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await use_case.execute(
+                helpdesk_id=ticket,
+                project_name=project,
+                messages=[{"role": "USER", "content": question}],
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(one(i, project, q) for i, (project, q) in enumerate(build_workload(args)))
+    )
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "elapsed": elapsed,
+        "llm_calls": llm.calls,
+        "search_calls": vector_store.calls,
+        "hit_rate": graph.stats()["answer_cache"].get("hit_rate", 0.0),
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    # Per-call cost of a RAG completion: prompt with the retrieved context plus the answer
+    cost_per_call = (
+        args.prompt_tokens * args.input_price + args.tokens * args.output_price
+    ) / 1_000_000
+    print(
+        f"{'cache':<6} {'p50 ms':>8} {'p95 ms':>8} {'total s':>8} "
+        f"{'llm calls':>10} {'searches':>9} {'hit rate':>9} {'est. cost $':>12}"
+    )
+    for enabled in (False, True):
+        r = await run(enabled, args)
+        print(
+            f"{'on' if enabled else 'off':<6} {r['p50']:>8.1f} {r['p95']:>8.1f} "
+            f"{r['elapsed']:>8.2f} {r['llm_calls']:>10} {r['search_calls']:>9} "
+            f"{r['hit_rate']:>9.1%} {r['llm_calls'] * cost_per_call:>12.4f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--faqs", type=int, default=20)
+    parser.add_argument("--projects", nargs="+", default=["alpha", "beta"])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--tokens", type=int, default=150)
+    parser.add_argument("--prompt-tokens", type=int, default=2500)
+    parser.add_argument("--input-price", type=float, default=30.0, help="$ per 1M tokens")
+    parser.add_argument("--output-price", type=float, default=60.0, help="$ per 1M tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
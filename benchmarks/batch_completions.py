@@ -0,0 +1,117 @@
+"""
+Benchmarks - Batch Completions
+A backfill of historical tickets sent one /conversations/completions call at
+a time, as today, against a single /conversations/completions:batch call:
+total time, throughput and time to the first result.
+
+Usage:
+    python -m benchmarks.batch_completions [--conversations 1000]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+import main
+from src.application import ConversationGraph
+from src.infrastructure import get_settings
+
+
+def conversation(helpdesk_id: int) -> dict:
+    return {
+        "helpdeskId": helpdesk_id,
+        "projectName": "benchmark",
+        "messages": [
+            {"role": "USER", "content": f"My order {helpdesk_id} arrived damaged"},
+            {"role": "AGENT", "content": "Sorry to hear that! Which item was damaged?"},
+            {"role": "USER", "content": f"The charger of order {helpdesk_id}"},
+        ],
+    }
+
+
+async def one_by_one(client: httpx.AsyncClient, args: argparse.Namespace) -> tuple[float, int]:
+    started = time.perf_counter()
+    first = 0.0
+    for helpdesk_id in range(1, args.conversations + 1):
+        response = await client.post("/conversations/completions", json=conversation(helpdesk_id))
+        response.raise_for_status()
+        first = first or time.perf_counter() - started
+    return first, args.conversations
+
+
+async def batch(client: httpx.AsyncClient, args: argparse.Namespace) -> tuple[float, int]:
+    offset = args.conversations
+    started = time.perf_counter()
+    first = 0.0
+    results = 0
+    payload = {
+        "conversations": [conversation(offset + i) for i in range(1, args.conversations + 1)]
+    }
+    async with client.stream(
+        "POST", "/conversations/completions:batch", json=payload
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line:
+                assert json.loads(line)["response"] is not None, line
+                first = first or time.perf_counter() - started
+                results += 1
+    return first, results
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    get_settings().batch_concurrency = args.concurrency
+    vector_store = StubVectorStore(latency=args.search_latency)
+    main.conversation_graph = ConversationGraph(
+        vector_store=vector_store,  # type: ignore[arg-type]
+        llm=StubLLM(latency=args.llm_latency, tokens=args.tokens),  # type: ignore[arg-type]
+    )
+    # A real server is needed: the in-memory ASGI transport buffers whole bodies
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, port=args.port, log_level="warning", lifespan="off")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}", timeout=None
+        ) as client:
+            print(
+                f"{'mode':<12} {'conversations':>13} {'total s':>8} "
+                f"{'conv/s':>7} {'first ms':>9}"
+            )
+            for label, run in (("one by one", one_by_one), ("batch", batch)):
+                started = time.perf_counter()
+                first, results = await run(client, args)
+                total = time.perf_counter() - started
+                print(
+                    f"{label:<12} {results:>13} {total:>8.2f} "
+                    f"{results / total:>7.1f} {first * 1000:>9.1f}"
+                )
+        print(f"batched query embedding calls: {vector_store.embedding_calls}")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8769)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
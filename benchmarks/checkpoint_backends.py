@@ -0,0 +1,156 @@
+"""
+Benchmarks - Checkpoint Backends
+Measures checkpoint read/write latency per turn for each backend and checks
+that clarification/handover state stays correct when consecutive turns of a
+ticket are served by different workers.
+
+Every simulated worker is an independent ConversationGraph with its own
+checkpointer connection, exactly as separate uvicorn workers would have. The
+Redis backend uses REDIS_URL when set and an in-process fakeredis server
+otherwise.
+
+Usage:
+    python -m benchmarks.checkpoint_backends [--tickets 50] [--turns 4] [--workers 3]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from contextlib import AsyncExitStack
+from typing import Callable
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import RedisCheckpointSaver, create_checkpointer, get_settings
+
+
+class Timings:
+    """Collects checkpointer call latencies"""
+
+    def __init__(self):
+        self.reads: list[float] = []
+        self.writes: list[float] = []
+
+    def instrument(self, saver: BaseCheckpointSaver) -> None:
+        """Wraps the async read/write methods of a saver instance with timers"""
+        for name, bucket in (
+            ("aget_tuple", self.reads),
+            ("aput", self.writes),
+            ("aput_writes", self.writes),
+        ):
+            original = getattr(saver, name)
+
+            async def timed(*args, _original=original, _bucket=bucket, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await _original(*args, **kwargs)
+                finally:
+                    _bucket.append(time.perf_counter() - started)
+
+            setattr(saver, name, timed)
+
+
+def redis_factory() -> Callable[[], BaseCheckpointSaver]:
+    """Builds Redis savers sharing one server (real or fakeredis)"""
+    if url := os.environ.get("REDIS_URL"):
+        from redis.asyncio import Redis
+
+        return lambda: RedisCheckpointSaver(Redis.from_url(url), prefix="bench")
+
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    return lambda: RedisCheckpointSaver(fakeredis.FakeAsyncRedis(server=server))
+
+
+async def run_backend(backend: str, args: argparse.Namespace) -> None:
+    settings = get_settings().model_copy(
+        update={
+            "checkpoint_backend": backend,
+            "checkpoint_sqlite_path": os.path.join(args.tmpdir, "checkpoints.db"),
+        }
+    )
+    timings = Timings()
+    turn_latencies: list[float] = []
+
+    async with AsyncExitStack() as stack:
+        make_redis = redis_factory() if backend == "redis" else None
+        use_cases = []
+        for _ in range(args.workers):
+            if make_redis is not None:
+                checkpointer = make_redis()
+            else:
+                checkpointer = await stack.enter_async_context(
+                    create_checkpointer(settings)
+                )
+            timings.instrument(checkpointer)
+            graph = ConversationGraph(
+                vector_store=StubVectorStore(latency=0),  # type: ignore[arg-type]
+                llm=StubLLM(latency=0, tokens=5, clarify=True),  # type: ignore[arg-type]
+                checkpointer=checkpointer,
+            )
+            use_cases.append(ProcessConversationUseCase(conversation_graph=graph))
+
+        final = {}
+        for turn in range(args.turns):
+            for ticket in range(1, args.tickets + 1):
+                # Rotate workers so consecutive turns of a ticket never share one
+                use_case = use_cases[(ticket + turn) % args.workers]
+                started = time.perf_counter()
+                final[ticket] = await use_case.execute(
+                    helpdesk_id=ticket,
+                    project_name="benchmark",
+                    messages=[{"role": "USER", "content": f"turn {turn}"}],
+                )
+                turn_latencies.append(time.perf_counter() - started)
+
+    max_clarifications = settings.max_clarifications
+    correct = sum(
+        1
+        for conversation in final.values()
+        # Once handed over, turns get the handover reply instead of a clarification
+        if conversation.clarification_count == min(args.turns, max_clarifications + 1)
+        and conversation.handover_to_human_needed
+        == (args.turns > max_clarifications)
+    )
+
+    def ms(values: list[float], q: float) -> float:
+        return statistics.quantiles(values, n=100)[int(q) - 1] * 1000
+
+    print(
+        f"{backend:<8} {ms(turn_latencies, 50):>9.2f} {ms(turn_latencies, 95):>9.2f} "
+        f"{ms(timings.reads, 50):>9.3f} {ms(timings.writes, 50):>9.3f} "
+        f"{correct:>6}/{len(final)}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(
+        f"{'backend':<8} {'turn p50':>9} {'turn p95':>9} "
+        f"{'read p50':>9} {'write p50':>9} {'correct':>10}"
+    )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        args.tmpdir = tmpdir
+        for backend in args.backends:
+            await run_backend(backend, args)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument(
+        "--backends", nargs="+", default=["memory", "sqlite", "redis"]
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
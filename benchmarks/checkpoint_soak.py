@@ -0,0 +1,92 @@
+"""
+Benchmarks - Checkpoint Soak
+Simulates a long-running deployment: millions of turns spread over an ever
+growing population of helpdesk tickets, written straight to the checkpointer
+with the same shape the conversation graph produces (messages appended every
+turn). Reports RSS and saver gauges along the way for the bounded saver and,
+optionally, for the unbounded MemorySaver.
+
+Usage:
+    python -m benchmarks.checkpoint_soak [--turns 2000000] [--unbounded]
+"""
+
+import argparse
+import gc
+import os
+import random
+
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.infrastructure import BoundedMemorySaver
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def soak(saver: MemorySaver, args: argparse.Namespace) -> None:
+    rng = random.Random(42)
+    histories: dict[str, list[dict]] = {}
+    versions: dict[str, int] = {}
+    report_every = max(args.turns // 10, 1)
+
+    print(f"{'turns':>10} {'rss MB':>9} {'threads':>9} {'checkpoints':>12}")
+    for turn in range(1, args.turns + 1):
+        # New tickets keep arriving while recent ones get follow-ups
+        ticket = str(turn // args.turns_per_ticket + rng.randint(0, 50))
+        if ticket not in histories and len(histories) > args.live_tickets:
+            finished = next(iter(histories))
+            del histories[finished], versions[finished]
+        messages = histories.setdefault(ticket, [])
+        messages.append({"role": "user", "content": f"question {turn} " * 8})
+        messages.append({"role": "agent", "content": f"answer {turn} " * 24})
+        version = versions[ticket] = versions.get(ticket, 0) + 1
+
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": list(messages), "current_query": "q"}
+        checkpoint["channel_versions"] = {"messages": version, "current_query": version}
+        config = saver.put(
+            {"configurable": {"thread_id": ticket, "checkpoint_ns": ""}},
+            checkpoint,
+            {"source": "loop", "step": version},
+            {"messages": version, "current_query": version},
+        )
+        saver.put_writes(config, [("agent_response", "answer")], task_id="task")
+
+        if turn % report_every == 0:
+            gc.collect()
+            threads = len(saver.storage)
+            checkpoints = sum(
+                len(c) for namespaces in saver.storage.values() for c in namespaces.values()
+            )
+            print(f"{turn:>10} {rss_mb():>9.1f} {threads:>9} {checkpoints:>12}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=2_000_000)
+    parser.add_argument("--turns-per-ticket", type=int, default=4)
+    parser.add_argument("--live-tickets", type=int, default=1_000)
+    parser.add_argument("--max-threads", type=int, default=5_000)
+    parser.add_argument("--max-versions", type=int, default=2)
+    parser.add_argument("--unbounded", action="store_true")
+    args = parser.parse_args()
+
+    if args.unbounded:
+        saver: MemorySaver = MemorySaver()
+        print("MemorySaver (unbounded)")
+    else:
+        saver = BoundedMemorySaver(
+            max_threads=args.max_threads, max_versions=args.max_versions
+        )
+        print(
+            f"BoundedMemorySaver(max_threads={args.max_threads}, "
+            f"max_versions={args.max_versions})"
+        )
+    soak(saver, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmarks - Concurrency
+Measures throughput of /conversations/completions on a single worker as the
+number of in-flight requests grows.
+
+Usage:
+    python -m benchmarks.concurrency [--blocking] [--requests 200]
+
+With --blocking the stubs sleep synchronously, reproducing the behaviour of
+the former synchronous SDK calls that stalled the event loop.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+import main
+from src.application import ConversationGraph
+
+
+async def run_level(
+    client: httpx.AsyncClient, concurrency: int, total: int
+) -> tuple[float, float]:
+    """Sends `total` requests keeping `concurrency` in flight; returns (req/s, p50 ms)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                "/conversations/completions",
+                json={
+                    "helpdeskId": i + 1,
+                    "projectName": "benchmark",
+                    "messages": [{"role": "USER", "content": f"question {i}"}],
+                },
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    return total / elapsed, statistics.median(latencies) * 1000
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    main.conversation_graph = ConversationGraph(
+        vector_store=StubVectorStore(latency=args.search_latency, blocking=args.blocking),  # type: ignore[arg-type]
+        llm=StubLLM(latency=args.llm_latency, blocking=args.blocking),  # type: ignore[arg-type]
+    )
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'in-flight':>10} {'req/s':>10} {'p50 ms':>10}")
+        for concurrency in args.levels:
+            throughput, p50 = await run_level(client, concurrency, args.requests)
+            print(f"{concurrency:>10} {throughput:>10.1f} {p50:>10.1f}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--blocking", action="store_true")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100])
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
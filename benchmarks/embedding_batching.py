@@ -0,0 +1,81 @@
+"""
+Benchmarks - Embedding Micro-Batching
+Upstream request count and latency percentiles of concurrent query
+embeddings sent to a local stub OpenAI server, with and without the
+EmbeddingBatcher in front of OpenAIEmbeddings.
+
+Usage:
+    python -m benchmarks.embedding_batching [--concurrency 50 100 250 500]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.stub_openai import create_app, serve
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from pydantic import SecretStr
+
+from src.infrastructure import EmbeddingBatcher
+
+
+async def run(embeddings: Embeddings, concurrency: int) -> list[float]:
+    """Fires `concurrency` distinct queries at once, returning their latencies in ms"""
+
+    async def one(i: int) -> float:
+        started = time.perf_counter()
+        await embeddings.aembed_query(f"how do I configure feature {i} of the portal")
+        return (time.perf_counter() - started) * 1000
+
+    return sorted(await asyncio.gather(*(one(i) for i in range(concurrency))))
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    app = create_app(latency=args.latency, per_item_latency=args.per_item_latency)
+    async with serve(app, args.port) as base_url:
+        upstream = OpenAIEmbeddings(
+            api_key=SecretStr("stub"),
+            model="stub-embedding",
+            base_url=base_url,
+            # The stub model has no tokenizer; queries are short anyway
+            check_embedding_ctx_length=False,
+        )
+        print(
+            f"{'mode':<9} {'concurrent':>10} {'upstream':>9} "
+            f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+        )
+        for concurrency in args.concurrency:
+            for mode in ("direct", "batched"):
+                embeddings: Embeddings = upstream
+                if mode == "batched":
+                    embeddings = EmbeddingBatcher(
+                        upstream, window_ms=args.window_ms, max_batch_size=args.max_batch_size
+                    )
+                # Warm the connection pool so both modes start alike
+                await upstream.aembed_query("warm up")
+                app.state.requests = 0
+
+                latencies = await run(embeddings, concurrency)
+                p50 = latencies[len(latencies) // 2]
+                p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)]
+                print(
+                    f"{mode:<9} {concurrency:>10} {app.state.requests:>9} "
+                    f"{p50:>8.1f} {p99:>8.1f} {latencies[-1]:>8.1f}"
+                )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per request")
+    parser.add_argument("--per-item-latency", type=float, default=0.0005)
+    parser.add_argument("--port", type=int, default=8766)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
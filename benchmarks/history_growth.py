@@ -0,0 +1,65 @@
+"""
+Benchmarks - History Growth
+Per-turn latency and checkpoint size of a long conversation whose client
+resends the full history every turn, for both history merge modes.
+
+Usage:
+    python -m benchmarks.history_growth [--turns 200]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import get_settings
+
+
+async def run_mode(mode: str, args: argparse.Namespace) -> dict[int, tuple[float, int, int]]:
+    """Returns turn -> (latency ms, checkpoint bytes, stored messages)"""
+    get_settings().history_merge_mode = mode
+    checkpointer = MemorySaver()
+    graph = ConversationGraph(
+        vector_store=StubVectorStore(latency=0),  # type: ignore[arg-type]
+        llm=StubLLM(latency=0, tokens=5),  # type: ignore[arg-type]
+        checkpointer=checkpointer,
+    )
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    config = {"configurable": {"thread_id": "1"}}
+
+    history: list[dict] = []
+    results = {}
+    for turn in range(1, args.turns + 1):
+        history.append({"role": "USER", "content": f"Question number {turn} " * 5})
+        started = time.perf_counter()
+        await use_case.execute(helpdesk_id=1, project_name="benchmark", messages=history)
+        latency = (time.perf_counter() - started) * 1000
+
+        state = await graph.graph.aget_state(config)
+        history.append({"role": "AGENT", "content": state.values["agent_response"]})
+        if turn in args.report:
+            size = len(checkpointer.serde.dumps_typed(state.values)[1])
+            results[turn] = (latency, size, len(state.values["messages"]))
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(f"{'mode':<7} {'turn':>5} {'latency ms':>11} {'checkpoint KB':>14} {'messages':>9}")
+    for mode in ("append", "delta"):
+        for turn, (latency, size, messages) in (await run_mode(mode, args)).items():
+            print(f"{mode:<7} {turn:>5} {latency:>11.2f} {size / 1024:>14.1f} {messages:>9}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--report", type=int, nargs="+", default=[1, 10, 50, 200])
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
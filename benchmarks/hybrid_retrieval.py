@@ -0,0 +1,193 @@
+"""
+Benchmarks - Hybrid Retrieval
+Offline relevance of the vector, lexical (BM25) and hybrid (reciprocal rank
+fusion) modes of the local index, on a synthetic helpdesk corpus with known
+answers. The stand-in embedding maps synonyms to the same concept and, like
+dense models, blurs identifiers (error codes, SKUs) it has no meaning for:
+
+- identifier queries name the error code of one ticket
+- SKU queries name the product code of one ticket, in paraphrased words
+- paraphrase queries use only synonyms the tickets never contain
+
+Usage:
+    python -m benchmarks.hybrid_retrieval [--topics 150] [--tickets 20]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import statistics
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.stubs import stub_embedding  # noqa: F401 (sets the stub settings)
+
+from src.infrastructure import LocalVectorStore, RetrievalOptions
+
+# Synonym groups; tickets only use the first word of each group
+CONCEPTS = [
+    ("battery", "accumulator", "cell"),
+    ("charger", "adapter", "powerbrick"),
+    ("screen", "display", "monitor"),
+    ("router", "gateway", "modem"),
+    ("printer", "copier", "plotter"),
+    ("password", "passphrase", "credentials"),
+    ("invoice", "bill", "statement"),
+    ("refund", "reimbursement", "chargeback"),
+    ("delivery", "shipment", "shipping"),
+    ("warranty", "guarantee", "coverage"),
+    ("firmware", "software", "microcode"),
+    ("overheating", "hot", "thermal"),
+    ("noise", "buzzing", "rattling"),
+    ("crash", "freeze", "hang"),
+    ("login", "signin", "authentication"),
+    ("account", "profile", "subscription"),
+    ("keyboard", "keypad", "keys"),
+    ("camera", "webcam", "lens"),
+    ("speaker", "audio", "sound"),
+    ("bluetooth", "pairing", "wireless"),
+    ("storage", "disk", "drive"),
+    ("memory", "ram", "dimm"),
+    ("fan", "cooler", "ventilation"),
+    ("cable", "cord", "wire"),
+    ("order", "purchase", "checkout"),
+    ("cancel", "terminate", "stop"),
+    ("upgrade", "update", "patch"),
+    ("install", "setup", "configure"),
+    ("slow", "sluggish", "laggy"),
+    ("broken", "damaged", "defective"),
+]
+SYNONYMS = {word: group for group, words in enumerate(CONCEPTS) for word in words}
+FILLER = "the customer reports that after a while with the device it shows an issue".split()
+
+
+class ConceptEmbeddings(Embeddings):
+    """Sum of one random direction per concept; tokens with digits are ignored"""
+
+    def __init__(self, dimension: int = 256):
+        self.dimension = dimension
+
+    def _direction(self, token: str) -> np.ndarray:
+        key = f"concept:{SYNONYMS[token]}" if token in SYNONYMS else token
+        seed = int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "little")
+        weight = 1.0 if token in SYNONYMS else 0.2
+        return weight * np.random.default_rng(seed).normal(size=self.dimension)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension)
+        for token in re.findall(r"[\w-]+", text.lower()):
+            if not any(c.isdigit() for c in token):
+                vector += self._direction(token)
+        return (vector / (np.linalg.norm(vector) or 1)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def corpus(args: argparse.Namespace) -> tuple[List[dict], List[tuple[str, str, set]]]:
+    """Tickets, and (class, query, relevant ids) triples"""
+    rng = random.Random(args.seed)
+    tickets, queries = [], []
+    for topic in range(args.topics):
+        groups = rng.sample(range(len(CONCEPTS)), 3)
+        topic_ids = set()
+        for ticket in range(args.tickets):
+            ticket_id = f"{topic}-{ticket}"
+            error = f"E-{rng.randrange(10_000, 100_000)}"
+            sku = f"SKU-{rng.choice('ABCDEFGH')}{rng.choice('XYZ')}{rng.randrange(1000, 10_000)}"
+            words = [CONCEPTS[g][0] for g in groups] * 2 + [
+                CONCEPTS[rng.randrange(len(CONCEPTS))][0] for _ in range(2)
+            ]
+            rng.shuffle(words)
+            content = (
+                f"Ticket {ticket_id}: model {sku} " + " ".join(words)
+                + " " + " ".join(rng.sample(FILLER, 6)) + f", error code {error}"
+            )
+            tickets.append({"id": ticket_id, "content": content, "type": "ticket"})
+            topic_ids.add(ticket_id)
+            if rng.random() < args.query_rate:
+                synonym = rng.choice(CONCEPTS[groups[0]][1:])
+                queries.append(("identifier", f"{synonym} error {error}", {ticket_id}))
+            if rng.random() < args.query_rate:
+                synonyms = [rng.choice(CONCEPTS[g][1:]) for g in groups[:2]]
+                queries.append(("sku", f"{sku} {' '.join(synonyms)}", {ticket_id}))
+        synonyms = [rng.choice(CONCEPTS[g][1:]) for g in groups]
+        queries.append(("paraphrase", " ".join(synonyms) + " problem", topic_ids))
+    return tickets, queries
+
+
+async def evaluate(
+    store: LocalVectorStore,
+    options: RetrievalOptions,
+    queries: List[tuple[str, str, set]],
+    k: int,
+) -> dict[str, dict[str, float]]:
+    store.retrieval_options = lambda _: options
+    ranks: dict[str, List[int | None]] = {"identifier": [], "sku": [], "paraphrase": []}
+    latencies = []
+    for query_class, query, relevant in queries:
+        started = time.perf_counter()
+        sections = await store.similarity_search(query, k, "benchmark")
+        latencies.append(time.perf_counter() - started)
+        ids = [section.content.split(":")[0].removeprefix("Ticket ") for section in sections]
+        rank = next((i for i, ticket_id in enumerate(ids, 1) if ticket_id in relevant), None)
+        ranks[query_class].append(rank)
+        ranks.setdefault("all", []).append(rank)
+    results = {
+        query_class: {
+            "hit@1": sum(r == 1 for r in class_ranks) / len(class_ranks),
+            "hit@5": sum(r is not None and r <= 5 for r in class_ranks) / len(class_ranks),
+            "mrr@10": sum(1 / r for r in class_ranks if r) / len(class_ranks),
+        }
+        for query_class, class_ranks in ranks.items()
+    }
+    results["all"]["p50 ms"] = statistics.median(latencies) * 1000
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    tickets, queries = corpus(args)
+    embeddings = ConceptEmbeddings()
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, embeddings=embeddings, ivf_probes=0)
+        await store.add_documents(
+            "benchmark", tickets, embeddings.embed_documents([t["content"] for t in tickets])
+        )
+        counts = {c: sum(q[0] == c for q in queries) for c in ("identifier", "sku", "paraphrase")}
+        print(f"{len(tickets)} tickets, queries: {counts}")
+        print(f"{'mode':<18} {'class':<11} {'hit@1':>6} {'hit@5':>6} {'mrr@10':>7} {'p50 ms':>7}")
+        modes = {
+            "vector": RetrievalOptions(mode="vector"),
+            "lexical": RetrievalOptions(mode="lexical"),
+            "hybrid": RetrievalOptions(mode="hybrid"),
+            "hybrid lexical x2": RetrievalOptions(mode="hybrid", lexical_weight=2.0),
+        }
+        for label, options in modes.items():
+            for query_class, metrics in (await evaluate(store, options, queries, 10)).items():
+                print(
+                    f"{label:<18} {query_class:<11} {metrics['hit@1']:>6.3f} "
+                    f"{metrics['hit@5']:>6.3f} {metrics['mrr@10']:>7.3f} "
+                    + (f"{metrics['p50 ms']:>7.2f}" if "p50 ms" in metrics else "")
+                )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--topics", type=int, default=150)
+    parser.add_argument("--tickets", type=int, default=20, help="tickets per topic")
+    parser.add_argument("--query-rate", type=float, default=0.1, help="queries per ticket")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,124 @@
+"""
+Benchmarks - Incremental Ingestion
+Builds the local index from a synthetic corpus, then changes a fraction of it
+(edited, added and removed documents) and re-ingests: time, embedding calls,
+uploads and deletions of the incremental run against the full build, and a
+check that the index holds exactly the chunks of the changed corpus.
+
+Usage:
+    python -m benchmarks.incremental_ingestion [--documents 24000] [--changed 0.01]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.ingestion import WORDS, write_corpus
+from benchmarks.stub_openai import create_app, serve
+
+from src.infrastructure import (
+    IngestionPipeline,
+    IngestionReport,
+    LocalVectorStore,
+    chunk_text,
+    create_document_embeddings,
+    get_settings,
+)
+
+
+def change_corpus(directory: str, args: argparse.Namespace) -> None:
+    """Edits a paragraph of `changed` of the documents and adds/removes a tenth as many"""
+    rng = random.Random(args.seed + 1)
+    names = sorted(os.listdir(directory))
+    edited = rng.sample(names, max(1, int(len(names) * args.changed)))
+    for name in edited:
+        path = os.path.join(directory, name)
+        with open(path) as document:
+            paragraphs = document.read().split("\n\n")
+        index = rng.randrange(len(paragraphs))
+        paragraphs[index] = " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 120)))
+        with open(path, "w") as document:
+            document.write("\n\n".join(paragraphs))
+
+    others = [name for name in names if name not in set(edited)]
+    for name in rng.sample(others, max(1, len(edited) // 10)):
+        os.remove(os.path.join(directory, name))
+    for i in range(max(1, len(edited) // 10)):
+        with open(os.path.join(directory, f"new_{i:06d}.md"), "w") as document:
+            document.write(" ".join(rng.choice(WORDS) for _ in range(rng.randint(100, 600))))
+
+
+def corpus_chunks(directory: str, args: argparse.Namespace) -> int:
+    total = 0
+    for name in os.listdir(directory):
+        with open(os.path.join(directory, name)) as document:
+            total += len(chunk_text(document.read(), args.chunk_size, args.chunk_overlap))
+    return total
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    app = create_app(latency=args.latency)
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus")
+        os.makedirs(corpus)
+        write_corpus(corpus, args)
+
+        async with serve(app, args.port) as base_url:
+            settings = get_settings().model_copy(update={"openai_base_url": base_url})
+            vector_store = LocalVectorStore(os.path.join(directory, "index"))
+
+            async def ingest(label: str) -> IngestionReport:
+                requests, inputs = app.state.requests, app.state.inputs
+                started = time.perf_counter()
+                report = await IngestionPipeline(
+                    vector_store=vector_store,
+                    embeddings=create_document_embeddings(settings),
+                    project_name="benchmark",
+                    chunk_size=args.chunk_size,
+                    chunk_overlap=args.chunk_overlap,
+                    batch_size=args.batch_size,
+                    concurrency=args.concurrency,
+                    manifest_path=os.path.join(directory, "manifest.jsonl"),
+                ).run([corpus])
+                print(
+                    f"{label:<12} {time.perf_counter() - started:>8.2f}s "
+                    f"{app.state.requests - requests:>9} {app.state.inputs - inputs:>9} "
+                    f"{report.chunks:>8} {report.deleted_chunks:>8} {report.skipped_files:>10}"
+                )
+                return report
+
+            print(
+                f"{'run':<12} {'time':>9} {'requests':>9} {'embedded':>9} "
+                f"{'uploaded':>8} {'deleted':>8} {'unchanged':>10}"
+            )
+            await ingest("full build")
+            change_corpus(corpus, args)
+            await ingest("incremental")
+            report = await ingest("no change")
+            assert report.chunks == report.deleted_chunks == 0
+
+        indexed = vector_store.stats()["local_index"]["vectors"]
+        expected = corpus_chunks(corpus, args)
+        print(f"index: {indexed} chunks for {expected} expected")
+        assert indexed == expected, "stale chunks left in the index or chunks missing"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=24000, help="~100k chunks")
+    parser.add_argument("--changed", type=float, default=0.01, help="fraction edited")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per request")
+    parser.add_argument("--port", type=int, default=8768)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
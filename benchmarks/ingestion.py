@@ -0,0 +1,116 @@
+"""
+Benchmarks - Ingestion
+Ingests a synthetic corpus into the local index through a local stub OpenAI
+embedding service, interrupts the run midway, resumes it and checks that
+every chunk ends up in the index exactly once.
+
+Usage:
+    python -m benchmarks.ingestion [--documents 2000] [--failure-rate 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+
+from benchmarks.stub_openai import create_app, serve
+
+from src.infrastructure import (
+    IngestionPipeline,
+    LocalVectorStore,
+    chunk_text,
+    create_document_embeddings,
+    get_settings,
+)
+
+WORDS = (
+    "account password reset portal invoice billing delivery order refund warranty "
+    "battery charger firmware update error code network router installation manual"
+).split()
+
+
+def write_corpus(directory: str, args: argparse.Namespace) -> int:
+    """Writes the documents, returning how many chunks they split into"""
+    rng = random.Random(args.seed)
+    chunks = 0
+    for i in range(args.documents):
+        text = "\n\n".join(
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 120)))
+            for _ in range(rng.randint(2, 8))
+        )
+        with open(os.path.join(directory, f"doc_{i:06d}.md"), "w") as document:
+            document.write(text)
+        chunks += len(chunk_text(text, args.chunk_size, args.chunk_overlap))
+    return chunks
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    app = create_app(latency=args.latency, failure_rate=args.failure_rate)
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus")
+        os.makedirs(corpus)
+        expected = write_corpus(corpus, args)
+        manifest = os.path.join(directory, "manifest.jsonl")
+
+        async with serve(app, args.port) as base_url:
+            settings = get_settings().model_copy(update={"openai_base_url": base_url})
+            vector_store = LocalVectorStore(os.path.join(directory, "index"))
+
+            def pipeline(on_progress=None) -> IngestionPipeline:
+                return IngestionPipeline(
+                    vector_store=vector_store,
+                    embeddings=create_document_embeddings(settings),
+                    project_name="benchmark",
+                    chunk_size=args.chunk_size,
+                    chunk_overlap=args.chunk_overlap,
+                    batch_size=args.batch_size,
+                    concurrency=args.concurrency,
+                    manifest_path=manifest,
+                    on_progress=on_progress,
+                )
+
+            # First run, interrupted once about half of the chunks are in
+            interrupted = asyncio.Event()
+
+            def interrupt(report) -> None:
+                if report.chunks >= expected // 2:
+                    interrupted.set()
+
+            first = asyncio.create_task(pipeline(interrupt).run([corpus]))
+            await interrupted.wait()
+            first.cancel()
+            try:
+                await first
+            except asyncio.CancelledError:
+                pass
+            indexed = vector_store.stats()["local_index"]["vectors"]
+            print(f"interrupted: {indexed}/{expected} chunks indexed")
+
+            report = await pipeline().run([corpus])
+            print(f"resumed:     {report}")
+
+        indexed = vector_store.stats()["local_index"]["vectors"]
+        print(
+            f"index:       {indexed} chunks for {expected} expected, "
+            f"{app.state.requests} embedding requests"
+        )
+        assert indexed == expected, "chunks were lost or duplicated"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
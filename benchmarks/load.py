@@ -0,0 +1,320 @@
+"""
+Benchmarks - Load Test Suite
+Runs the real application (main:app, with the OpenAI and Azure AI Search
+adapters) in its own uvicorn process against local stub OpenAI and Azure AI
+Search services, and drives /conversations/completions with concurrent
+virtual users. Per scenario: throughput, p50/p95/p99 latency, errors and the
+memory of the application process.
+
+Scenarios (each one on a fresh application process):
+- first_turn_cold: a new ticket per request, every question unseen, so no
+  cache helps
+- first_turn_hot: a new ticket per request, questions from a pool asked in an
+  untimed warm-up pass, so query embeddings and search results are cached
+- long_conversation: every virtual user continues a ticket that already has
+  `--history-turns` turns, sending the whole transcript, as clients do
+
+The workload is seeded and the stub latencies are fixed, so runs are
+comparable across commits: --output writes the results as JSON, and
+--baseline prints the change against an earlier output. Any other setting
+comes from the environment, as for the application itself (e.g.
+ANSWER_CACHE_ENABLED=true).
+
+Usage:
+    python -m benchmarks.load [--scenarios first_turn_cold ...] [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Callable
+
+import httpx
+
+from benchmarks import stub_azure_search, stub_openai
+
+# Questions of the hot pool and the new ones are built from these
+TOPICS = (
+    "reset the admin password", "update the router firmware", "get a refund for order",
+    "change the delivery address", "fix error code", "install the mobile app",
+    "replace the charger", "cancel my subscription", "download the invoice",
+)
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(int(round(q / 100 * len(ordered))) - 1, 0)]
+
+
+def memory_mb(pid: int) -> tuple[float | None, float | None]:
+    """(current, peak) resident memory of a process, where /proc is available"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            fields = dict(line.split(":", 1) for line in status)
+    except OSError:
+        return None, None
+    return (
+        int(fields["VmRSS"].split()[0]) / 1024,
+        int(fields["VmHWM"].split()[0]) / 1024,
+    )
+
+
+def question(rng: random.Random, unique: bool) -> str:
+    topic = rng.choice(TOPICS)
+    return f"How do I {topic} {rng.randrange(10**9)}?" if unique else f"How do I {topic}?"
+
+
+async def conversation(
+    client: httpx.AsyncClient, helpdesk_id: int, messages: list[dict]
+) -> list[dict]:
+    """Sends a turn, returning the transcript including the agent's answer"""
+    response = await client.post(
+        "/conversations/completions",
+        json={"helpdeskId": helpdesk_id, "projectName": "benchmark", "messages": messages},
+    )
+    response.raise_for_status()
+    return [
+        {"role": m["role"], "content": m["content"]} for m in response.json()["messages"]
+    ]
+
+
+class Scenario:
+    """A warm-up (untimed) and the request every virtual user sends in turn"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+    async def prepare(self, client: httpx.AsyncClient) -> None:
+        pass
+
+    async def request(self, client: httpx.AsyncClient, user: int, i: int) -> None:
+        raise NotImplementedError
+
+
+class FirstTurn(Scenario):
+    def __init__(self, args: argparse.Namespace, hot: bool):
+        super().__init__(args)
+        self.hot = hot
+        pool = sorted({question(self.rng, unique=True) for _ in range(args.pool)})
+        self.pool = pool if hot else []
+
+    async def prepare(self, client: httpx.AsyncClient) -> None:
+        # Tickets of the warm-up come after the timed ones, so they never meet
+        for i, text in enumerate(self.pool):
+            await conversation(
+                client, self.args.requests + i + 1, [{"role": "USER", "content": text}]
+            )
+
+    async def request(self, client: httpx.AsyncClient, user: int, i: int) -> None:
+        text = self.pool[i % len(self.pool)] if self.hot else question(self.rng, unique=True)
+        await conversation(client, i + 1, [{"role": "USER", "content": text}])
+
+
+class LongConversation(Scenario):
+    def __init__(self, args: argparse.Namespace):
+        super().__init__(args)
+        self.transcripts: dict[int, list[dict]] = {}
+
+    async def prepare(self, client: httpx.AsyncClient) -> None:
+        async def build(user: int) -> None:
+            transcript: list[dict] = []
+            for _ in range(self.args.history_turns):
+                transcript = await conversation(
+                    client,
+                    user + 1,
+                    transcript + [{"role": "USER", "content": question(self.rng, unique=True)}],
+                )
+            self.transcripts[user] = transcript
+
+        await asyncio.gather(*(build(user) for user in range(self.args.concurrency)))
+
+    async def request(self, client: httpx.AsyncClient, user: int, i: int) -> None:
+        self.transcripts[user] = await conversation(
+            client,
+            user + 1,
+            self.transcripts[user]
+            + [{"role": "USER", "content": question(self.rng, unique=True)}],
+        )
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], Scenario]] = {
+    "first_turn_cold": lambda args: FirstTurn(args, hot=False),
+    "first_turn_hot": lambda args: FirstTurn(args, hot=True),
+    "long_conversation": LongConversation,
+}
+
+
+async def start_application(
+    args: argparse.Namespace, openai_url: str, search_url: str, env: dict | None = None
+):
+    """Starts main:app in a uvicorn process pointed at the stubs, with extra settings in env"""
+    env = {
+        **os.environ,
+        **(env or {}),
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_BASE_URL": openai_url,
+        "AZURE_SEARCH_ENDPOINT": search_url,
+        "AZURE_SEARCH_KEY": "stub",
+        "AZURE_SEARCH_INDEX_NAME": "benchmark",
+    }
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as client:
+        for _ in range(300):
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return process
+            except httpx.TransportError:
+                pass
+            if process.poll() is not None:
+                break
+            await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("the application did not start")
+
+
+async def run_scenario(
+    name: str, args: argparse.Namespace, openai_url: str, search_url: str
+) -> dict:
+    process = await start_application(args, openai_url, search_url)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}",
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.concurrency),
+        ) as client:
+            scenario = SCENARIOS[name](args)
+            await scenario.prepare(client)
+            rss_before, _ = memory_mb(process.pid)
+
+            latencies: list[float] = []
+            errors: list[str] = []
+
+            async def user(index: int) -> None:
+                # Requests are dealt round-robin; a user's own run one at a time
+                for i in range(index, args.requests, args.concurrency):
+                    started = time.perf_counter()
+                    try:
+                        await scenario.request(client, index, i)
+                    except httpx.HTTPStatusError as e:
+                        errors.append(f"{e.response.status_code} {e.response.text[:200]}")
+                        continue
+                    except httpx.HTTPError as e:
+                        errors.append(repr(e))
+                        continue
+                    latencies.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(user(index) for index in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            rss, peak = memory_mb(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+
+    if not latencies:
+        raise RuntimeError(f"every request of {name} failed, e.g. {errors[0]}")
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(max(latencies), 1),
+        "rss_mb": round(rss, 1) if rss is not None else None,
+        "rss_growth_mb": round(rss - rss_before, 1) if rss and rss_before else None,
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None) -> None:
+    columns = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+    print(f"{'scenario':<18} {'req':>5} {'err':>4} " + " ".join(f"{c:>15}" for c in columns))
+    for name, result in results["scenarios"].items():
+        before = ((baseline or {}).get("scenarios") or {}).get(name, {})
+        cells = []
+        for column in columns:
+            value = result[column]
+            cell = "-" if value is None else f"{value:.1f}"
+            if before.get(column) and value is not None:
+                cell += f" ({(value - before[column]) / before[column]:+.0%})"
+            cells.append(f"{cell:>15}")
+        print(f"{name:<18} {result['requests']:>5} {result['errors']:>4} " + " ".join(cells))
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    openai = stub_openai.create_app(
+        latency=args.embedding_latency,
+        chat_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+    )
+    search = stub_azure_search.create_app(latency=args.search_latency)
+    parameters = {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}
+    results: dict = {"commit": git_commit(), "parameters": parameters, "scenarios": {}}
+    async with stub_openai.serve(openai, args.openai_port) as openai_url:
+        async with stub_openai.serve(search, args.search_port, path="") as search_url:
+            for name in args.scenarios:
+                results["scenarios"][name] = await run_scenario(
+                    name, args, openai_url, search_url
+                )
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline.get("parameters") != parameters:
+            print(f"note: {args.baseline} was run with other parameters")
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--requests", type=int, default=500, help="timed requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--pool", type=int, default=50, help="questions of the hot pool")
+    parser.add_argument("--history-turns", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--openai-port", type=int, default=8770)
+    parser.add_argument("--search-port", type=int, default=8771)
+    parser.add_argument("--port", type=int, default=8772)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,121 @@
+"""
+Benchmarks - Local Vector Index
+Recall@k and latency of the local index variants (exact float32, exact int8,
+IVF) against in-memory brute force, on synthetic clustered embeddings.
+
+Usage:
+    python -m benchmarks.local_index [--documents 100000] [--dimension 256]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.stubs import stub_embedding  # noqa: F401 (sets the stub settings)
+
+from src.infrastructure import LocalVectorStore
+
+
+def synthetic(args: argparse.Namespace) -> tuple[np.ndarray, np.ndarray]:
+    """Documents scattered around topic centers, and queries near random documents"""
+    rng = np.random.default_rng(args.seed)
+    centers = rng.normal(size=(args.topics, args.dimension)).astype(np.float32)
+    topics = rng.integers(args.topics, size=args.documents)
+    documents = centers[topics] + rng.normal(
+        scale=args.spread, size=(args.documents, args.dimension)
+    ).astype(np.float32)
+    documents /= np.linalg.norm(documents, axis=1, keepdims=True)
+    queries = documents[rng.integers(args.documents, size=args.queries)] + rng.normal(
+        scale=args.spread / 2, size=(args.queries, args.dimension)
+    ).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return documents, queries
+
+
+def build(directory: str, dtype: str, documents: np.ndarray, ivf_lists: int) -> LocalVectorStore:
+    store = LocalVectorStore(directory, dtype=dtype, ivf_probes=0)
+    for start in range(0, len(documents), 10_000):
+        batch = documents[start : start + 10_000]
+        asyncio.run(
+            store.add_documents(
+                "benchmark",
+                [{"id": str(start + i), "content": str(start + i)} for i in range(len(batch))],
+                batch,
+            )
+        )
+    if ivf_lists:
+        store.build_ivf("benchmark", ivf_lists)
+    return store
+
+
+def measure(
+    name: str, store: LocalVectorStore, queries: np.ndarray, truth: np.ndarray, k: int
+) -> None:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        sections = store.search_vectors([query], k, "benchmark")[0]
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = {int(section.content) for section in sections}
+        recalls.append(len(found & set(expected.tolist())) / k)
+
+    started = time.perf_counter()
+    store.search_vectors(queries, k, "benchmark")
+    batched = (time.perf_counter() - started) * 1000 / len(queries)
+
+    latencies.sort()
+    print(
+        f"{name:<22} {np.mean(recalls):>9.3f} {latencies[len(latencies) // 2]:>8.2f} "
+        f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f} {batched:>12.3f}"
+    )
+
+
+def main(args: argparse.Namespace) -> None:
+    documents, queries = synthetic(args)
+    k = args.k
+
+    # Ground truth: brute force over the in-memory float32 matrix
+    latencies = []
+    truth = []
+    for query in queries:
+        started = time.perf_counter()
+        scores = documents @ query
+        truth.append(np.argsort(-scores)[:k])
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    print(f"{'variant':<22} {'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8} {'batched ms/q':>12}")
+    print(
+        f"{'brute force (memory)':<22} {1.0:>9.3f} {latencies[len(latencies) // 2]:>8.2f} "
+        f"{latencies[int(len(latencies) * 0.99) - 1]:>8.2f} {'-':>12}"
+    )
+
+    ivf_lists = args.ivf_lists or int(4 * np.sqrt(args.documents))
+    with tempfile.TemporaryDirectory() as directory:
+        exact = build(f"{directory}/float32", "float32", documents, ivf_lists)
+        measure("exact float32", exact, queries, truth, k)
+        quantized = build(f"{directory}/int8", "int8", documents, 0)
+        measure("exact int8", quantized, queries, truth, k)
+        for probes in args.probes:
+            exact.ivf_probes = probes
+            measure(f"ivf {ivf_lists} lists/{probes} probes", exact, queries, truth, k)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=0.6)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ivf-lists", type=int, default=0, help="default: 4 * sqrt(documents)")
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
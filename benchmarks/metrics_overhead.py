@@ -0,0 +1,97 @@
+"""
+Benchmarks - Metrics Overhead
+Cost of the instrumentation: a single timed block, a turn through the whole
+graph (with instant stubs, so that the overhead is not hidden behind I/O)
+with METRICS_ENABLED off and on, and rendering /metrics.
+
+Usage:
+    python -m benchmarks.metrics_overhead [--turns 500] [--rounds 4]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import MetricsRegistry, get_metrics
+
+
+def timer_cost(args: argparse.Namespace) -> None:
+    for enabled in (False, True):
+        metrics = MetricsRegistry(enabled=enabled)
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            with metrics.upstream("openai", "completion"):
+                pass
+        elapsed = time.perf_counter() - started
+        print(
+            f"timed block, metrics {'on' if enabled else 'off'}: "
+            f"{elapsed / args.iterations * 1e9:.0f} ns"
+        )
+
+
+async def turn_latency(enabled: bool, args: argparse.Namespace) -> list[float]:
+    get_metrics().enabled = enabled
+    graph = ConversationGraph(
+        vector_store=StubVectorStore(latency=0),  # type: ignore[arg-type]
+        llm=StubLLM(latency=0, tokens=5),  # type: ignore[arg-type]
+    )
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    latencies = []
+    for turn in range(args.turns):
+        started = time.perf_counter()
+        await use_case.execute(
+            helpdesk_id=turn % args.tickets,
+            project_name="benchmark",
+            messages=[{"role": "USER", "content": f"how do I reset the router, case {turn}"}],
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+    await graph.close()
+    return latencies
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    timer_cost(args)
+
+    print(f"{'metrics':<8} {'p50 ms':>8} {'mean ms':>8}")
+    results: dict[bool, list[float]] = {False: [], True: []}
+    # A warm-up pass, so that imports and first-call costs fall on neither side
+    await turn_latency(True, argparse.Namespace(**{**vars(args), "turns": 50}))
+    # Alternating rounds spread the drift of the machine over both sides
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            results[enabled] += await turn_latency(enabled, args)
+    for enabled, latencies in results.items():
+        print(
+            f"{'on' if enabled else 'off':<8} {statistics.median(latencies):>8.3f} "
+            f"{statistics.fmean(latencies):>8.3f}"
+        )
+    overhead = statistics.median(results[True]) - statistics.median(results[False])
+    print(
+        f"overhead per turn: {overhead * 1000:.0f} µs "
+        f"({overhead / statistics.median(results[False]):.1%} of an instant turn)"
+    )
+
+    metrics = get_metrics()
+    started = time.perf_counter()
+    text = metrics.render()
+    print(
+        f"/metrics render: {(time.perf_counter() - started) * 1000:.2f} ms, "
+        f"{len(text.splitlines())} lines"
+    )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=500, help="turns per round")
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--tickets", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=1_000_000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,194 @@
+"""
+Benchmarks - Overload and Admission Control
+Runs the real application (as benchmarks.load does) against a stub OpenAI
+service that only takes `--chat-capacity` completions at a time and answers
+the rest with 429, like a rate limited account, and offers it open-loop
+traffic (Poisson arrivals, new tickets with unseen questions) at 1x and 2x
+of that capacity.
+
+Two configurations:
+- unbounded: no admission control and no upstream limits, as before; excess
+  completions get 429s from the stub and are retried by the OpenAI client
+- bounded: at most `--chat-capacity` completions in flight
+  (OPENAI_CHAT_MAX_CONCURRENCY) and a bounded request queue
+  (API_MAX_CONCURRENCY, API_MAX_QUEUE, API_QUEUE_TIMEOUT_MS) that sheds the
+  excess with 429/503 and Retry-After
+
+Per run: requests answered, shed and failed, goodput, the latency
+percentiles of the answered requests and how fast the shed ones were told.
+
+Usage:
+    python -m benchmarks.overload [--duration 20] [--chat-capacity 8] [--loads 1 2]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from benchmarks import stub_azure_search, stub_openai
+from benchmarks.load import percentile, question, start_application
+
+
+def configurations(args: argparse.Namespace) -> dict[str, dict[str, str]]:
+    return {
+        "unbounded": {
+            "API_MAX_CONCURRENCY": "0",
+            "OPENAI_CHAT_MAX_CONCURRENCY": "0",
+            "OPENAI_EMBEDDING_MAX_CONCURRENCY": "0",
+            "AZURE_SEARCH_MAX_CONCURRENCY": "0",
+        },
+        "bounded": {
+            "API_MAX_CONCURRENCY": str(args.api_concurrency),
+            "API_MAX_QUEUE": str(args.api_queue),
+            "API_QUEUE_TIMEOUT_MS": str(args.queue_timeout_ms),
+            "OPENAI_CHAT_MAX_CONCURRENCY": str(args.chat_capacity),
+        },
+    }
+
+
+async def run(
+    name: str,
+    env: dict[str, str],
+    rate: float,
+    args: argparse.Namespace,
+    openai: FastAPI,
+    openai_url: str,
+    search_url: str,
+) -> dict:
+    """Offers `rate` requests per second for `--duration` seconds"""
+    rng = random.Random(args.seed)
+    process = await start_application(
+        args, openai_url, search_url, {"ANSWER_CACHE_ENABLED": "false", **env}
+    )
+    rate_limited_before = openai.state.rate_limited
+    answered: list[float] = []
+    shed: list[float] = []
+    failed: list[str] = []
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{args.port}",
+            timeout=args.timeout,
+            limits=httpx.Limits(max_connections=None, max_keepalive_connections=100),
+        ) as client:
+
+            async def send(helpdesk_id: int) -> None:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(
+                        "/conversations/completions",
+                        json={
+                            "helpdeskId": helpdesk_id,
+                            "projectName": "benchmark",
+                            "messages": [
+                                {"role": "USER", "content": question(rng, unique=True)}
+                            ],
+                        },
+                    )
+                except httpx.HTTPError as e:
+                    failed.append(repr(e))
+                    return
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code == 200:
+                    answered.append(elapsed)
+                elif response.status_code in (429, 503) and "retry-after" in response.headers:
+                    shed.append(elapsed)
+                else:
+                    failed.append(f"{response.status_code} {response.text[:160]}")
+
+            tasks = []
+            started = time.perf_counter()
+            arrival = 0.0
+            while arrival < args.duration:
+                await asyncio.sleep(max(arrival - (time.perf_counter() - started), 0))
+                tasks.append(asyncio.create_task(send(len(tasks) + 1)))
+                arrival += rng.expovariate(rate)
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+    return {
+        "name": name,
+        "sent": len(tasks),
+        "answered": len(answered),
+        "shed": len(shed),
+        "failed": len(failed),
+        "goodput": len(answered) / elapsed,
+        "p50": percentile(answered, 50) if answered else float("nan"),
+        "p99": percentile(answered, 99) if answered else float("nan"),
+        "shed_p99": percentile(shed, 99) if shed else float("nan"),
+        "upstream_429": openai.state.rate_limited - rate_limited_before,
+        "example": failed[0] if failed else "",
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    completion = args.llm_latency + args.completion_tokens / args.tokens_per_second
+    capacity = args.chat_capacity / completion
+    print(
+        f"upstream capacity {args.chat_capacity} completions of {completion:.1f} s "
+        f"= {capacity:.1f} req/s; {args.duration:.0f} s of open-loop traffic per run"
+    )
+    print(
+        f"{'config':<10} {'load':>5} {'sent':>5} {'ok':>5} {'shed':>5} {'fail':>5} "
+        f"{'goodput':>8} {'p50 ms':>8} {'p99 ms':>8} {'shed p99':>9} {'up 429':>7}"
+    )
+    openai = stub_openai.create_app(
+        latency=args.embedding_latency,
+        chat_latency=args.llm_latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+        chat_capacity=args.chat_capacity,
+    )
+    search = stub_azure_search.create_app(latency=args.search_latency)
+    examples = []
+    async with stub_openai.serve(openai, args.openai_port) as openai_url:
+        async with stub_openai.serve(search, args.search_port, path="") as search_url:
+            for name, env in configurations(args).items():
+                for load in args.loads:
+                    result = await run(
+                        name, env, load * capacity, args, openai, openai_url, search_url
+                    )
+                    print(
+                        f"{name:<10} {load:>4.1f}x {result['sent']:>5} {result['answered']:>5} "
+                        f"{result['shed']:>5} {result['failed']:>5} "
+                        f"{result['goodput']:>8.2f} {result['p50']:>8.0f} {result['p99']:>8.0f} "
+                        f"{result['shed_p99']:>9.0f} {result['upstream_429']:>7}"
+                    )
+                    if result["example"]:
+                        examples.append(f"{name} {load}x: {result['example']}")
+    for example in examples:
+        print(f"e.g. failure of {example}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per run")
+    parser.add_argument(
+        "--loads", type=float, nargs="+", default=[1.0, 2.0],
+        help="offered load, in multiples of the upstream capacity",
+    )
+    parser.add_argument("--chat-capacity", type=int, default=8)
+    parser.add_argument("--api-concurrency", type=int, default=16)
+    parser.add_argument("--api-queue", type=int, default=16)
+    parser.add_argument("--queue-timeout-ms", type=int, default=2000)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--completion-tokens", type=int, default=30)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=60.0, help="client timeout, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--openai-port", type=int, default=8775)
+    parser.add_argument("--search-port", type=int, default=8776)
+    parser.add_argument("--port", type=int, default=8777)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,91 @@
+"""
+Benchmarks - Prompt History
+History tokens sent to the LLM and per-turn latency of a long conversation,
+with the whole history in the prompt (HISTORY_WINDOW_TURNS=0) and with the
+sliding window plus rolling summary. Summaries are refreshed in the
+background between the user's messages; turns only wait for the (slow) stub
+summarizer when the history would otherwise exceed its token ceiling.
+
+Usage:
+    python -m benchmarks.prompt_history [--turns 200] [--think-time 0.3]
+"""
+
+import argparse
+import asyncio
+import time
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import create_token_counter, get_settings
+
+
+async def run(window_turns: int, args: argparse.Namespace) -> dict[int, tuple]:
+    """Returns turn -> (latency ms, history tokens, verbatim messages, summary calls)"""
+    settings = get_settings()
+    settings.history_merge_mode = "delta"
+    settings.history_window_turns = window_turns
+    # The baseline sends the whole history, as before the window existed
+    settings.history_max_tokens = args.max_tokens if window_turns else 0
+    count_tokens = create_token_counter(settings.openai_chat_model)
+    llm = StubLLM(latency=args.latency, tokens=5, summary_latency=args.summary_latency)
+    graph = ConversationGraph(
+        vector_store=StubVectorStore(latency=0),  # type: ignore[arg-type]
+        llm=llm,  # type: ignore[arg-type]
+    )
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+
+    results = {}
+    latencies = []
+    for turn in range(1, args.turns + 1):
+        message = {"role": "USER", "content": f"Question number {turn} " + "about the order " * 20}
+        started = time.perf_counter()
+        await use_case.execute(helpdesk_id=1, project_name="benchmark", messages=[message])
+        latencies.append((time.perf_counter() - started) * 1000)
+        # Time between the messages of a user
+        await asyncio.sleep(args.think_time)
+
+        summary, history = llm.last_history
+        tokens = (count_tokens(summary) if summary else 0) + sum(
+            count_tokens(f"{m['role']}: {m['content']}") for m in history
+        )
+        if settings.history_max_tokens:
+            assert tokens <= args.max_tokens, f"history over the ceiling at turn {turn}"
+        if turn in args.report:
+            results[turn] = (max(latencies), tokens, len(history), llm.summary_calls)
+            latencies = []
+    await graph.close()
+    return results
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(
+        f"{'window':<7} {'turn':>5} {'max latency ms':>15} {'history tokens':>15} "
+        f"{'verbatim':>9} {'summaries':>10}"
+    )
+    for window_turns in (0, args.window_turns):
+        for turn, (latency, tokens, messages, summaries) in (
+            await run(window_turns, args)
+        ).items():
+            print(
+                f"{window_turns or 'off':<7} {turn:>5} {latency:>15.2f} {tokens:>15} "
+                f"{messages:>9} {summaries:>10}"
+            )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--report", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--window-turns", type=int, default=4)
+    parser.add_argument("--max-tokens", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per answer")
+    parser.add_argument("--summary-latency", type=float, default=0.2)
+    parser.add_argument(
+        "--think-time", type=float, default=0.3, help="seconds between the user's messages"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,131 @@
+"""
+Benchmarks - Multi-Query Retrieval
+Two-turn conversations over the synthetic helpdesk corpus of
+benchmarks.hybrid_retrieval: the user first names the product code, then
+follows up only with symptoms ("battery overheating still happening"). The
+relevant ticket is the one of that product, which the follow-up alone cannot
+single out. Relevance of the follow-up's sections and its latency through the
+whole graph, with query rewriting disabled, enabled, and enabled with a
+rewriter slower than the stage budget (falling back to the plain query).
+
+Usage:
+    python -m benchmarks.query_rewrite [--conversations 200]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import tempfile
+import time
+
+from benchmarks.hybrid_retrieval import CONCEPTS, ConceptEmbeddings, corpus
+from benchmarks.stubs import StubLLM
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import LocalVectorStore, RetrievalOptions, get_settings
+
+
+def conversations(
+    tickets: list[dict], args: argparse.Namespace
+) -> list[tuple[str, str, str]]:
+    """(first message, follow-up, relevant ticket id) triples"""
+    rng = random.Random(args.seed)
+    words = {word for group in CONCEPTS for word in group}
+    result = []
+    for ticket in rng.sample(tickets, args.conversations):
+        sku = next(token for token in ticket["content"].split() if token.startswith("SKU-"))
+        symptoms = [token for token in ticket["content"].split() if token in words][:3]
+        result.append(
+            (
+                f"I have an issue with my model {sku}",
+                " ".join(symptoms) + " still happening",
+                ticket["id"],
+            )
+        )
+    return result
+
+
+async def run(
+    label: str,
+    store: LocalVectorStore,
+    llm: StubLLM,
+    dialogs: list[tuple[str, str, str]],
+    enabled: bool,
+    budget_ms: int,
+) -> None:
+    settings = get_settings()
+    settings.query_rewrite_enabled = enabled
+    settings.query_rewrite_budget_ms = budget_ms
+    graph = ConversationGraph(vector_store=store, llm=llm)  # type: ignore[arg-type]
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+
+    ranks, latencies = [], []
+    for helpdesk_id, (first, follow_up, relevant) in enumerate(dialogs):
+        await use_case.execute(
+            helpdesk_id=helpdesk_id,
+            project_name="benchmark",
+            messages=[{"role": "USER", "content": first}],
+        )
+        started = time.perf_counter()
+        conversation = await use_case.execute(
+            helpdesk_id=helpdesk_id,
+            project_name="benchmark",
+            messages=[{"role": "USER", "content": follow_up}],
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        ids = [
+            s.content.split(":")[0].removeprefix("Ticket ")
+            for s in conversation.sections_retrieved
+        ]
+        ranks.append(next((i for i, id_ in enumerate(ids, 1) if id_ == relevant), None))
+
+    stats = graph.stats()["query_rewrite"]
+    print(
+        f"{label:<22} {sum(r == 1 for r in ranks) / len(ranks):>6.3f} "
+        f"{sum(r is not None for r in ranks) / len(ranks):>6.3f} "
+        f"{statistics.median(latencies):>7.1f} {max(latencies):>7.1f} "
+        f"{stats.get('multi_query', '-'):>6} {stats.get('over_budget', '-'):>11}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    tickets, _ = corpus(args)
+    embeddings = ConceptEmbeddings()
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(
+            directory,
+            embeddings=embeddings,
+            ivf_probes=0,
+            retrieval_options=lambda _: RetrievalOptions(mode="hybrid", lexical_weight=2.0),
+        )
+        await store.add_documents(
+            "benchmark", tickets, embeddings.embed_documents([t["content"] for t in tickets])
+        )
+        dialogs = conversations(tickets, args)
+        print(f"{len(tickets)} tickets, {len(dialogs)} conversations")
+        print(
+            f"{'query rewriting':<22} {'hit@1':>6} {'hit@5':>6} {'p50 ms':>7} "
+            f"{'max ms':>7} {'fused':>6} {'over budget':>11}"
+        )
+        fast = StubLLM(latency=0, tokens=3, rewrite_latency=args.rewrite_latency)
+        slow = StubLLM(latency=0, tokens=3, rewrite_latency=args.budget_ms / 1000 * 2)
+        await run("off", store, fast, dialogs, False, args.budget_ms)
+        await run("on", store, fast, dialogs, True, args.budget_ms)
+        await run("on, rewriter too slow", store, slow, dialogs, True, args.budget_ms)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--rewrite-latency", type=float, default=0.05, help="seconds")
+    parser.add_argument("--budget-ms", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=150)
+    parser.add_argument("--tickets", type=int, default=20, help="tickets per topic")
+    parser.add_argument("--query-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
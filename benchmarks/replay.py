@@ -0,0 +1,178 @@
+"""
+Benchmarks - Cassette Replay
+Replays the turns of a cassette (CASSETTE_MODE=record, see
+src.infrastructure.cassette) through ConversationGraph, with the OpenAI and
+Azure AI Search calls served from the cassette with their recorded (or
+scaled) latencies, and reports latency percentiles, cache hit rates and the
+calls missing from the cassette. Any setting not about the cassette comes
+from the environment, so the effect of a cache, batching or concurrency
+change is measured by replaying the same cassette with and without it.
+
+`record` makes a cassette from a synthetic day of tickets against the local
+stub services, for trying this out without production traffic.
+
+Usage:
+    python -m benchmarks.replay record --cassette day.jsonl.gz [--tickets 300]
+    python -m benchmarks.replay replay --cassette day.jsonl.gz [--speed 10] [--latency-scale 1]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks import stub_azure_search, stub_openai
+from benchmarks.load import TOPICS
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import get_cassette, get_settings
+
+
+async def record(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    # A few questions make up most of the traffic, as in a real helpdesk
+    pool = [f"How do I {topic}, model {n}?" for topic in TOPICS for n in range(args.models)]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+
+    openai = stub_openai.create_app(chat_latency=args.llm_latency, completion_tokens=30)
+    search = stub_azure_search.create_app(latency=args.search_latency)
+    async with stub_openai.serve(openai, args.openai_port) as openai_url:
+        async with stub_openai.serve(search, args.search_port, path="") as search_url:
+            settings = get_settings()
+            settings.openai_base_url = openai_url
+            settings.azure_search_endpoint = search_url
+            settings.cassette_mode = "record"
+            settings.cassette_path = args.cassette
+            graph = ConversationGraph()
+            use_case = ProcessConversationUseCase(conversation_graph=graph)
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def ticket(helpdesk_id: int, start: float) -> None:
+                await asyncio.sleep(start)
+                messages: list[dict] = []
+                for _ in range(rng.randint(1, 4)):
+                    messages.append(
+                        {"role": "USER", "content": rng.choices(pool, weights)[0]}
+                    )
+                    async with semaphore:
+                        conversation = await use_case.execute(
+                            helpdesk_id=helpdesk_id,
+                            project_name="benchmark",
+                            messages=messages,
+                        )
+                    messages.append(
+                        {"role": "AGENT", "content": conversation.messages[-1].content}
+                    )
+
+            # Tickets open at random over `--duration` seconds
+            await asyncio.gather(
+                *(
+                    ticket(i + 1, rng.uniform(0, args.duration))
+                    for i in range(args.tickets)
+                )
+            )
+            await graph.close()
+
+    cassette = get_cassette()
+    assert cassette is not None
+    cassette.close()
+    print(f"{cassette.recorded} calls and turns recorded to {args.cassette}")
+
+
+async def replay(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    settings.cassette_mode = "replay"
+    settings.cassette_path = args.cassette
+    settings.cassette_latency_scale = args.latency_scale
+    # Nothing is sent, but the clients still need an address
+    settings.azure_search_endpoint = "http://127.0.0.1:9"
+    settings.openai_base_url = "http://127.0.0.1:9/v1"
+
+    cassette = get_cassette()
+    assert cassette is not None
+    turns = sorted(cassette.turns(), key=lambda turn: turn["arrival"])
+    graph = ConversationGraph()
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    # Turns of a ticket run in order, each after the previous one
+    previous: dict[int, asyncio.Task] = {}
+    latencies: list[float] = []
+    errors: list[str] = []
+    started = time.perf_counter()
+
+    async def turn(entry: dict, before: asyncio.Task | None) -> None:
+        if args.speed > 0:
+            await asyncio.sleep(
+                max(entry["arrival"] / args.speed - (time.perf_counter() - started), 0)
+            )
+        if before is not None:
+            await asyncio.wait([before])
+        async with semaphore:
+            issued = time.perf_counter()
+            try:
+                await use_case.execute(
+                    helpdesk_id=entry["helpdesk_id"],
+                    project_name=entry["project_name"],
+                    messages=entry["messages"],
+                )
+            except Exception as e:
+                errors.append(str(e))
+                return
+            latencies.append((time.perf_counter() - issued) * 1000)
+
+    tasks = []
+    for entry in turns:
+        task = asyncio.create_task(turn(entry, previous.get(entry["helpdesk_id"])))
+        previous[entry["helpdesk_id"]] = task
+        tasks.append(task)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    stats = graph.stats()
+    await graph.close()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(
+        f"{len(turns)} turns in {elapsed:.1f} s, {len(errors)} failed"
+        + (f" (e.g. {errors[0][:160]})" if errors else "")
+    )
+    print(
+        f"latency ms: p50 {quantiles[49]:.1f}  p95 {quantiles[94]:.1f}  p99 {quantiles[98]:.1f}"
+    )
+    print(
+        f"embedding cache hit rate {stats['embedding_cache'].get('hit_rate', 0):.1%}, "
+        f"retrieval cache hit rate {stats['retrieval_cache'].get('hit_rate', 0):.1%}"
+    )
+    print(f"cassette: {cassette.replayed} calls replayed, {cassette.misses} missing")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    recording = commands.add_parser("record", help="record a synthetic day")
+    recording.add_argument("--cassette", required=True)
+    recording.add_argument("--tickets", type=int, default=300)
+    recording.add_argument("--duration", type=float, default=30.0, help="seconds")
+    recording.add_argument("--models", type=int, default=10, help="question variants")
+    recording.add_argument("--concurrency", type=int, default=50)
+    recording.add_argument("--llm-latency", type=float, default=0.3)
+    recording.add_argument("--search-latency", type=float, default=0.05)
+    recording.add_argument("--seed", type=int, default=0)
+    recording.add_argument("--openai-port", type=int, default=8773)
+    recording.add_argument("--search-port", type=int, default=8774)
+
+    replaying = commands.add_parser("replay", help="replay a cassette")
+    replaying.add_argument("--cassette", required=True)
+    replaying.add_argument(
+        "--speed", type=float, default=0.0,
+        help="arrival time speed-up (0 sends every turn as soon as its ticket allows)",
+    )
+    replaying.add_argument("--latency-scale", type=float, default=1.0)
+    replaying.add_argument("--concurrency", type=int, default=50)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(record(args) if args.command == "record" else replay(args))
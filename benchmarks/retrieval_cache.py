@@ -0,0 +1,173 @@
+"""
+Benchmarks - Retrieval Result Cache
+Search latency distribution of AzureAISearchVectorStore on a workload of
+repeated queries (Zipf-distributed over a pool of questions and projects),
+with the result cache disabled and enabled. The search client is replaced by
+an in-process stand-in with `--latency` per call; query embeddings come from
+the stub embedding, as if served by the embedding cache. A document upload
+halfway through checks that the project's results are invalidated, and so
+does an upload from another process (through the shared write counters).
+
+Usage:
+    python -m benchmarks.retrieval_cache [--requests 5000] [--queries 500]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.stubs import stub_embedding
+
+from src.infrastructure import AzureAISearchVectorStore, FileCacheGenerations, get_settings
+
+
+class StubEmbeddings(Embeddings):
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [stub_embedding(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return stub_embedding(text)
+
+
+class StubResults:
+    """Async iterator over search results, like the SDK's paged results"""
+
+    def __init__(self, results: List[dict]):
+        self._results = iter(results)
+
+    def __aiter__(self) -> "StubResults":
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class StubSearchClient:
+    """Stand-in for the async SearchClient: fixed latency, results tagged by version"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.version = 0
+
+    async def search(self, search_text=None, vector_queries=None, filter=None, top=5, **_):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return StubResults(
+            [
+                {"@search.score": 1 / (i + 1), "content": f"{filter} v{self.version} #{i}"}
+                for i in range(top)
+            ]
+        )
+
+    async def upload_documents(self, documents):
+        self.version += 1
+        return []
+
+    async def close(self) -> None:
+        pass
+
+
+def build_workload(args: argparse.Namespace) -> list[tuple[str, str]]:
+    """(project, query) pairs; a few popular queries make up most of the traffic"""
+    rng = random.Random(args.seed)
+    pool = [
+        (f"project_{rng.randrange(args.projects)}", f"how do I fix problem number {i}")
+        for i in range(args.queries)
+    ]
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(pool))]
+    return rng.choices(pool, weights, k=args.requests)
+
+
+async def run(enabled: bool, args: argparse.Namespace) -> None:
+    settings = get_settings()
+    settings.retrieval_cache_enabled = enabled
+    settings.retrieval_cache_ttl_seconds = args.ttl
+    store = AzureAISearchVectorStore(embeddings=StubEmbeddings())
+    client = store.search_client = StubSearchClient(args.latency)  # type: ignore[assignment]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    workload = build_workload(args)
+    latencies: list[float] = []
+
+    async def one(project: str, query: str) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await store.similarity_search(query, k=5, project_name=project)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    half = len(workload) // 2
+    await asyncio.gather(*(one(*request) for request in workload[:half]))
+
+    # Writing documents of a project invalidates its cached results
+    project, query = workload[0]
+    await store.add_documents(project, [{"id": "1", "content": "new", "type": "doc"}], [[0.0]])
+    sections = await store.similarity_search(query, k=5, project_name=project)
+    assert f"v{client.version} " in sections[0].content, "stale results after an upload"
+
+    # ...and so does an upload by another process, e.g. the ingestion CLI
+    with tempfile.TemporaryDirectory() as directory:
+        store.generations = FileCacheGenerations(directory)
+        await store.similarity_search(query, k=5, project_name=project)
+        client.version += 1
+        subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys; from src.infrastructure.cache import FileCacheGenerations; "
+                "FileCacheGenerations(sys.argv[1]).bump(sys.argv[2])",
+                directory,
+                project,
+            ],
+            check=True,
+        )
+        sections = await store.similarity_search(query, k=5, project_name=project)
+        assert f"v{client.version} " in sections[0].content, "stale results after an ingestion"
+        if enabled:
+            latest = store.cached_search(query, k=5, project_name=project) or []
+            assert all(f"v{client.version} " in s.content for s in latest), "stale fallback"
+        store.generations = None
+
+    await asyncio.gather(*(one(*request) for request in workload[half:]))
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    stats = store.stats()["retrieval_cache"]
+    print(
+        f"{'on' if enabled else 'off':<6} {quantiles[49]:>7.2f} {quantiles[89]:>7.2f} "
+        f"{quantiles[98]:>7.2f} {client.calls:>9} "
+        + (f"{stats['hit_rate']:>9.1%}" if stats else f"{'-':>9}")
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(f"{args.requests} searches over {args.queries} queries, {args.latency * 1000:.0f} ms per call")
+    print(f"{'cache':<6} {'p50 ms':>7} {'p90 ms':>7} {'p99 ms':>7} {'searches':>9} {'hit rate':>9}")
+    for enabled in (False, True):
+        await run(enabled, args)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=500, help="distinct queries")
+    parser.add_argument("--projects", type=int, default=5)
+    parser.add_argument("--zipf", type=float, default=1.1, help="popularity skew")
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per search")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--ttl", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,118 @@
+"""
+Benchmarks - Turn Routing
+Tickets mixing questions with greetings and thanks, some of which run into
+the clarification limit and keep writing after being handed over: latency by
+path, vector searches and LLM calls with the turn router disabled and enabled.
+
+Usage:
+    python -m benchmarks.routing [--tickets 200] [--turns 6]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import get_settings
+
+QUESTIONS = [
+    "my printer shows error E-4021 after the firmware update",
+    "how do I reset the password of the admin portal",
+    "the invoice of order 88123 has the wrong address",
+    "o roteador reinicia sozinho a cada hora",
+]
+SMALL_TALK = ["hi", "hello!", "thanks!", "thank you so much", "bye", "obrigado!", "valeu"]
+
+
+def build_workload(args: argparse.Namespace) -> list[list[tuple[str, bool]]]:
+    """Per ticket, (message, clarify) turns; clarify makes the answer a clarification"""
+    rng = random.Random(args.seed)
+    tickets = []
+    for _ in range(args.tickets):
+        # These tickets exhaust the clarifications and are handed over midway
+        escalated = rng.random() < args.escalated
+        turns = []
+        for turn in range(args.turns):
+            if rng.random() < args.small_talk:
+                turns.append((rng.choice(SMALL_TALK), False))
+            else:
+                turns.append((rng.choice(QUESTIONS), escalated))
+        tickets.append(turns)
+    return tickets
+
+
+async def run(enabled: bool, args: argparse.Namespace) -> dict:
+    get_settings().router_enabled = enabled
+    llm = StubLLM(latency=args.llm_latency, tokens=args.tokens)
+    vector_store = StubVectorStore(latency=args.search_latency)
+    graph = ConversationGraph(vector_store=vector_store, llm=llm)  # type: ignore[arg-type]
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    latencies: dict[str, list[float]] = {}
+
+    async def ticket(helpdesk_id: int, turns: list[tuple[str, bool]]) -> None:
+        for message, clarify in turns:
+            llm.clarify = clarify
+            started = time.perf_counter()
+            await use_case.execute(
+                helpdesk_id=helpdesk_id,
+                project_name="benchmark",
+                messages=[{"role": "USER", "content": message}],
+            )
+            state = await graph.graph.aget_state({"configurable": {"thread_id": str(helpdesk_id)}})
+            latencies.setdefault(state.values["route"], []).append(
+                (time.perf_counter() - started) * 1000
+            )
+
+    started = time.perf_counter()
+    # Tickets run one after the other so that llm.clarify applies to the right turn
+    for helpdesk_id, turns in enumerate(build_workload(args)):
+        await ticket(helpdesk_id, turns)
+    total = time.perf_counter() - started
+    await graph.close()
+    return {
+        "latencies": latencies,
+        "total": total,
+        "searches": vector_store.calls,
+        "llm_calls": llm.calls,
+        "routes": graph.stats()["routes"],
+    }
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(
+        f"{'router':<7} {'path':<10} {'turns':>6} {'p50 ms':>7} "
+        f"{'searches':>9} {'llm calls':>10} {'total s':>8}"
+    )
+    for enabled in (False, True):
+        results = await run(enabled, args)
+        label = "on" if enabled else "off"
+        for path, latencies in sorted(results["latencies"].items()):
+            print(
+                f"{label:<7} {path:<10} {len(latencies):>6} "
+                f"{statistics.median(latencies):>7.1f}"
+            )
+        print(
+            f"{label:<7} {'all':<10} {sum(results['routes'].values()):>6} {'':>7} "
+            f"{results['searches']:>9} {results['llm_calls']:>10} {results['total']:>8.2f}"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=6, help="turns per ticket")
+    parser.add_argument("--small-talk", type=float, default=0.3, help="share of small talk")
+    parser.add_argument("--escalated", type=float, default=0.2, help="share handed over")
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--search-latency", type=float, default=0.01)
+    parser.add_argument("--tokens", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
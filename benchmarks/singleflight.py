@@ -0,0 +1,142 @@
+"""
+Benchmarks - Request Coalescing
+Fires N concurrent identical requests at the real AzureAISearchVectorStore and
+OpenAILLM adapters, with their upstream clients replaced by counting fakes,
+and checks that each upstream is called exactly once.
+
+Usage:
+    python -m benchmarks.singleflight [--requests 50]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import List
+
+from benchmarks.stubs import stub_embedding
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage
+
+from src.infrastructure import AzureAISearchVectorStore, OpenAILLM
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        self.calls += 1
+        return stub_embedding(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+class CountingSearchClient:
+    """Stands in for azure.search.documents.aio.SearchClient"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def search(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+        async def results():
+            for i in range(kwargs["top"]):
+                yield {"@search.score": 1.0 / (i + 1), "content": f"section {i}"}
+
+        return results()
+
+    async def close(self) -> None:
+        pass
+
+
+class CountingChatModel:
+    """Stands in for ChatOpenAI.ainvoke"""
+
+    model_name = "stub-chat"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, messages) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AIMessage(content="Restart the device and try again.")
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    embeddings = CountingEmbeddings()
+    vector_store = AzureAISearchVectorStore(embeddings=embeddings)
+    await vector_store.close()
+    vector_store.search_client = CountingSearchClient(args.latency)  # type: ignore[assignment]
+
+    llm = OpenAILLM()
+    llm.llm = CountingChatModel(args.latency)  # type: ignore[assignment]
+
+    started = time.perf_counter()
+    searches = await asyncio.gather(
+        *(
+            vector_store.similarity_search(
+                "The portal is down" if i % 2 else "  the PORTAL is down ",
+                k=5,
+                project_name="alpha",
+            )
+            for i in range(args.requests)
+        )
+    )
+    search_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    answers = await asyncio.gather(
+        *(
+            llm.generate_response(
+                user_message="The portal is down",
+                context="section 0",
+                conversation_history=[],
+                clarification_count=0,
+                max_clarifications=2,
+            )
+            for _ in range(args.requests)
+        )
+    )
+    generate_ms = (time.perf_counter() - started) * 1000
+
+    print(f"{'upstream':<12} {'requests':>9} {'calls':>6} {'elapsed ms':>11}")
+    print(f"{'embeddings':<12} {args.requests:>9} {embeddings.calls:>6} {search_ms:>11.1f}")
+    print(f"{'search':<12} {args.requests:>9} {vector_store.search_client.calls:>6} {search_ms:>11.1f}")
+    print(f"{'completion':<12} {args.requests:>9} {llm.llm.calls:>6} {generate_ms:>11.1f}")
+
+    assert embeddings.calls == 1, embeddings.calls
+    assert vector_store.search_client.calls == 1, vector_store.search_client.calls
+    assert llm.llm.calls == 1, llm.llm.calls
+    assert all(len(sections) == 5 for sections in searches)
+    assert len({answer for answer in answers}) == 1
+    # A later request is served by the result cache, if enabled, and not by
+    # the finished call: once the cache is dropped it searches again
+    await vector_store.similarity_search("The portal is down", k=5, project_name="alpha")
+    if vector_store.result_cache is not None:
+        assert vector_store.search_client.calls == 1, vector_store.search_client.calls
+        assert vector_store.result_cache.hits == 1, vector_store.result_cache.hits
+        vector_store.invalidate_cache("alpha")
+        await vector_store.similarity_search("The portal is down", k=5, project_name="alpha")
+    assert vector_store.search_client.calls == 2, vector_store.search_client.calls
+    print("OK: each upstream was called once for", args.requests, "concurrent requests")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
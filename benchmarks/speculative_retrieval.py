@@ -0,0 +1,86 @@
+"""
+Benchmarks - Speculative Retrieval
+End-to-end latency of a turn with the search for the last user message run
+after the checkpoint read (SPECULATIVE_RETRIEVAL=false) and overlapped with
+it, against a checkpointer whose reads take `--read-latency`, as a remote
+backend's would.
+
+Usage:
+    python -m benchmarks.speculative_retrieval [--turns 100] [--read-latency 0.03]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import get_settings
+
+
+class SlowMemorySaver(MemorySaver):
+    """MemorySaver whose reads take a fixed time"""
+
+    def __init__(self, read_latency: float):
+        super().__init__()
+        self.read_latency = read_latency
+
+    async def aget_tuple(self, config):
+        await asyncio.sleep(self.read_latency)
+        return await super().aget_tuple(config)
+
+
+async def run(enabled: bool, args: argparse.Namespace) -> list[float]:
+    get_settings().speculative_retrieval = enabled
+    graph = ConversationGraph(
+        vector_store=StubVectorStore(latency=args.search_latency),  # type: ignore[arg-type]
+        llm=StubLLM(latency=args.llm_latency, tokens=5),  # type: ignore[arg-type]
+        checkpointer=SlowMemorySaver(args.read_latency),
+    )
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    latencies = []
+    for turn in range(args.turns):
+        started = time.perf_counter()
+        await use_case.execute(
+            helpdesk_id=turn % args.tickets,
+            project_name="benchmark",
+            messages=[{"role": "USER", "content": f"how do I reset the router, case {turn}"}],
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+    await graph.close()
+    return latencies
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(
+        f"checkpoint read {args.read_latency * 1000:.0f} ms, search "
+        f"{args.search_latency * 1000:.0f} ms, LLM {args.llm_latency * 1000:.0f} ms"
+    )
+    print(f"{'speculative':<12} {'p50 ms':>8} {'p95 ms':>8}")
+    results = {}
+    for enabled in (False, True):
+        latencies = results[enabled] = await run(enabled, args)
+        print(
+            f"{'on' if enabled else 'off':<12} {statistics.median(latencies):>8.1f} "
+            f"{statistics.quantiles(latencies, n=20)[-1]:>8.1f}"
+        )
+    saved = statistics.median(results[False]) - statistics.median(results[True])
+    print(f"p50 reduction: {saved:.1f} ms")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--tickets", type=int, default=10)
+    parser.add_argument("--read-latency", type=float, default=0.03)
+    parser.add_argument("--search-latency", type=float, default=0.05)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
@@ -0,0 +1,96 @@
+"""
+Benchmarks - Streaming
+Compares time to first byte, first token and full answer between
+/conversations/completions and /conversations/completions:stream.
+
+Usage:
+    python -m benchmarks.streaming [--llm-latency 2.0]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.stubs import StubLLM, StubVectorStore
+
+import main
+from src.application import ConversationGraph
+
+
+def payload(helpdesk_id: int) -> dict:
+    return {
+        "helpdeskId": helpdesk_id,
+        "projectName": "benchmark",
+        "messages": [{"role": "USER", "content": "How do I reset my password?"}],
+    }
+
+
+async def measure_blocking(client: httpx.AsyncClient) -> None:
+    started = time.perf_counter()
+    response = await client.post("/conversations/completions", json=payload(1))
+    response.raise_for_status()
+    total = (time.perf_counter() - started) * 1000
+    print(f"{'completions':<12} {total:>10.1f} {'-':>10} {'-':>10} {total:>10.1f}")
+
+
+async def measure_streaming(client: httpx.AsyncClient) -> None:
+    started = time.perf_counter()
+    first_byte = first_sections = first_token = None
+    async with client.stream(
+        "POST", "/conversations/completions:stream", json=payload(2)
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            elapsed = (time.perf_counter() - started) * 1000
+            first_byte = first_byte or elapsed
+            if line == "event: sections":
+                first_sections = first_sections or elapsed
+            elif line == "event: token":
+                first_token = first_token or elapsed
+    total = (time.perf_counter() - started) * 1000
+    print(
+        f"{'stream':<12} {first_byte:>10.1f} {first_sections:>10.1f} "
+        f"{first_token:>10.1f} {total:>10.1f}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    main.conversation_graph = ConversationGraph(
+        vector_store=StubVectorStore(latency=args.search_latency),  # type: ignore[arg-type]
+        llm=StubLLM(latency=args.llm_latency, tokens=args.tokens),  # type: ignore[arg-type]
+    )
+    # A real server is needed: the in-memory ASGI transport buffers whole bodies
+    server = uvicorn.Server(
+        uvicorn.Config(main.app, port=args.port, log_level="warning", lifespan="off")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}") as client:
+            print(
+                f"{'endpoint':<12} {'TTFB ms':>10} {'sections':>10} "
+                f"{'token':>10} {'total ms':>10}"
+            )
+            await measure_blocking(client)
+            await measure_streaming(client)
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=2.0)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8765)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
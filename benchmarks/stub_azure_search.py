@@ -0,0 +1,56 @@
+"""
+Benchmarks - Stub Azure AI Search Service
+Local HTTP server answering the document search requests of the Azure AI
+Search SDK, for benchmarks that exercise the real SearchClient.
+"""
+
+import asyncio
+import hashlib
+import json
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.requests import ClientDisconnect
+
+WORDS = (
+    "account password reset portal invoice billing delivery order refund warranty "
+    "battery charger firmware update error code network router installation manual"
+).split()
+
+
+def create_app(latency: float = 0.05, section_words: int = 120) -> FastAPI:
+    """
+    Builds the stub service
+    Every search takes `latency` and returns `top` sections of `section_words`
+    words, derived from the query text and filter, so the same query always
+    gets the same sections (vector queries are told apart by their vector);
+    the search count is kept in app.state.
+    """
+    app = FastAPI()
+    app.state.searches = 0
+
+    # The SDK addresses the index as /indexes('name')/docs/search.post.search
+    @app.post("/indexes{index:path}/docs/search.post.search")
+    async def search(index: str, request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            return Response(status_code=499)
+        app.state.searches += 1
+        await asyncio.sleep(latency)
+
+        seed = json.dumps([body.get("search"), body.get("filter"), body.get("vectorQueries")])
+        value = []
+        for rank in range(body.get("top", 5)):
+            digest = hashlib.md5(f"{seed}|{rank}".encode()).digest()
+            words = [WORDS[(digest[i % 16] + i) % len(WORDS)] for i in range(section_words)]
+            value.append(
+                {
+                    "@search.score": 1 / (rank + 1),
+                    "content": f"Document {digest.hex()[:8]}: " + " ".join(words),
+                    "type": "document",
+                }
+            )
+        return JSONResponse({"value": value})
+
+    return app
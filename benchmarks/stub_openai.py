@@ -0,0 +1,175 @@
+"""
+Benchmarks - Stub OpenAI Service
+Local OpenAI-compatible HTTP server for benchmarks that exercise the real
+OpenAI client (connection pool, serialization) without leaving the host.
+"""
+
+import asyncio
+import base64
+import json
+import random
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+
+from benchmarks.stubs import stub_embedding
+
+
+def create_app(
+    latency: float = 0.05,
+    per_item_latency: float = 0.0005,
+    failure_rate: float = 0.0,
+    chat_latency: float = 0.3,
+    tokens_per_second: float = 50.0,
+    completion_tokens: int = 60,
+    chat_capacity: int = 0,
+) -> FastAPI:
+    """
+    Builds the stub service
+    Each embeddings request costs `latency` plus `per_item_latency` per input,
+    roughly the shape of the real API, and fails with a 503 with probability
+    `failure_rate`; request and input counts are kept in app.state.
+    Chat completions take `chat_latency` to the first token and then produce
+    `completion_tokens` tokens (at most max_tokens) at `tokens_per_second`,
+    streamed or not. Answers never contain a question mark, so they are never
+    taken for clarifications. With a `chat_capacity`, completions beyond that
+    many in progress are refused with a 429 and Retry-After, as the real API
+    does once an account's rate limit is reached.
+    """
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.inputs = 0
+    app.state.chat_requests = 0
+    app.state.chat_in_progress = 0
+    app.state.rate_limited = 0
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            # The client gave up (e.g. a cancelled benchmark run)
+            return Response(status_code=499)
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        app.state.requests += 1
+        if random.random() < failure_rate:
+            return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+        app.state.inputs += len(inputs)
+        await asyncio.sleep(latency + per_item_latency * len(inputs))
+
+        data = []
+        for i, text in enumerate(inputs):
+            vector = stub_embedding(str(text))
+            if body.get("encoding_format") == "base64":
+                encoded = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes())
+                vector = encoded.decode()  # type: ignore[assignment]
+            data.append({"object": "embedding", "index": i, "embedding": vector})
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "stub"),
+            "usage": {"prompt_tokens": len(inputs), "total_tokens": len(inputs)},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        try:
+            body = await request.json()
+        except ClientDisconnect:
+            return Response(status_code=499)
+        app.state.chat_requests += 1
+        if random.random() < failure_rate:
+            return JSONResponse({"error": {"message": "overloaded"}}, status_code=503)
+        if chat_capacity and app.state.chat_in_progress >= chat_capacity:
+            app.state.rate_limited += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": "1"},
+            )
+
+        count = min(completion_tokens, body.get("max_tokens") or completion_tokens)
+        tokens = ["Following the documentation,"] + [f" step{i}" for i in range(count - 1)]
+        usage = {
+            # About 4 characters per token, like the local estimate
+            "prompt_tokens": sum(len(str(m.get("content", ""))) for m in body["messages"]) // 4,
+            "completion_tokens": count,
+            "total_tokens": 0,
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + count
+        model = body.get("model", "stub")
+
+        if not body.get("stream"):
+            app.state.chat_in_progress += 1
+            try:
+                await asyncio.sleep(chat_latency + count / tokens_per_second)
+            finally:
+                app.state.chat_in_progress -= 1
+            return {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish_reason: str | None = None, **extra) -> str:
+            choices = [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            return "data: " + json.dumps(
+                {
+                    "id": "chatcmpl-stub",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": model,
+                    "choices": [] if extra else choices,
+                    **extra,
+                }
+            ) + "\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            try:
+                await asyncio.sleep(chat_latency)
+                yield chunk({"role": "assistant", "content": ""})
+                for token in tokens:
+                    await asyncio.sleep(1 / tokens_per_second)
+                    yield chunk({"content": token})
+                yield chunk({}, "stop")
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    yield chunk({}, usage=usage)
+                yield "data: [DONE]\n\n"
+            finally:
+                app.state.chat_in_progress -= 1
+
+        app.state.chat_in_progress += 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+@asynccontextmanager
+async def serve(app: FastAPI, port: int, path: str = "/v1") -> AsyncIterator[str]:
+    """Runs the app on a local port for the duration of the block, yielding its base URL"""
+    server = uvicorn.Server(
+        uvicorn.Config(app, port=port, log_level="warning", lifespan="off")
+    )
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    try:
+        yield f"http://127.0.0.1:{port}{path}"
+    finally:
+        server.should_exit = True
+        await serving
@@ -0,0 +1,169 @@
+"""
+Benchmarks - Stub Adapters
+In-process stand-ins for the vector store and LLM adapters with injected latency
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+
+from src.domain import RetrievedSection, VectorStore
+
+# Settings requires these values even though the stubs never use them
+for _name in (
+    "OPENAI_API_KEY",
+    "AZURE_SEARCH_ENDPOINT",
+    "AZURE_SEARCH_KEY",
+    "AZURE_SEARCH_INDEX_NAME",
+):
+    os.environ.setdefault(_name, "stub")
+# No write counters shared with other processes, unless a benchmark sets them up
+os.environ.setdefault("CACHE_GENERATION_DIR", "")
+
+
+def stub_embedding(text: str, dimension: int = 256) -> List[float]:
+    """
+    Deterministic bag-of-words embedding (feature hashing, L2-normalized)
+    Texts sharing most of their words get a high cosine similarity, which is
+    enough to exercise similarity-based caches without a real model
+    """
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in re.findall(r"\w+", text.casefold()):
+        digest = hashlib.md5(word.encode()).digest()
+        index = int.from_bytes(digest[:4], "little") % dimension
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+class StubVectorStore(VectorStore):
+    """
+    Stand-in for AzureAISearchVectorStore
+    When blocking is True the latency is spent in time.sleep, emulating a synchronous SDK
+    """
+
+    def __init__(self, latency: float = 0.05, blocking: bool = False):
+        super().__init__()
+        self.latency = latency
+        self.blocking = blocking
+        self.calls = 0
+        self.embedding_calls = 0
+
+    async def _wait(self, latency: float) -> None:
+        if self.blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+
+    async def embed_query(self, query: str) -> List[float]:
+        self.embedding_calls += 1
+        return stub_embedding(query)
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        self.embedding_calls += 1
+        return [stub_embedding(query) for query in queries]
+
+    async def similarity_search(
+        self, query: str, k: int = 5, project_name: str | None = None
+    ) -> List[RetrievedSection]:
+        self.calls += 1
+        await self._wait(self.latency)
+        return [
+            RetrievedSection(score=1.0 / (i + 1), content=f"{project_name} section {i}")
+            for i in range(k)
+        ]
+
+    async def add_documents(
+        self, project_name: str, documents: List[dict], vectors: List[List[float]]
+    ) -> None:
+        pass
+
+    async def delete_documents(self, project_name: str, ids: List[str]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+
+class StubLLM:
+    """
+    Stand-in for OpenAILLM
+    The latency is spread evenly over `tokens` generated tokens; with clarify
+    every answer is reported as a clarification question. Summaries take
+    `summary_latency` and the last history the prompt got is kept. Query
+    rewrites take `rewrite_latency` and prepend the previous user message.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        blocking: bool = False,
+        tokens: int = 20,
+        clarify: bool = False,
+        summary_latency: float = 0.5,
+        rewrite_latency: float = 0.3,
+    ):
+        self.latency = latency
+        self.blocking = blocking
+        self.tokens = tokens
+        self.clarify = clarify
+        self.summary_latency = summary_latency
+        self.rewrite_latency = rewrite_latency
+        self.calls = 0
+        self.summary_calls = 0
+        self.last_history: tuple[str, List[Dict[str, str]]] = ("", [])
+
+    async def _wait(self, latency: float) -> None:
+        if self.blocking:
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+
+    async def generate_response(
+        self,
+        user_message: str,
+        context: str,
+        conversation_history: List[Dict[str, str]],
+        clarification_count: int,
+        max_clarifications: int,
+        on_token: Callable[[str], None] | None = None,
+        history_summary: str = "",
+    ) -> tuple[str, bool]:
+        self.calls += 1
+        self.last_history = (history_summary, conversation_history)
+        tokens = [f"Answer to: {user_message} "] + [
+            f"token{i} " for i in range(self.tokens - 1)
+        ]
+        for token in tokens:
+            await self._wait(self.latency / self.tokens)
+            if on_token is not None:
+                on_token(token)
+        return "".join(tokens), self.clarify
+
+    async def summarize(
+        self, summary: str, messages: List[Dict[str, str]], max_tokens: int = 300
+    ) -> str:
+        self.summary_calls += 1
+        await self._wait(self.summary_latency)
+        # Keeps the first words of every message, within about max_tokens
+        words = summary.split() + [
+            word for message in messages for word in message["content"].split()[:3]
+        ]
+        return " ".join(words[-max_tokens * 3 // 4 :])
+
+    async def rewrite_queries(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        history_summary: str = "",
+        count: int = 3,
+    ) -> List[str]:
+        await self._wait(self.rewrite_latency)
+        previous = [m["content"] for m in conversation_history if m["role"] == "user"]
+        standalone = f"{previous[-1]} {user_message}" if previous else user_message
+        return [standalone, user_message][:count]
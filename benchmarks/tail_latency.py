@@ -0,0 +1,165 @@
+"""
+Benchmarks - Tail Latency Controls
+Turn latency of ConversationGraph over AzureAISearchVectorStore with a
+heavy-tailed search service: most searches take `--latency`, `--slow-rate`
+of them `--slow-latency`, `--hang-rate` of them hang for `--hang-latency`
+and `--failure-rate` of them fail. The search client is an in-process
+stand-in and the LLM the stub one; questions are Zipf-distributed over a
+pool, so popular ones have earlier results in the result cache.
+
+Configurations:
+- off: no request deadline, no retrieval budget, no hedging
+- hedged: searches still running after the p95 latency are sent again
+- deadline: the request deadline and retrieval budget; turns whose search
+  misses the budget are answered from cached results or with the degraded
+  message (failed searches are, in every configuration)
+- hedged+deadline: both
+
+Usage:
+    python -m benchmarks.tail_latency [--turns 3000] [--retrieval-budget-ms 1000]
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.load import percentile
+from benchmarks.retrieval_cache import StubEmbeddings, StubResults
+from benchmarks.stubs import StubLLM
+
+from src.application import ConversationGraph, ProcessConversationUseCase
+from src.infrastructure import AzureAISearchVectorStore, get_settings
+
+
+class HeavyTailSearchClient:
+    """Stand-in for the async SearchClient with occasional slow, hung and failed calls"""
+
+    def __init__(self, args: argparse.Namespace, rng: random.Random):
+        self.args = args
+        self.rng = rng
+        self.calls = 0
+
+    async def search(self, search_text=None, vector_queries=None, filter=None, top=5, **_):
+        self.calls += 1
+        draw = self.rng.random()
+        args = self.args
+        if draw < args.failure_rate:
+            await asyncio.sleep(args.latency)
+            raise RuntimeError("stub search failure")
+        if draw < args.failure_rate + args.hang_rate:
+            latency = args.hang_latency
+        elif draw < args.failure_rate + args.hang_rate + args.slow_rate:
+            latency = args.slow_latency
+        else:
+            latency = args.latency * self.rng.uniform(0.5, 1.5)
+        await asyncio.sleep(latency)
+        return StubResults(
+            [{"@search.score": 1 / (i + 1), "content": f"{filter} #{i}"} for i in range(top)]
+        )
+
+    async def close(self) -> None:
+        pass
+
+
+CONFIGURATIONS = {
+    "off": {"hedging": False, "deadline": False},
+    "hedged": {"hedging": True, "deadline": False},
+    "deadline": {"hedging": False, "deadline": True},
+    "hedged+deadline": {"hedging": True, "deadline": True},
+}
+
+
+async def run(name: str, args: argparse.Namespace) -> None:
+    configuration = CONFIGURATIONS[name]
+    settings = get_settings()
+    settings.retrieval_hedge_enabled = configuration["hedging"]
+    settings.request_deadline_ms = args.deadline_ms if configuration["deadline"] else 0
+    settings.retrieval_budget_ms = args.retrieval_budget_ms if configuration["deadline"] else 0
+    settings.retrieval_cache_ttl_seconds = args.cache_ttl
+
+    rng = random.Random(args.seed)
+    vector_store = AzureAISearchVectorStore(embeddings=StubEmbeddings())
+    client = vector_store.search_client = HeavyTailSearchClient(args, rng)  # type: ignore[assignment]
+    graph = ConversationGraph(
+        vector_store=vector_store,
+        llm=StubLLM(latency=args.llm_latency, tokens=5),  # type: ignore[arg-type]
+    )
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+
+    pool = [f"how do I fix problem number {i} on my router" for i in range(args.queries)]
+    weights = [1 / (rank + 1) for rank in range(len(pool))]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies: list[float] = []
+    errors: list[str] = []
+    degraded = 0
+
+    async def turn(helpdesk_id: int, question: str) -> None:
+        nonlocal degraded
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                conversation = await use_case.execute(
+                    helpdesk_id=helpdesk_id,
+                    project_name="benchmark",
+                    messages=[{"role": "USER", "content": question}],
+                )
+            except Exception as e:
+                errors.append(str(e))
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+            degraded += conversation.degraded
+
+    await asyncio.gather(
+        *(
+            turn(i + 1, question)
+            for i, question in enumerate(rng.choices(pool, weights, k=args.turns))
+        )
+    )
+    stats = graph.stats()
+    await graph.close()
+
+    print(
+        f"{name:<16} {percentile(latencies, 50):>7.0f} {percentile(latencies, 95):>7.0f} "
+        f"{percentile(latencies, 99):>7.0f} {max(latencies):>7.0f} {len(errors):>6} "
+        f"{degraded:>8} {stats['retrieval_cache']['latest_hits']:>7} "
+        f"{stats['search_hedging']['hedged']:>7} {client.calls:>8}"
+    )
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    print(
+        f"{args.turns} turns; searches {args.latency * 1000:.0f} ms, "
+        f"{args.slow_rate:.0%} at {args.slow_latency * 1000:.0f} ms, "
+        f"{args.hang_rate:.1%} hung for {args.hang_latency:.0f} s, {args.failure_rate:.1%} failed; "
+        f"retrieval budget {args.retrieval_budget_ms} ms"
+    )
+    print(
+        f"{'config':<16} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'max ms':>7} {'errors':>6} "
+        f"{'degraded':>8} {'cached':>7} {'hedged':>7} {'searches':>8}"
+    )
+    for name in CONFIGURATIONS:
+        await run(name, args)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=3000, help="distinct questions")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per search")
+    parser.add_argument("--slow-rate", type=float, default=0.04)
+    parser.add_argument("--slow-latency", type=float, default=0.8)
+    parser.add_argument("--hang-rate", type=float, default=0.005)
+    parser.add_argument("--hang-latency", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.005)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--deadline-ms", type=int, default=5000)
+    parser.add_argument("--retrieval-budget-ms", type=int, default=1000)
+    parser.add_argument("--cache-ttl", type=int, default=2, help="result cache TTL, seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main_async(parse_args()))
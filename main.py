@@ -8,8 +8,9 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.api import router
+from src.api import AdmissionMiddleware, MetricsMiddleware, router
 from src.application.graph import ConversationGraph
+from src.infrastructure import create_checkpointer
 from src.infrastructure.config import get_settings
 
 
@@ -24,11 +25,13 @@ async def lifespan(app: FastAPI):
     and cleanup on shutdown
     """
     global conversation_graph
-    # Startup: Initialize the graph once
-    conversation_graph = ConversationGraph()
-    yield
-    # Shutdown: Cleanup if needed
-    conversation_graph = None
+    # Startup: Initialize the graph once, on top of the configured checkpointer
+    async with create_checkpointer() as checkpointer:
+        conversation_graph = ConversationGraph(checkpointer=checkpointer)
+        yield
+        # Shutdown: Close the async HTTP sessions held by the adapters
+        await conversation_graph.close()
+        conversation_graph = None
 
 
 app = FastAPI(
@@ -40,6 +43,9 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Inside CORS, so that rejected requests get its headers, and inside metrics
+# (added last, the outermost), so that they are timed too
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -47,6 +53,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(router, tags=["conversations"])
 
@@ -1,21 +1,36 @@
 """API Layer - Initialization"""
 
+from src.api.middleware import AdmissionMiddleware, MetricsMiddleware
 from src.api.routes import router
 from src.api.schemas import (
+    BatchConversationRequest,
+    BatchConversationResult,
+    BatchErrorResponse,
+    ContextMetadataResponse,
     ConversationRequest,
     ConversationResponse,
+    ConversationStreamCompletion,
     ErrorResponse,
     MessageRequest,
     MessageResponse,
+    ResponseMetadata,
     SectionRetrievedResponse,
 )
 
 __all__ = [
+    "BatchConversationRequest",
+    "BatchConversationResult",
+    "BatchErrorResponse",
+    "ContextMetadataResponse",
     "ConversationRequest",
     "ConversationResponse",
+    "ConversationStreamCompletion",
     "MessageRequest",
     "MessageResponse",
     "SectionRetrievedResponse",
+    "ResponseMetadata",
     "ErrorResponse",
+    "AdmissionMiddleware",
+    "MetricsMiddleware",
     "router",
 ]
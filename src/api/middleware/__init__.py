@@ -0,0 +1,132 @@
+"""
+API Layer - Middleware
+Request metrics, the Server-Timing header and admission control
+"""
+
+import math
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.domain import ServiceOverloadedException
+from src.infrastructure import (
+    format_server_timing,
+    get_admission_queue,
+    get_metrics,
+    get_settings,
+    start_server_timing,
+)
+
+
+class MetricsMiddleware:
+    """
+    Times every request until its response headers are sent
+    Pattern: Decorator - wraps the ASGI app without buffering the response,
+    so streamed endpoints keep sending their events as they are produced.
+
+    With SERVER_TIMING_ENABLED, the response also gets a Server-Timing header
+    with the graph nodes and upstream calls of the request. Streamed responses
+    send their headers before the graph runs, so theirs has little more than
+    the total.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.metrics = get_metrics()
+        self.server_timing = get_settings().server_timing_enabled
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not (self.metrics.enabled or self.server_timing):
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = start_server_timing() if self.server_timing else None
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                if self.metrics.enabled:
+                    # The route template, not the path, keeps the label set bounded
+                    route = scope.get("route")
+                    self.metrics.request_duration.observe(
+                        elapsed,
+                        scope["method"],
+                        getattr(route, "path", "unmatched"),
+                        str(message["status"]),
+                    )
+                if timings is not None:
+                    value = format_server_timing([*timings, ("total", elapsed * 1000)])
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", value.encode()),
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+class AdmissionMiddleware:
+    """
+    Bounded queue in front of the conversation routes
+    Pattern: Decorator - a request runs once the AdmissionQueue gives it a
+    turn, and keeps it until its response (streamed ones included) is sent.
+    When the queue is full the request is rejected at once with 429, and when
+    its turn does not come within API_QUEUE_TIMEOUT_MS with 503, both with a
+    Retry-After header, so an overload turns into quick rejections instead of
+    requests timing out while the upstreams are swamped. Health checks,
+    /stats and /metrics are never queued.
+
+    A batch request takes a single turn too; its conversations are bounded by
+    BATCH_CONCURRENCY across every batch (see get_batch_limiter), and its
+    duration is left out of the service time behind Retry-After.
+    """
+
+    PREFIX = "/conversations"
+    BATCH_PATH = "/conversations/completions:batch"
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.queue = get_admission_queue()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            self.queue is None
+            or scope["type"] != "http"
+            or not scope["path"].startswith(self.PREFIX)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if self.queue.full:
+            error = self.queue.reject()
+            await self._reject(error, 429, scope, receive, send)
+            return
+        try:
+            await self.queue.enter()
+        except ServiceOverloadedException as e:
+            await self._reject(e, 503, scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queue.leave(None if scope["path"] == self.BATCH_PATH else elapsed)
+
+    @staticmethod
+    async def _reject(
+        error: ServiceOverloadedException,
+        status_code: int,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        response = JSONResponse(
+            {"detail": f"Service overloaded: {error}"},
+            status_code=status_code,
+            headers={"Retry-After": str(max(math.ceil(error.retry_after), 1))},
+        )
+        await response(scope, receive, send)
@@ -3,22 +3,43 @@ API Layer - Routes
 Define the REST API routes
 """
 
+import json
+import math
+import os
+import sys
+from typing import Any, AsyncIterator
+
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 
 from src.api.schemas import (
+    BatchConversationRequest,
+    BatchConversationResult,
+    BatchErrorResponse,
+    ContextMetadataResponse,
     ConversationRequest,
     ConversationResponse,
+    ConversationStreamCompletion,
     ErrorResponse,
     MessageResponse,
+    ResponseMetadata,
     SectionRetrievedResponse,
 )
 from src.application import ConversationGraph, ProcessConversationUseCase
 from src.domain import (
+    ConversationState,
     DomainException,
     InvalidMessageException,
     LLMException,
+    ServiceOverloadedException,
     VectorStoreException,
 )
+from src.infrastructure import (
+    get_admission_queue,
+    get_batch_limiter,
+    get_metrics,
+    get_settings,
+)
 
 router = APIRouter()
 
@@ -39,7 +60,9 @@ def get_conversation_graph() -> ConversationGraph:
     status_code=status.HTTP_200_OK,
     responses={
         400: {"model": ErrorResponse},
+        429: {"model": ErrorResponse},
         500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
     },
     summary="Process a conversation with RAG",
     description="""
@@ -70,49 +93,247 @@ async def process_conversation(
         # Execute the use case with the shared graph instance
         use_case = ProcessConversationUseCase(conversation_graph=graph)
 
-        conversation = use_case.execute(
+        conversation = await use_case.execute(
             helpdesk_id=request.helpdeskId,
             project_name=request.projectName,
             messages=[msg.model_dump() for msg in request.messages],
         )
 
-        # Convert to response format
-        response = ConversationResponse(
-            messages=[
-                MessageResponse(role=msg.role.value, content=msg.content)
-                for msg in conversation.message_id_history
-            ],
-            handoverToHumanNeeded=conversation.handover_to_human_needed,
-            sectionsRetrieved=[
-                SectionRetrievedResponse(score=section.score, content=section.content)
-                for section in conversation.sections_retrieved
-            ],
+        return _to_response(conversation)
+
+    except Exception as e:
+        raise _to_http_exception(e)
+
+
+@router.post(
+    "/conversations/completions:stream",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"content": {"text/event-stream": {}}},
+        400: {"model": ErrorResponse},
+        429: {"model": ErrorResponse},
+        500: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+    summary="Process a conversation with RAG, streaming the answer",
+    description="""
+    Same flow as `/conversations/completions`, delivered as Server-Sent Events:
+
+    1. `sections`: the retrieved sections, sent as soon as retrieval finishes
+    2. `token`: one event per generated token of the agent answer
+    3. `done`: the final conversation, including handover and clarification state
+    4. `error`: sent instead of `done` if processing fails mid-stream
+
+    A turn that cannot be answered in time (see `REQUEST_DEADLINE_MS`) streams
+    the degraded message as its tokens and ends with `done`, whose
+    `metadata.degraded` is true. If generation runs out of time after some
+    tokens were sent, the stream ends with `error` instead: the partial answer
+    is not part of the conversation and should be discarded.
+    """,
+)
+async def stream_conversation(
+    request: ConversationRequest,
+    graph: ConversationGraph = Depends(get_conversation_graph),
+) -> StreamingResponse:
+    """
+    Streaming endpoint to process conversations with RAG
+
+    Args:
+        request: Conversation data (helpdeskId, projectName, messages)
+        graph: Injected ConversationGraph instance
+
+    Returns:
+        Server-Sent Events stream with sections, tokens and the final conversation
+    """
+    try:
+        use_case = ProcessConversationUseCase(conversation_graph=graph)
+
+        events = use_case.stream(
+            helpdesk_id=request.helpdeskId,
+            project_name=request.projectName,
+            messages=[msg.model_dump() for msg in request.messages],
         )
 
-        return response
+    except Exception as e:
+        raise _to_http_exception(e)
+
+    return StreamingResponse(
+        _to_server_sent_events(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post(
+    "/conversations/completions:batch",
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"content": {"application/x-ndjson": {}}},
+        400: {"model": ErrorResponse},
+        429: {"model": ErrorResponse},
+        503: {"model": ErrorResponse},
+    },
+    summary="Process many conversations with RAG, e.g. for backfills",
+    description="""
+    Same flow as `/conversations/completions` for up to `BATCH_MAX_CONVERSATIONS`
+    conversations per request. Their queries are embedded in bulk and they are
+    processed `BATCH_CONCURRENCY` at a time, counting every batch in progress
+    (conversations of the same ticket in request order).
+
+    The response is newline-delimited JSON, one line per conversation in the
+    order they finish: `index` (position in the request), `helpdeskId`, and
+    either `response` (as returned by `/conversations/completions`) or `error`
+    (`status` and `detail` of the error that endpoint would have returned).
+    """,
+)
+async def process_conversation_batch(
+    request: BatchConversationRequest,
+    graph: ConversationGraph = Depends(get_conversation_graph),
+) -> StreamingResponse:
+    """
+    Batch endpoint to process conversations with RAG
+
+    Args:
+        request: Conversations (helpdeskId, projectName, messages)
+        graph: Injected ConversationGraph instance
 
-    except InvalidMessageException as e:
+    Returns:
+        NDJSON stream with the result of every conversation
+    """
+    settings = get_settings()
+    if len(request.conversations) > settings.batch_max_conversations:
         raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch holds at most {settings.batch_max_conversations} conversations",
+        )
+
+    use_case = ProcessConversationUseCase(conversation_graph=graph)
+    results = use_case.execute_many(
+        [
+            {
+                "helpdesk_id": conversation.helpdeskId,
+                "project_name": conversation.projectName,
+                "messages": [msg.model_dump() for msg in conversation.messages],
+            }
+            for conversation in request.conversations
+        ],
+        concurrency=settings.batch_concurrency,
+        limiter=get_batch_limiter(),
+    )
+
+    return StreamingResponse(
+        _to_ndjson(request, results), media_type="application/x-ndjson"
+    )
+
+
+async def _to_ndjson(
+    request: BatchConversationRequest,
+    results: AsyncIterator[tuple[int, ConversationState | Exception]],
+) -> AsyncIterator[str]:
+    """Serializes the results of a batch as newline-delimited JSON"""
+    async for index, result in results:
+        line = BatchConversationResult(
+            index=index, helpdeskId=request.conversations[index].helpdeskId
+        )
+        if isinstance(result, Exception):
+            error = _to_http_exception(result)
+            line.error = BatchErrorResponse(status=error.status_code, detail=error.detail)
+        else:
+            line.response = _to_response(result)
+        yield line.model_dump_json() + "\n"
+
+
+async def _to_server_sent_events(
+    events: AsyncIterator[tuple[str, Any]],
+) -> AsyncIterator[str]:
+    """Serializes the graph events in the Server-Sent Events wire format"""
+    try:
+        async for event, payload in events:
+            if event == "token":
+                data: Any = {"content": payload}
+            elif event == "sections":
+                data = [
+                    SectionRetrievedResponse(
+                        score=section.score, content=section.content
+                    ).model_dump()
+                    for section in payload
+                ]
+            else:
+                data = ConversationStreamCompletion(
+                    **_to_response(payload).model_dump(),
+                    clarificationCount=payload.clarification_count,
+                ).model_dump()
+
+            yield _format_event(event, data)
+
+    except Exception as e:
+        yield _format_event("error", {"detail": _to_http_exception(e).detail})
+
+
+def _format_event(event: str, data: Any) -> str:
+    """Formats a single Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _to_response(conversation: ConversationState) -> ConversationResponse:
+    """Converts the conversation aggregate to the response format"""
+    report = conversation.context_report
+    return ConversationResponse(
+        messages=[
+            MessageResponse(role=msg.role.value, content=msg.content)
+            for msg in conversation.message_id_history
+        ],
+        handoverToHumanNeeded=conversation.handover_to_human_needed,
+        sectionsRetrieved=[
+            SectionRetrievedResponse(score=section.score, content=section.content)
+            for section in conversation.sections_retrieved
+        ],
+        metadata=ResponseMetadata(
+            context=ContextMetadataResponse(
+                tokenBudget=report.token_budget,
+                tokensUsed=report.tokens_used,
+                sectionsUsed=report.sections_used,
+                duplicatesDropped=report.duplicates_dropped,
+                overBudgetDropped=report.over_budget_dropped,
+                truncated=report.truncated,
+            )
+            if report is not None
+            else None,
+            degraded=conversation.degraded,
+        ),
+    )
+
+
+def _to_http_exception(e: Exception) -> HTTPException:
+    """Maps domain and unexpected errors to HTTP errors"""
+    if isinstance(e, InvalidMessageException):
+        return HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Invalid message: {str(e)}",
         )
 
-    except (VectorStoreException, LLMException) as e:
-        raise HTTPException(
+    if isinstance(e, ServiceOverloadedException):
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Service overloaded: {str(e)}",
+            headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+        )
+
+    if isinstance(e, (VectorStoreException, LLMException)):
+        return HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Internal error: {str(e)}",
         )
 
-    except DomainException as e:
-        raise HTTPException(
+    if isinstance(e, DomainException):
+        return HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail=f"Domain error: {str(e)}"
         )
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Unexpected error: {str(e)}",
-        )
+    return HTTPException(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        detail=f"Unexpected error: {str(e)}",
+    )
 
 
 @router.get(
@@ -124,3 +345,62 @@ async def process_conversation(
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
+
+
+@router.get(
+    "/stats",
+    status_code=status.HTTP_200_OK,
+    summary="Runtime statistics",
+    description="Memory and thread-count gauges of the checkpoint store and the process",
+)
+async def runtime_stats(
+    graph: ConversationGraph = Depends(get_conversation_graph),
+) -> dict[str, Any]:
+    """Runtime statistics endpoint"""
+    return _runtime_stats(graph)
+
+
+@router.get(
+    "/metrics",
+    status_code=status.HTTP_200_OK,
+    response_class=PlainTextResponse,
+    summary="Prometheus metrics",
+    description="""
+    Latency histograms of the API routes, graph nodes and upstream calls
+    (OpenAI, Azure AI Search, checkpoint backend), LLM token counters, stage
+    timeouts, degraded answers and hedged searches, and the
+    runtime statistics of `/stats` (cache hit rates among them) as gauges, in
+    the Prometheus text format.
+    """,
+)
+async def prometheus_metrics(
+    graph: ConversationGraph = Depends(get_conversation_graph),
+) -> PlainTextResponse:
+    """Prometheus metrics endpoint"""
+    stats = _runtime_stats(graph)
+    return PlainTextResponse(
+        get_metrics().render(stats), media_type="text/plain; version=0.0.4"
+    )
+
+
+def _runtime_stats(graph: ConversationGraph) -> dict[str, Any]:
+    """Gauges of the graph, the admission queue and the process"""
+    queue = get_admission_queue()
+    return {
+        **graph.stats(),
+        "admission": queue.stats() if queue else {},
+        "process": {"rss_bytes": _process_rss_bytes()},
+    }
+
+
+def _process_rss_bytes() -> int:
+    """Current resident set size; falls back to the peak where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+
+        # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
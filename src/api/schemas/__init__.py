@@ -26,6 +26,12 @@ class ConversationRequest(BaseModel):
         populate_by_name = True
 
 
+class BatchConversationRequest(BaseModel):
+    """DTO for a batch of conversations"""
+
+    conversations: List[ConversationRequest] = Field(..., min_length=1)
+
+
 class MessageResponse(BaseModel):
     """DTO for response message"""
 
@@ -40,6 +46,33 @@ class SectionRetrievedResponse(BaseModel):
     content: str
 
 
+class ContextMetadataResponse(BaseModel):
+    """
+    DTO for how the retrieved sections were packed into the prompt
+    Sections are referred to by their position in sectionsRetrieved
+    """
+
+    tokenBudget: int = Field(..., alias="tokenBudget")
+    tokensUsed: int = Field(..., alias="tokensUsed")
+    sectionsUsed: List[int] = Field(..., alias="sectionsUsed")
+    duplicatesDropped: List[int] = Field(..., alias="duplicatesDropped")
+    overBudgetDropped: List[int] = Field(..., alias="overBudgetDropped")
+    truncated: List[int]
+
+    class Config:
+        populate_by_name = True
+
+
+class ResponseMetadata(BaseModel):
+    """DTO for processing details of a response"""
+
+    # Absent when the answer was served from the answer cache
+    context: ContextMetadataResponse | None = None
+    # The answer is the degraded message: the documentation could not be
+    # searched (or the answer generated) in time
+    degraded: bool = False
+
+
 class ConversationResponse(BaseModel):
     """DTO for conversation response"""
 
@@ -48,12 +81,38 @@ class ConversationResponse(BaseModel):
     sectionsRetrieved: List[SectionRetrievedResponse] = Field(
         ..., alias="sectionsRetrieved"
     )
+    metadata: ResponseMetadata = Field(default_factory=ResponseMetadata)
 
     class Config:
         populate_by_name = True
 
 
+class ConversationStreamCompletion(ConversationResponse):
+    """DTO for the closing event of a streamed conversation"""
+
+    clarificationCount: int = Field(..., alias="clarificationCount")
+
+
 class ErrorResponse(BaseModel):
     """DTO for error response"""
 
     detail: str
+
+
+class BatchErrorResponse(ErrorResponse):
+    """DTO for a conversation of a batch that failed"""
+
+    status: int
+
+
+class BatchConversationResult(BaseModel):
+    """DTO for one line of a batch response"""
+
+    # Position of the conversation in the request
+    index: int
+    helpdeskId: int = Field(..., alias="helpdeskId")
+    response: ConversationResponse | None = None
+    error: BatchErrorResponse | None = None
+
+    class Config:
+        populate_by_name = True
@@ -1,9 +1,18 @@
 """Application Layer - Initialization"""
 
+from src.application.context import ContextBuilder
 from src.application.graph import ConversationGraph
+from src.application.history import HistoryManager, PromptHistory
+from src.application.retrieval import MultiQueryRetriever
+from src.application.router import TurnRouter
 from src.application.use_cases import ProcessConversationUseCase
 
 __all__ = [
+    "ContextBuilder",
     "ConversationGraph",
+    "HistoryManager",
+    "MultiQueryRetriever",
+    "PromptHistory",
+    "TurnRouter",
     "ProcessConversationUseCase",
 ]
@@ -0,0 +1,125 @@
+"""
+Application Layer - Context Builder
+Assembles the retrieved sections into the prompt context within a token budget
+"""
+
+import re
+from typing import Callable, List
+
+import numpy as np
+
+from src.domain import ContextReport, RetrievedSection
+
+
+class ContextBuilder:
+    """
+    Packs retrieved sections into the prompt context
+    Sections are ordered by Maximal Marginal Relevance, trading the retrieval
+    score against the similarity to sections already picked. Near-duplicates of
+    a picked section are dropped, and the rest are added in that order while
+    they fit in the token budget (a first section that does not fit on its own
+    is truncated). Similarity uses the section embeddings when the backend
+    returns them, word overlap otherwise.
+    Principle: Single Responsibility - decides what the LLM sees, not how it is retrieved
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        token_budget: int = 3000,
+        mmr_lambda: float = 0.7,
+        duplicate_threshold: float = 0.95,
+    ):
+        """
+        Args:
+            count_tokens: Token counter of the chat model
+            token_budget: Maximum context tokens (0 = no limit)
+            mmr_lambda: Weight of relevance against novelty (1 ignores novelty)
+            duplicate_threshold: Similarity from which a section counts as a duplicate
+        """
+        self.count_tokens = count_tokens
+        self.token_budget = token_budget
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    def build(self, sections: List[RetrievedSection]) -> tuple[str, ContextReport]:
+        """Returns the context text and the report of what was kept and dropped"""
+        report = ContextReport(token_budget=self.token_budget, tokens_used=0)
+        order, report.duplicates_dropped = self._rank(sections)
+
+        parts = []
+        for i in order:
+            part = self._format(sections[i])
+            tokens = self.count_tokens(part)
+            if self.token_budget and report.tokens_used + tokens > self.token_budget:
+                if report.sections_used:
+                    report.over_budget_dropped.append(i)
+                    continue
+                part, tokens = self._truncate(sections[i], self.token_budget)
+                report.truncated.append(i)
+            parts.append(part)
+            report.sections_used.append(i)
+            report.tokens_used += tokens
+        return "\n\n".join(parts), report
+
+    def _rank(self, sections: List[RetrievedSection]) -> tuple[List[int], List[int]]:
+        """MMR order of the sections, and the near-duplicates left out of it"""
+        if not sections:
+            return [], []
+        scores = np.array([section.score for section in sections], dtype=np.float32)
+        spread = scores.max() - scores.min()
+        # Scores are cosine, BM25 or fusion scores depending on the retrieval mode
+        relevance = (scores - scores.min()) / spread if spread else np.ones_like(scores)
+        similarity = self._similarity(sections)
+
+        order: List[int] = []
+        duplicates: List[int] = []
+        remaining = list(range(len(sections)))
+        while remaining:
+            redundancy = (
+                similarity[remaining][:, order].max(axis=1)
+                if order
+                else np.zeros(len(remaining), dtype=np.float32)
+            )
+            value = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(value))
+            index = remaining.pop(best)
+            if redundancy[best] >= self.duplicate_threshold:
+                duplicates.append(index)
+            else:
+                order.append(index)
+        return order, duplicates
+
+    @staticmethod
+    def _similarity(sections: List[RetrievedSection]) -> np.ndarray:
+        if all(section.embedding is not None for section in sections):
+            vectors = np.array([section.embedding for section in sections], dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors /= np.where(norms == 0, 1, norms)
+            return vectors @ vectors.T
+
+        # Jaccard similarity of the word sets
+        words = [set(re.findall(r"\w+", section.content.lower())) for section in sections]
+        similarity = np.zeros((len(sections), len(sections)), dtype=np.float32)
+        for i, a in enumerate(words):
+            for j, b in enumerate(words[: i + 1]):
+                union = len(a | b)
+                similarity[i, j] = similarity[j, i] = len(a & b) / union if union else 1.0
+        return similarity
+
+    @staticmethod
+    def _format(section: RetrievedSection) -> str:
+        return f"[Score: {section.score:.4f}]\n{section.content}"
+
+    def _truncate(self, section: RetrievedSection, budget: int) -> tuple[str, int]:
+        """Cuts a section at a word boundary so that it fits in the budget"""
+        content = section.content
+        part = self._format(section)
+        tokens = self.count_tokens(part)
+        while tokens > budget and content:
+            keep = int(len(content) * budget / tokens * 0.95)
+            cut = content.rfind(" ", 0, keep)
+            content = content[: cut if cut > 0 else keep]
+            part = self._format(section.model_copy(update={"content": content}))
+            tokens = self.count_tokens(part)
+        return part, tokens
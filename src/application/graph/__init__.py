@@ -3,15 +3,42 @@ Application Layer - LangGraph State Machine
 Implements the conversation flow using LangGraph
 """
 
+import asyncio
+import functools
 from operator import add
-from typing import Annotated, List, TypedDict
+from typing import Annotated, Any, AsyncIterator, Awaitable, Callable, List, TypedDict
 
 from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_stream_writer
 from langgraph.graph import END, START, StateGraph
 
-from src.domain import ConversationState, RetrievedSection
-from src.infrastructure import AzureAISearchVectorStore, OpenAILLM, get_settings
+from src.application.context import ContextBuilder
+from src.application.history import HistoryManager
+from src.application.retrieval import MultiQueryRetriever
+from src.application.router import TurnRouter
+from src.domain import (
+    ContextReport,
+    ConversationState,
+    LLMException,
+    MessageRole,
+    RetrievedSection,
+    ServiceOverloadedException,
+    VectorStore,
+    VectorStoreException,
+)
+from src.infrastructure import (
+    Deadline,
+    OpenAILLM,
+    SemanticAnswerCache,
+    create_token_counter,
+    create_vector_store,
+    get_metrics,
+    get_settings,
+    history_fingerprint,
+    instrument_checkpointer,
+)
 
 
 class GraphState(TypedDict):
@@ -23,13 +50,23 @@ class GraphState(TypedDict):
     helpdesk_id: int
     project_name: str
     messages: Annotated[List[dict], add]
+    # Rolling summary of messages[:summarized_messages]
+    history_summary: str
+    summarized_messages: int
     current_query: str
     retrieved_context: str
     sections_retrieved: List[dict]
+    context_report: dict
     clarification_count: int
     handover_to_human_needed: bool
     agent_response: str
     is_clarification: bool
+    answer_cache_hit: bool
+    # Path of the turn chosen by the router: retrieval, small_talk or handover
+    route: str
+    # The search failed or missed its budget, or generation ran out of time:
+    # the turn is answered with the degraded message
+    degraded: bool
 
 
 class ConversationGraph:
@@ -39,19 +76,135 @@ class ConversationGraph:
     Principle: Single Responsibility - responsible only for orchestration
     """
 
-    def __init__(self):
-        """Initializes the conversation graph"""
+    def __init__(
+        self,
+        vector_store: VectorStore | None = None,
+        llm: OpenAILLM | None = None,
+        checkpointer: BaseCheckpointSaver | None = None,
+    ):
+        """
+        Initializes the conversation graph
+
+        Args:
+            vector_store: Optional vector store adapter (defaults to the backend
+                selected in the settings, see create_vector_store)
+            llm: Optional LLM adapter (defaults to OpenAI)
+            checkpointer: Optional checkpoint backend (defaults to in-process memory),
+                see src.infrastructure.checkpoint.create_checkpointer
+        """
         self.settings = get_settings()
-        self.vector_store = AzureAISearchVectorStore()
-        self.llm = OpenAILLM()
+        self.vector_store = vector_store or create_vector_store()
+        self.llm = llm or OpenAILLM()
+        self.checkpointer = checkpointer or MemorySaver()
+        self.metrics = get_metrics()
+        instrument_checkpointer(self.checkpointer, self.metrics)
+        count_tokens = create_token_counter(self.settings.openai_chat_model)
+        self.context_builder = ContextBuilder(
+            count_tokens=count_tokens,
+            token_budget=self.settings.context_token_budget,
+            mmr_lambda=self.settings.context_mmr_lambda,
+            duplicate_threshold=self.settings.context_duplicate_threshold,
+        )
+        self.history = HistoryManager(
+            count_tokens=count_tokens,
+            window_turns=self.settings.history_window_turns,
+            max_tokens=self.settings.history_max_tokens,
+        )
+        self.retriever = (
+            MultiQueryRetriever(
+                vector_store=self.vector_store,
+                llm=self.llm,
+                count=self.settings.query_rewrite_count,
+                budget_ms=self.settings.query_rewrite_budget_ms,
+                rrf_k=self.settings.retrieval_rrf_k,
+            )
+            if self.settings.query_rewrite_enabled
+            else None
+        )
+        self.router = TurnRouter(
+            enabled=self.settings.router_enabled,
+            small_talk_max_words=self.settings.router_small_talk_max_words,
+        )
+        # Background summary refreshes, at most one per thread
+        self._summaries: dict[str, asyncio.Task] = {}
+        self.answer_cache = (
+            SemanticAnswerCache(
+                threshold=self.settings.answer_cache_threshold,
+                ttl_seconds=self.settings.answer_cache_ttl_seconds,
+                max_entries=self.settings.answer_cache_max_entries,
+            )
+            if self.settings.answer_cache_enabled
+            else None
+        )
+        if self.answer_cache is not None:
+            # Answers are dropped along with the store's cached results, i.e.
+            # whenever documents of the project are written, by any process
+            self.vector_store.add_invalidation_listener(self.invalidate_answers)
         self.graph = self._build_graph()
 
+    async def close(self) -> None:
+        """Stops the background summary refreshes and releases the adapters' resources"""
+        for task in list(self._summaries.values()):
+            task.cancel()
+        await asyncio.gather(*self._summaries.values(), return_exceptions=True)
+        await self.vector_store.close()
+
+    def stats(self) -> dict[str, Any]:
+        """Operational gauges of the graph and its adapters"""
+        checkpointer_stats = getattr(self.checkpointer, "stats", None)
+        vector_store_stats = getattr(self.vector_store, "stats", None)
+        llm_stats = getattr(self.llm, "stats", None)
+        return {
+            "checkpoints": checkpointer_stats() if checkpointer_stats else {},
+            **(vector_store_stats() if vector_store_stats else {}),
+            **(llm_stats() if llm_stats else {}),
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else {},
+            "routes": self.router.stats.as_dict(),
+            "query_rewrite": self.retriever.stats.as_dict() if self.retriever else {},
+            "history": {
+                **self.history.stats.as_dict(),
+                "pending_summaries": len(self._summaries),
+            },
+        }
+
+    async def prefetch_embeddings(self, queries: List[str]) -> None:
+        """
+        Embeds the queries of many conversations in one batch ahead of processing
+        Their searches and answer cache lookups then find the embeddings in the
+        query embedding cache. Best effort: if the batch fails, every
+        conversation embeds its own query as usual.
+        """
+        queries = list(
+            dict.fromkeys(
+                query
+                for query in queries
+                if not (self.router.enabled and self.router.is_small_talk(query))
+            )
+        )
+        if not queries:
+            return
+        try:
+            await self.vector_store.embed_queries(queries)
+        except VectorStoreException:
+            pass
+
+    def invalidate_answers(self, project_name: str) -> None:
+        """Drops the cached answers of a project, e.g. after its documents changed"""
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(project_name)
+
     def _build_graph(self):
         """
         Builds the conversation state graph
 
         Flow:
-        1. retrieve_context: Retrieves context from vector store
+        0. route_turn: a turn of a handed-over ticket goes to handover_reply
+           and then check_clarification; small talk goes straight to
+           generate_response, without retrieval
+        0b. lookup_answer_cache (only when the answer cache is enabled):
+           on a hit, jumps straight to check_clarification
+        1. retrieve_context: Retrieves context from vector store, while
+           prepare_history folds old messages into the summary if needed
         2. generate_response: Generates agent response
         3. check_clarification: Checks if it's a clarification and updates counter
         4. END: Finishes
@@ -59,64 +212,378 @@ class ConversationGraph:
         workflow = StateGraph(GraphState)
 
         # Define the nodes (functions)
-        workflow.add_node("retrieve_context", self._retrieve_context)
-        workflow.add_node("generate_response", self._generate_response)
-        workflow.add_node("check_clarification", self._check_clarification)
+        workflow.add_node("retrieve_context", self._timed(self._retrieve_context))
+        workflow.add_node("prepare_history", self._timed(self._prepare_history))
+        workflow.add_node("generate_response", self._timed(self._generate_response))
+        workflow.add_node("check_clarification", self._timed(self._check_clarification))
+        workflow.add_node("route_turn", self._timed(self._route_turn))
+        workflow.add_node("handover_reply", self._timed(self._handover_reply))
 
         # Define the edges (flow)
-        workflow.add_edge(START, "retrieve_context")
-        workflow.add_edge("retrieve_context", "generate_response")
+        retrieval = (
+            ["lookup_answer_cache"]
+            if self.answer_cache is not None
+            else ["retrieve_context", "prepare_history"]
+        )
+        workflow.add_edge(START, "route_turn")
+        workflow.add_conditional_edges(
+            "route_turn",
+            lambda state: {
+                "handover": ["handover_reply"],
+                "small_talk": ["generate_response"],
+            }.get(state["route"], retrieval),
+            ["handover_reply", "generate_response", *retrieval],
+        )
+        workflow.add_edge("handover_reply", "check_clarification")
+        if self.answer_cache is not None:
+            workflow.add_node("lookup_answer_cache", self._timed(self._lookup_answer_cache))
+            workflow.add_conditional_edges(
+                "lookup_answer_cache",
+                lambda state: (
+                    ["check_clarification"]
+                    if state["answer_cache_hit"]
+                    else ["retrieve_context", "prepare_history"]
+                ),
+                ["check_clarification", "retrieve_context", "prepare_history"],
+            )
+        # generate_response waits for both branches
+        workflow.add_edge(["retrieve_context", "prepare_history"], "generate_response")
         workflow.add_edge("generate_response", "check_clarification")
         workflow.add_edge("check_clarification", END)
 
-        memory = MemorySaver()
-        return workflow.compile(checkpointer=memory)
+        return workflow.compile(checkpointer=self.checkpointer)
+
+    def _timed(self, node: Callable[..., Awaitable[dict]]) -> Callable[..., Awaitable[dict]]:
+        """
+        Records the latency of a node in the metrics
+        The wrapper keeps the node's signature, which LangGraph inspects to
+        pass the config along.
+        """
+        if not self.metrics.enabled:
+            return node
+        name = node.__name__.lstrip("_")
+
+        @functools.wraps(node)
+        async def timed(*args: Any, **kwargs: Any) -> dict:
+            with self.metrics.node(name):
+                return await node(*args, **kwargs)
+
+        return timed
+
+    async def _route_turn(self, state: GraphState) -> dict:
+        """Node 0: Picks the path of the turn, see TurnRouter"""
+        previous_reply = next(
+            (m["content"] for m in reversed(state["messages"][:-1]) if m["role"] == "agent"),
+            "",
+        )
+        return {
+            "route": self.router.route(
+                state["current_query"], state["handover_to_human_needed"], previous_reply
+            )
+        }
+
+    async def _handover_reply(self, state: GraphState) -> dict:
+        """
+        Node 0a: Answers a ticket already handed over to a human
+        Neither the vector search nor the LLM runs
+        """
+        return {
+            "agent_response": self.settings.router_handover_message,
+            "is_clarification": False,
+        }
+
+    async def _answer_cache_key(self, state: GraphState) -> tuple[str, List[float]]:
+        """Conversation fingerprint and query embedding an answer is cached under"""
+        history = state.get("messages", [])[:-1]
+        fingerprint = history_fingerprint(history, state["clarification_count"])
+        vector = await self.vector_store.embed_query(state["current_query"])
+        return fingerprint, vector
 
-    def _retrieve_context(self, state: GraphState) -> dict:
+    async def _lookup_answer_cache(self, state: GraphState, config: RunnableConfig) -> dict:
+        """
+        Node 0: Reuses the answer of a semantically equivalent query
+        Only answers of the same project and conversation history qualify. A
+        query embedding that fails or misses the retrieval budget counts as a
+        miss, and the turn goes on to retrieval. Answers of a project another
+        process wrote to since the last check are dropped first.
+        """
+        self.vector_store.check_invalidations(state["project_name"])
+        try:
+            async with asyncio.timeout(self._stage_budget(config)):
+                fingerprint, vector = await self._answer_cache_key(state)
+        except TimeoutError:
+            self.metrics.record_timeout("lookup_answer_cache")
+            return {"answer_cache_hit": False}
+        except VectorStoreException:
+            return {"answer_cache_hit": False}
+        cached = self.answer_cache.lookup(state["project_name"], fingerprint, vector)
+        if cached is None:
+            return {"answer_cache_hit": False}
+
+        return {
+            "agent_response": cached.response,
+            "is_clarification": cached.is_clarification,
+            "sections_retrieved": cached.sections,
+            "answer_cache_hit": True,
+        }
+
+    async def _retrieve_context(self, state: GraphState, config: RunnableConfig) -> dict:
         """
         Node 1: Retrieves context from vector store
+        The search started speculatively by _prefetch is reused when there is
+        one. With query rewriting enabled, the rewrites of the query are
+        searched too (see MultiQueryRetriever). The sections are deduplicated
+        and packed into the context token budget by the context builder; all
+        of them are still reported as retrieved
+
+        Retrieval gets the retrieval budget of the request deadline. When it
+        fails or runs out of time, the last cached results of the query are
+        used if there are any; otherwise the turn is marked as degraded.
         """
         query = state["current_query"]
         project_name = state.get("project_name")
-
-        sections = self.vector_store.similarity_search(
-            query, k=5, project_name=project_name
-        )
-
-        context = "\n\n".join(
-            [f"[Score: {section.score:.4f}]\n{section.content}" for section in sections]
-        )
+        prefetched = config.get("configurable", {}).get("prefetched_search")
+
+        try:
+            async with asyncio.timeout(self._stage_budget(config)):
+                if self.retriever is not None:
+                    history = self.history.select(
+                        state["messages"][:-1],
+                        state["history_summary"],
+                        state["summarized_messages"],
+                    )
+                    sections = await self.retriever.retrieve(
+                        query,
+                        history.messages,
+                        history.summary,
+                        k=5,
+                        project_name=project_name,
+                        single_search=prefetched,
+                    )
+                elif prefetched is not None:
+                    sections = await prefetched
+                else:
+                    sections = await self.vector_store.similarity_search(
+                        query, k=5, project_name=project_name
+                    )
+        except (TimeoutError, VectorStoreException) as e:
+            if isinstance(e, TimeoutError):
+                self.metrics.record_timeout("retrieve_context")
+            cached_search = getattr(self.vector_store, "cached_search", None)
+            cached = cached_search(query, k=5, project_name=project_name) if cached_search else None
+            if not cached:
+                return {
+                    "retrieved_context": "",
+                    "sections_retrieved": [],
+                    "context_report": {},
+                    "degraded": True,
+                }
+            self.metrics.record_degraded("cached_results")
+            sections = cached
+
+        context, report = self.context_builder.build(sections)
 
         return {
             "retrieved_context": context,
             "sections_retrieved": [
                 {"score": s.score, "content": s.content} for s in sections
             ],
+            "context_report": report.model_dump(),
         }
 
-    def _generate_response(self, state: GraphState) -> dict:
+    async def _prepare_history(self, state: GraphState, config: RunnableConfig) -> dict:
+        """
+        Node 1b: Refreshes the history summary before generation, when needed
+        Only when the messages the summary does not cover would not fit in the
+        history token ceiling; otherwise the refresh runs after the turn. It
+        runs alongside retrieval, within the same budget.
+        """
+        history = state["messages"][:-1]
+        summary, summarized = state["history_summary"], state["summarized_messages"]
+        backlog = self.history.backlog(history, summarized)
+        if not backlog or not self.history.select(history, summary, summarized).dropped:
+            return {}
+
+        try:
+            async with asyncio.timeout(self._stage_budget(config)):
+                summary = await self._summarize(summary, backlog)
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                self.metrics.record_timeout("prepare_history")
+            # The turn goes on with the oldest messages left out instead
+            self.history.stats.failed_summaries += 1
+            return {}
+        self.history.stats.inline_summaries += 1
+        return {"history_summary": summary, "summarized_messages": summarized + len(backlog)}
+
+    async def _summarize(self, summary: str, messages: List[dict]) -> str:
+        self.history.stats.summaries += 1
+        return await self.llm.summarize(
+            summary, messages, max_tokens=self.settings.history_summary_max_tokens
+        )
+
+    def _schedule_summary(self, config: RunnableConfig, final_state: dict) -> None:
+        """
+        Refreshes the summary in the background once a turn is over
+        Only when a whole window of turns has aged out of it, so that one
+        summarization covers several turns
+        """
+        thread_id = config["configurable"]["thread_id"]
+        summarized = final_state.get("summarized_messages", 0)
+        backlog = self.history.backlog(final_state["messages"], summarized)
+        if (
+            not backlog
+            or len(backlog) < 2 * self.history.window_turns
+            or thread_id in self._summaries
+        ):
+            return
+        task = asyncio.create_task(
+            self._refresh_summary(
+                thread_id, final_state.get("history_summary", ""), summarized, backlog
+            )
+        )
+        self._summaries[thread_id] = task
+        task.add_done_callback(lambda _: self._summaries.pop(thread_id, None))
+
+    async def _refresh_summary(
+        self, thread_id: str, summary: str, summarized: int, backlog: List[dict]
+    ) -> None:
+        """
+        Stores an updated summary in the checkpoint
+        Messages are only ever appended, so the summary stays valid whatever
+        turns ran meanwhile; a turn that was running and checkpoints after it
+        simply discards it, and the next turn schedules it again.
+        """
+        try:
+            summary = await self._summarize(summary, backlog)
+            await self.graph.aupdate_state(
+                {"configurable": {"thread_id": thread_id}},
+                {"history_summary": summary, "summarized_messages": summarized + len(backlog)},
+                as_node="check_clarification",
+            )
+        except Exception:
+            self.history.stats.failed_summaries += 1
+
+    async def _generate_response(
+        self, state: GraphState, config: RunnableConfig
+    ) -> dict:
         """
         Node 2: Generates agent response using the LLM
+        Tokens are forwarded to the custom stream when the run is a streaming one
+
+        Generation gets whatever is left of the request deadline. A turn that
+        runs out of time is answered with the degraded message, unless tokens
+        were already streamed: then it fails with LLMException, so that a
+        stream never carries a partial answer followed by the degraded one.
         """
         user_message = state["current_query"]
         context = state["retrieved_context"]
 
-        history = state.get("messages", [])[:-1] if state.get("messages") else []
-
-        response, is_clarification = self.llm.generate_response(
-            user_message=user_message,
-            context=context,
-            conversation_history=history,
-            clarification_count=state["clarification_count"],
-            max_clarifications=self.settings.max_clarifications,
+        history = self.history.select(
+            state.get("messages", [])[:-1],
+            state["history_summary"],
+            state["summarized_messages"],
         )
+        self.history.stats.dropped_messages += history.dropped
+
+        on_token = None
+        streamed = False
+        if config.get("configurable", {}).get("stream_tokens"):
+            writer = get_stream_writer()
+
+            def on_token(token: str) -> None:
+                nonlocal streamed
+                streamed = True
+                writer({"token": token})
+
+        if state["degraded"]:
+            self.metrics.record_degraded("retrieval")
+            return self._degraded_reply(on_token)
+
+        try:
+            # Whatever is left of the request deadline
+            async with asyncio.timeout(self._deadline(config).remaining()):
+                response, is_clarification = await self.llm.generate_response(
+                    user_message=user_message,
+                    context=context,
+                    conversation_history=history.messages,
+                    clarification_count=state["clarification_count"],
+                    max_clarifications=self.settings.max_clarifications,
+                    on_token=on_token,
+                    history_summary=history.summary,
+                )
+        except TimeoutError:
+            self.metrics.record_timeout("generate_response")
+            if streamed:
+                # Part of the answer is already out; the stream ends with an
+                # error rather than the degraded message after it
+                raise LLMException(
+                    "The answer could not be completed within the request deadline"
+                ) from None
+            self.metrics.record_degraded("generation")
+            return self._degraded_reply(on_token)
+
+        if state["route"] == "small_talk":
+            # e.g. "anything else I can help with?" does not clarify the problem
+            return {"agent_response": response, "is_clarification": False}
+
+        if self.answer_cache is not None:
+            await self._store_answer(state, config, response, is_clarification)
 
         return {
             "agent_response": response,
             "is_clarification": is_clarification,
         }
 
-    def _check_clarification(self, state: GraphState) -> dict:
+    async def _store_answer(
+        self, state: GraphState, config: RunnableConfig, response: str, is_clarification: bool
+    ) -> None:
+        """
+        Stores a generated answer in the answer cache
+        The query embedding usually comes from the embedding cache, where the
+        lookup left it. If it has to be computed again and fails, is shed or
+        misses the stage budget, the answer is simply not cached.
+        """
+        try:
+            async with asyncio.timeout(self._stage_budget(config)):
+                fingerprint, vector = await self._answer_cache_key(state)
+        except TimeoutError:
+            self.metrics.record_timeout("store_answer")
+            return
+        except (VectorStoreException, ServiceOverloadedException):
+            return
+        self.answer_cache.store(
+            state["project_name"],
+            fingerprint,
+            vector,
+            response=response,
+            is_clarification=is_clarification,
+            sections=state["sections_retrieved"],
+        )
+
+    def _degraded_reply(self, on_token: Callable[[str], None] | None) -> dict:
+        """
+        Answers with the degraded message, which asks the user for more detail
+        It is not counted as a clarification: the failure was ours, so it
+        must not bring the ticket closer to a handover.
+        """
+        if on_token is not None:
+            on_token(self.settings.degraded_message)
+        return {
+            "agent_response": self.settings.degraded_message,
+            "is_clarification": False,
+            "degraded": True,
+        }
+
+    @staticmethod
+    def _deadline(config: RunnableConfig) -> Deadline:
+        return config.get("configurable", {}).get("deadline") or Deadline(0)
+
+    def _stage_budget(self, config: RunnableConfig) -> float | None:
+        """Seconds the retrieval stages may take (None = no limit)"""
+        return self._deadline(config).budget(self.settings.retrieval_budget_ms / 1000)
+
+    async def _check_clarification(self, state: GraphState) -> dict:
         """
         Node 3: Checks if it was a clarification and updates counter
         """
@@ -139,7 +606,7 @@ class ConversationGraph:
 
         return updates
 
-    def process_conversation(
+    async def process_conversation(
         self, conversation: ConversationState
     ) -> ConversationState:
         """
@@ -151,50 +618,241 @@ class ConversationGraph:
         Returns:
             Updated conversation with agent response
         """
-        # Get the last user message
-        last_message = conversation.messages[-1]
+        config = self._thread_config(conversation)
+        prefetch = self._prefetch(conversation, config)
+        try:
+            initial_state = await self._build_initial_state(conversation, config)
+            final_state = await self.graph.ainvoke(initial_state, config)
+        finally:
+            self._discard(prefetch)
+        self._schedule_summary(config, final_state)
+
+        return self._apply_final_state(conversation, final_state)
+
+    async def stream_conversation(
+        self, conversation: ConversationState
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Processes a conversation through the graph, yielding events as they happen
 
-        # Execute the graph with config
-        config: RunnableConfig = {
-            "configurable": {"thread_id": str(conversation.helpdesk_id)}
+        The checkpoint is updated exactly as in process_conversation; only the
+        delivery of the results differs.
+
+        Args:
+            conversation: Current conversation state
+
+        Yields:
+            ("sections", List[RetrievedSection]) right after retrieval (empty
+            on the small talk and handover paths),
+            ("token", str) for every generated token (a cached or handover
+            answer arrives as a single token) and
+            ("done", ConversationState) with the updated conversation
+        """
+        config = self._thread_config(conversation)
+        config["configurable"]["stream_tokens"] = True
+        prefetch = self._prefetch(conversation, config)
+        try:
+            async for event in self._stream_events(conversation, config):
+                yield event
+        finally:
+            self._discard(prefetch)
+
+    async def _stream_events(
+        self, conversation: ConversationState, config: RunnableConfig
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """Runs the graph in streaming mode, see stream_conversation"""
+        initial_state = await self._build_initial_state(conversation, config)
+
+        final_state: dict = {}
+        async for mode, payload in self.graph.astream(
+            initial_state, config, stream_mode=["updates", "custom", "values"]
+        ):
+            if mode == "custom":
+                yield "token", payload["token"]
+            elif mode == "updates" and payload.get("route_turn", {}).get("route") in (
+                "small_talk",
+                "handover",
+            ):
+                # Fast paths retrieve nothing
+                yield "sections", []
+            elif mode == "updates" and "handover_reply" in payload:
+                yield "token", payload["handover_reply"]["agent_response"]
+            elif mode == "updates" and "retrieve_context" in payload:
+                yield "sections", self._to_sections(
+                    payload["retrieve_context"]["sections_retrieved"]
+                )
+            elif mode == "updates" and payload.get("lookup_answer_cache", {}).get(
+                "answer_cache_hit"
+            ):
+                cached = payload["lookup_answer_cache"]
+                yield "sections", self._to_sections(cached["sections_retrieved"])
+                yield "token", cached["agent_response"]
+            elif mode == "values":
+                final_state = payload
+
+        self._schedule_summary(config, final_state)
+        yield "done", self._apply_final_state(conversation, final_state)
+
+    def _prefetch(
+        self, conversation: ConversationState, config: RunnableConfig
+    ) -> asyncio.Task | None:
+        """
+        Starts the search for the last user message right away
+        It runs while the checkpoint is read and the history reconciled, and
+        retrieve_context picks it up from the config. Small talk is not
+        searched, and a handed-over ticket wastes the search. With the answer
+        cache on, only the query embedding (which the cache lookup and the
+        search share) is started, so that cache hits still skip the search.
+        """
+        query = conversation.messages[-1].content
+        # The agent's last message, if the client sent the history along
+        previous_reply = next(
+            (
+                m.content
+                for m in reversed(conversation.messages[:-1])
+                if m.role == MessageRole.AGENT
+            ),
+            "",
+        )
+        if not self.settings.speculative_retrieval or (
+            self.router.enabled and self.router.is_small_talk(query, previous_reply)
+        ):
+            return None
+        if self.answer_cache is not None:
+            return asyncio.ensure_future(self.vector_store.embed_query(query))
+        task = asyncio.ensure_future(
+            self.vector_store.similarity_search(
+                query, k=5, project_name=conversation.project_name
+            )
+        )
+        # Objects in configurable are not copied into the checkpoint metadata
+        config["configurable"]["prefetched_search"] = task
+        return task
+
+    @staticmethod
+    def _discard(task: asyncio.Task | None) -> None:
+        """
+        Cancels a speculative search nobody awaited, or marks its error as seen
+        The upstream search and embedding stop with it, unless a coalesced
+        request still waits for them (see SingleFlight and EmbeddingBatcher).
+        """
+        if task is None:
+            return
+        if not task.done():
+            task.cancel()
+        elif not task.cancelled():
+            task.exception()
+
+    def _thread_config(self, conversation: ConversationState) -> RunnableConfig:
+        """
+        Builds the run config; each helpdesk ticket is a checkpoint thread
+        The deadline of the turn starts here, and its stages take their budget from it
+        """
+        return {
+            "configurable": {
+                "thread_id": str(conversation.helpdesk_id),
+                "deadline": Deadline(self.settings.request_deadline_ms / 1000),
+            }
         }
 
+    async def _build_initial_state(
+        self, conversation: ConversationState, config: RunnableConfig
+    ) -> GraphState:
+        """Builds the graph input, preserving checkpointed fields that have no reducer"""
+        # Get the last user message
+        last_message = conversation.messages[-1]
+
         # Get the current state from checkpoint to preserve clarification_count
-        current_state = self.graph.get_state(config)
+        current_state = await self.graph.aget_state(config)
         state_values = current_state.values or {}
 
+        incoming = [
+            {"role": msg.role.value.lower(), "content": msg.content}
+            for msg in conversation.messages
+        ]
+        if self.settings.history_merge_mode == "delta":
+            incoming = self._new_messages(state_values.get("messages", []), incoming)
+
         # For fields without reducers, we must preserve checkpoint values or they'll be overridden
-        initial_state: GraphState = {
+        return {
             "helpdesk_id": conversation.helpdesk_id,
             "project_name": conversation.project_name,
-            "messages": [
-                {"role": msg.role.value.lower(), "content": msg.content}
-                for msg in conversation.messages
-            ],
+            "messages": incoming,
+            "history_summary": state_values.get("history_summary", ""),
+            "summarized_messages": state_values.get("summarized_messages", 0),
             "current_query": last_message.content,
             "retrieved_context": "",
             "sections_retrieved": [],
+            "context_report": {},
             "clarification_count": state_values.get("clarification_count", 0),
             "handover_to_human_needed": state_values.get(
                 "handover_to_human_needed", False
             ),
             "agent_response": "",
             "is_clarification": False,
+            "answer_cache_hit": False,
+            "route": "retrieval",
+            "degraded": False,
         }
 
-        final_state = self.graph.invoke(initial_state, config)
+    @staticmethod
+    def _new_messages(stored: List[dict], incoming: List[dict]) -> List[dict]:
+        """
+        Reconciles the client history with the checkpoint, returning only unseen messages
+
+        The `messages` channel appends through its reducer, so sending the full
+        client history every turn would store every prior message again. The
+        longest suffix of the stored history that is also a prefix of the
+        incoming one is treated as already seen. This covers clients that
+        resend the whole conversation, a trailing window of it, or only the
+        new messages.
+        """
+        if not stored:
+            return incoming
+
+        def fingerprint(message: dict) -> tuple[str, str]:
+            return message["role"].lower(), message["content"]
+
+        stored_prints = [fingerprint(m) for m in stored]
+        incoming_prints = [fingerprint(m) for m in incoming]
+
+        # Fast path: the client resent the whole history seen so far
+        if incoming_prints[: len(stored_prints)] == stored_prints:
+            return incoming[len(stored) :]
 
+        # Otherwise try the overlaps from the longest possible one down
+        first = incoming_prints[0]
+        for start in range(max(len(stored) - len(incoming), 0), len(stored)):
+            if stored_prints[start] != first:
+                continue
+            overlap = len(stored) - start
+            if incoming_prints[:overlap] == stored_prints[start:]:
+                return incoming[overlap:]
+
+        return incoming
+
+    def _apply_final_state(
+        self, conversation: ConversationState, final_state: dict
+    ) -> ConversationState:
+        """Copies the graph results back into the conversation aggregate"""
         # Update conversation with results
         # conversation.add_agent_message(final_state["agent_response"])
         conversation.add_messages_to_history(final_state["messages"])
         conversation.clarification_count = final_state["clarification_count"]
         conversation.handover_to_human_needed = final_state["handover_to_human_needed"]
+        conversation.degraded = final_state.get("degraded", False)
 
         # Add retrieved sections
-        sections = [
-            RetrievedSection(score=s["score"], content=s["content"])
-            for s in final_state["sections_retrieved"]
-        ]
-        conversation.add_retrieved_sections(sections)
+        conversation.add_retrieved_sections(
+            self._to_sections(final_state["sections_retrieved"])
+        )
+        # Empty when the answer came from the answer cache
+        if final_state.get("context_report"):
+            conversation.context_report = ContextReport(**final_state["context_report"])
 
         return conversation
+
+    @staticmethod
+    def _to_sections(sections: List[dict]) -> List[RetrievedSection]:
+        """Converts the serialized sections kept in the graph state to domain objects"""
+        return [RetrievedSection(score=s["score"], content=s["content"]) for s in sections]
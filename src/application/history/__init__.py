@@ -0,0 +1,100 @@
+"""
+Application Layer - History Manager
+Keeps the conversation history in the prompt bounded as tickets grow
+"""
+
+from dataclasses import dataclass
+from typing import Callable, List
+
+
+@dataclass
+class PromptHistory:
+    """The history section of a prompt"""
+
+    summary: str
+    messages: List[dict]
+    tokens: int
+    # Unsummarized messages left out to respect the token ceiling
+    dropped: int = 0
+
+
+@dataclass
+class HistoryStats:
+    """Counters of the history manager"""
+
+    summaries: int = 0
+    inline_summaries: int = 0
+    failed_summaries: int = 0
+    dropped_messages: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+
+class HistoryManager:
+    """
+    Sliding window plus rolling summary over the conversation history
+    The last `window_turns` turns (a user message and the agent answer) are
+    always candidates for the prompt verbatim. Older messages are folded into
+    a rolling summary kept in the checkpoint, together with the number of
+    messages it covers, so that each refresh only summarizes the new backlog.
+    Until a refresh lands, the messages it would cover are still sent
+    verbatim; the history section never exceeds `max_tokens`, the oldest
+    messages being left out first.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        window_turns: int = 4,
+        max_tokens: int = 2000,
+    ):
+        """
+        Args:
+            count_tokens: Token counter of the chat model
+            window_turns: Turns kept verbatim (0 disables the window and summary)
+            max_tokens: Ceiling of the history section of the prompt (0 = no limit)
+        """
+        self.count_tokens = count_tokens
+        self.window_turns = window_turns
+        self.max_tokens = max_tokens
+        self.stats = HistoryStats()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_turns > 0
+
+    def backlog(self, history: List[dict], summarized: int) -> List[dict]:
+        """Messages older than the window that the summary does not cover yet"""
+        if not self.enabled:
+            return []
+        return history[summarized : max(len(history) - 2 * self.window_turns, summarized)]
+
+    def select(self, history: List[dict], summary: str, summarized: int) -> PromptHistory:
+        """The summary and the messages it does not cover, within the token ceiling"""
+        if not self.enabled:
+            summary, summarized = "", 0
+        messages = history[summarized:]
+        tokens = [self.count_tokens(f"{m['role']}: {m['content']}") for m in messages]
+        summary_tokens = self.count_tokens(summary) if summary else 0
+
+        total = summary_tokens + sum(tokens)
+        dropped = 0
+        if self.max_tokens:
+            while total > self.max_tokens and dropped < len(messages):
+                total -= tokens[dropped]
+                dropped += 1
+            if total > self.max_tokens:
+                summary = self._truncate(summary, self.max_tokens)
+                total = self.count_tokens(summary)
+        return PromptHistory(
+            summary=summary, messages=messages[dropped:], tokens=total, dropped=dropped
+        )
+
+    def _truncate(self, text: str, max_tokens: int) -> str:
+        """Keeps the start of a text, cut at a word boundary, within max_tokens"""
+        while text and self.count_tokens(text) > max_tokens:
+            keep = int(len(text) * max_tokens / self.count_tokens(text) * 0.95)
+            cut = text.rfind(" ", 0, keep)
+            text = text[: cut if cut > 0 else keep]
+        return text
@@ -0,0 +1,118 @@
+"""
+Application Layer - Multi-Query Retrieval
+Searches with several rewrites of a follow-up question and fuses the results
+"""
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, List
+
+from src.domain import RetrievedSection, VectorStore
+from src.infrastructure import OpenAILLM, reciprocal_rank_fusion
+
+
+@dataclass
+class RetrievalStats:
+    """Counters of the multi-query retriever"""
+
+    # Turns answered with the fused results of the rewritten queries
+    multi_query: int = 0
+    # Turns that fell back to the plain query: over budget, or rewriting failed
+    over_budget: int = 0
+    failures: int = 0
+    rewritten_queries: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+
+class MultiQueryRetriever:
+    """
+    History-aware multi-query retrieval
+    The LLM rewrites the user message into a few search queries, the first one
+    standalone (references to earlier messages resolved). They are embedded in
+    one batch and searched concurrently, and their rankings are fused by
+    reciprocal rank together with the one of the plain message.
+    The plain search starts right away, so it doubles as the fallback: when
+    rewriting and searching take longer than `budget_ms`, or fail, the turn
+    gets the single-query results without waiting any longer.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        llm: OpenAILLM,
+        count: int = 3,
+        budget_ms: int = 1500,
+        rrf_k: int = 60,
+    ):
+        """
+        Args:
+            vector_store: Backend the queries are searched in
+            llm: Adapter that rewrites the queries
+            count: Rewritten queries per turn
+            budget_ms: Time the stage may take before falling back
+            rrf_k: Rank constant of the fusion
+        """
+        self.vector_store = vector_store
+        self.llm = llm
+        self.count = count
+        self.budget = budget_ms / 1000
+        self.rrf_k = rrf_k
+        self.stats = RetrievalStats()
+
+    async def retrieve(
+        self,
+        query: str,
+        history: List[dict],
+        history_summary: str,
+        k: int,
+        project_name: str | None,
+        single_search: Awaitable[List[RetrievedSection]] | None = None,
+    ) -> List[RetrievedSection]:
+        """
+        The k best sections for the query and its rewrites
+        `single_search` is the plain query's search when it is already running
+        """
+        single: asyncio.Future = asyncio.ensure_future(
+            single_search
+            or self.vector_store.similarity_search(query, k=k, project_name=project_name)
+        )
+        try:
+            async with asyncio.timeout(self.budget):
+                queries = await self.llm.rewrite_queries(
+                    query, history, history_summary, self.count
+                )
+                queries = [q for q in queries if q.casefold() != query.casefold()]
+                results = (
+                    await self.vector_store.similarity_search_many(queries, k, project_name)
+                    if queries
+                    else []
+                )
+                # Shielded: timing out must not cancel the fallback itself
+                original = await asyncio.shield(single)
+        except TimeoutError:
+            self.stats.over_budget += 1
+            return await single
+        except Exception:
+            self.stats.failures += 1
+            return await single
+
+        self.stats.multi_query += 1
+        self.stats.rewritten_queries += len(queries)
+        # The rewrites carry the conversation context, so they win the ties
+        return self._fuse([*results, original], k)
+
+    def _fuse(self, rankings: List[List[RetrievedSection]], k: int) -> List[RetrievedSection]:
+        """Reciprocal rank fusion of the rankings; sections are told apart by content"""
+        sections: dict[str, RetrievedSection] = {}
+        for ranking in rankings:
+            for section in ranking:
+                sections.setdefault(section.content, section)
+        fused = reciprocal_rank_fusion(
+            [[section.content for section in ranking] for ranking in rankings], k=self.rrf_k
+        )
+        return [
+            sections[content].model_copy(update={"score": score})
+            for content, score in fused[:k]
+        ]
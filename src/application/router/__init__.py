@@ -0,0 +1,96 @@
+"""
+Application Layer - Turn Router
+Picks the path of a turn through the graph before anything expensive runs
+"""
+
+import re
+import unicodedata
+from dataclasses import dataclass
+from typing import Literal
+
+Route = Literal["retrieval", "small_talk", "handover"]
+
+# Greetings, thanks and farewells (English and Portuguese, accents stripped);
+# a message made only of these words carries no question. Confirmations such
+# as "ok" or "sure" are left out: they usually answer the agent's last message
+SMALL_TALK_WORDS = frozenset(
+    """
+    hi hello hey hiya yo morning afternoon evening good night day bye goodbye
+    thanks thank thx ty you so much very a lot many cheers appreciated
+    see later have
+    oi ola bom boa dia tarde noite obrigado obrigada obg vlw valeu muito muitissimo
+    brigado grato grata tudo bem tchau ate logo mais tarde falou abraco abracos
+    de nada e ai opa
+    """.split()
+)
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class RouterStats:
+    """Turns routed to each path"""
+
+    retrieval: int = 0
+    small_talk: int = 0
+    handover: int = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return dict(vars(self))
+
+
+class TurnRouter:
+    """
+    Rule-based router of conversation turns
+    - handover: the ticket is already handed over to a human, so neither the
+      vector search nor the LLM runs
+    - small_talk: greetings, thanks and the like, answered by the LLM without
+      a vector search
+    - retrieval: everything else, through the full RAG flow
+    The rules only accept short messages made entirely of small-talk words,
+    without a question mark, so that "thanks, but it still fails" is retrieved.
+    A reply to a question of the agent is never small talk: "thanks" after
+    "Did the reset fix it?" still needs the documentation and may clarify.
+    """
+
+    def __init__(self, enabled: bool = True, small_talk_max_words: int = 6):
+        """
+        Args:
+            enabled: When False every turn takes the retrieval path
+            small_talk_max_words: Longest message that may count as small talk
+                (0 disables the small talk path)
+        """
+        self.enabled = enabled
+        self.small_talk_max_words = small_talk_max_words
+        self.stats = RouterStats()
+
+    def route(
+        self, message: str, handover_to_human_needed: bool, previous_reply: str = ""
+    ) -> Route:
+        """
+        Returns the path of a turn and counts it
+
+        Args:
+            message: The user message of the turn
+            handover_to_human_needed: Whether the ticket is handed over
+            previous_reply: The agent's last message, if any
+        """
+        if not self.enabled:
+            route: Route = "retrieval"
+        elif handover_to_human_needed:
+            route = "handover"
+        elif self.is_small_talk(message, previous_reply):
+            route = "small_talk"
+        else:
+            route = "retrieval"
+        setattr(self.stats, route, getattr(self.stats, route) + 1)
+        return route
+
+    def is_small_talk(self, message: str, previous_reply: str = "") -> bool:
+        if "?" in message or "?" in previous_reply:
+            return False
+        text = unicodedata.normalize("NFKD", message.lower())
+        words = _WORD.findall(text.encode("ascii", "ignore").decode())
+        return (
+            0 < len(words) <= self.small_talk_max_words
+            and all(word in SMALL_TALK_WORDS for word in words)
+        )
@@ -3,8 +3,12 @@ Application Layer - Use Cases
 Implements the application's use cases
 """
 
+import asyncio
+from typing import Any, AsyncIterator
+
 from src.application.graph import ConversationGraph
 from src.domain import ConversationState, InvalidMessageException, MessageRole
+from src.infrastructure import get_cassette
 
 
 class ProcessConversationUseCase:
@@ -17,8 +21,9 @@ class ProcessConversationUseCase:
     def __init__(self, conversation_graph: ConversationGraph):
         """Initializes the use case with necessary dependencies"""
         self.conversation_graph = conversation_graph
+        self.cassette = get_cassette()
 
-    def execute(
+    async def execute(
         self, helpdesk_id: int, project_name: str, messages: list[dict]
     ) -> ConversationState:
         """
@@ -35,31 +40,138 @@ class ProcessConversationUseCase:
         Raises:
             InvalidMessageException: If messages are invalid
         """
-        if not messages or len(messages) == 0:
-            raise InvalidMessageException(
-                "The conversation must have at least one message"
-            )
-
-        last_message = messages[-1]
-        if last_message.get("role") != "USER":
-            raise InvalidMessageException("The last message must be from the user")
-
         conversation = self._build_conversation_state(
             helpdesk_id=helpdesk_id, project_name=project_name, messages=messages
         )
 
-        updated_conversation = self.conversation_graph.process_conversation(
+        updated_conversation = await self.conversation_graph.process_conversation(
             conversation
         )
 
         return updated_conversation
 
+    def stream(
+        self, helpdesk_id: int, project_name: str, messages: list[dict]
+    ) -> AsyncIterator[tuple[str, Any]]:
+        """
+        Executes the use case streaming the graph events as they are produced
+
+        Validation happens eagerly, before the first event is requested, so
+        invalid input can still be rejected with a regular error response.
+
+        Args:
+            helpdesk_id: Helpdesk ID
+            project_name: Project name
+            messages: List of conversation messages
+
+        Returns:
+            Async iterator of (event, payload) tuples, see
+            ConversationGraph.stream_conversation
+
+        Raises:
+            InvalidMessageException: If messages are invalid
+        """
+        conversation = self._build_conversation_state(
+            helpdesk_id=helpdesk_id, project_name=project_name, messages=messages
+        )
+
+        return self.conversation_graph.stream_conversation(conversation)
+
+    async def execute_many(
+        self,
+        conversations: list[dict],
+        concurrency: int = 16,
+        limiter: asyncio.Semaphore | None = None,
+    ) -> AsyncIterator[tuple[int, ConversationState | Exception]]:
+        """
+        Executes the use case for many conversations, e.g. a backfill
+
+        The last user messages are embedded in one batch first. Conversations
+        then run `concurrency` at a time; those of the same ticket run one after
+        the other, in the order given, since they share its checkpoint.
+
+        Args:
+            conversations: Dicts with helpdesk_id, project_name and messages,
+                as the arguments of execute
+            concurrency: Maximum number of conversations processed at a time
+            limiter: Shared bound to use instead, e.g. one for every batch
+                of the process (see get_batch_limiter)
+
+        Yields:
+            (position in `conversations`, updated conversation) as each one
+            finishes, or (position, exception) for those that failed,
+            including invalid ones
+        """
+        tickets: dict[int, list[tuple[int, ConversationState]]] = {}
+        for index, item in enumerate(conversations):
+            try:
+                conversation = self._build_conversation_state(
+                    helpdesk_id=item["helpdesk_id"],
+                    project_name=item["project_name"],
+                    messages=item["messages"],
+                )
+            except Exception as e:
+                yield index, e
+                continue
+            tickets.setdefault(conversation.helpdesk_id, []).append((index, conversation))
+        if not tickets:
+            return
+
+        await self.conversation_graph.prefetch_embeddings(
+            [c.messages[-1].content for ticket in tickets.values() for _, c in ticket]
+        )
+
+        results: asyncio.Queue[tuple[int, ConversationState | Exception]] = asyncio.Queue()
+        semaphore = limiter or asyncio.Semaphore(concurrency)
+
+        async def process(ticket: list[tuple[int, ConversationState]]) -> None:
+            async with semaphore:
+                for index, conversation in ticket:
+                    try:
+                        result: ConversationState | Exception = (
+                            await self.conversation_graph.process_conversation(conversation)
+                        )
+                    except Exception as e:
+                        result = e
+                    results.put_nowait((index, result))
+
+        tasks = [asyncio.create_task(process(ticket)) for ticket in tickets.values()]
+        try:
+            for _ in range(sum(len(ticket) for ticket in tickets.values())):
+                yield await results.get()
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for task in tasks:
+                task.cancel()
+
+    def _validate_messages(self, messages: list[dict]) -> None:
+        """
+        Validates the incoming messages
+
+        Raises:
+            InvalidMessageException: If messages are invalid
+        """
+        if not messages or len(messages) == 0:
+            raise InvalidMessageException(
+                "The conversation must have at least one message"
+            )
+
+        last_message = messages[-1]
+        if last_message.get("role") != "USER":
+            raise InvalidMessageException("The last message must be from the user")
+
     def _build_conversation_state(
         self, helpdesk_id: int, project_name: str, messages: list[dict]
     ) -> ConversationState:
         """
         Builds the conversation state from input data
+        Every entry point goes through here, so a recording cassette logs the
+        valid turns here.
         """
+        self._validate_messages(messages)
+        if self.cassette is not None and self.cassette.recording:
+            self.cassette.record_turn(helpdesk_id, project_name, messages)
+
         conversation = ConversationState(
             helpdesk_id=helpdesk_id, project_name=project_name
         )
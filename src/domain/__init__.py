@@ -1,21 +1,33 @@
 """Domain Layer - Initialization"""
-from src.domain.models import Message, MessageRole, ConversationState, RetrievedSection
+from src.domain.models import (
+    Message,
+    MessageRole,
+    ConversationState,
+    ContextReport,
+    RetrievedSection,
+)
 from src.domain.exceptions import (
     DomainException,
     VectorStoreException,
     LLMException,
     InvalidMessageException,
-    MaxClarificationsExceededException
+    MaxClarificationsExceededException,
+    ServiceOverloadedException,
 )
+from src.domain.repositories import CacheGenerations, VectorStore
 
 __all__ = [
     "Message",
     "MessageRole",
     "ConversationState",
+    "ContextReport",
     "RetrievedSection",
     "DomainException",
     "VectorStoreException",
     "LLMException",
     "InvalidMessageException",
     "MaxClarificationsExceededException",
+    "ServiceOverloadedException",
+    "CacheGenerations",
+    "VectorStore",
 ]
@@ -32,3 +32,12 @@ class MaxClarificationsExceededException(DomainException):
     """Exception when clarification limit is exceeded"""
 
     pass
+
+
+class ServiceOverloadedException(DomainException):
+    """Exception when a request is shed because the service or an upstream is saturated"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        # Seconds the client should wait before trying again
+        self.retry_after = retry_after
@@ -28,6 +28,22 @@ class RetrievedSection(BaseModel):
 
     score: float
     content: str
+    # Unit-length document embedding, when the backend returns it (never serialized)
+    embedding: List[float] | None = Field(default=None, exclude=True, repr=False)
+
+
+class ContextReport(BaseModel):
+    """
+    Value Object - how the retrieved sections were packed into the prompt context
+    Sections are referred to by their position in the retrieved list
+    """
+
+    token_budget: int
+    tokens_used: int
+    sections_used: List[int] = Field(default_factory=list)
+    duplicates_dropped: List[int] = Field(default_factory=list)
+    over_budget_dropped: List[int] = Field(default_factory=list)
+    truncated: List[int] = Field(default_factory=list)
 
 
 class ConversationState(BaseModel):
@@ -46,7 +62,10 @@ class ConversationState(BaseModel):
     message_id_history: List[Message] = Field(default_factory=list)
     handover_to_human_needed: bool = False
     sections_retrieved: List[RetrievedSection] = Field(default_factory=list)
+    context_report: ContextReport | None = None
     clarification_count: int = 0
+    # The last answer is the degraded message (retrieval or generation failed)
+    degraded: bool = False
 
     def add_user_message(self, content: str) -> None:
         """Adds a user message"""
@@ -0,0 +1,130 @@
+"""
+Domain Layer - Repositories
+Defines the interfaces the application depends on, implemented by the infrastructure
+"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from typing import Any, Callable, List
+
+from src.domain.models import RetrievedSection
+
+
+class CacheGenerations(ABC):
+    """
+    Interface for per-project write counters shared between processes
+    Lets a process learn that another one (e.g. the ingestion CLI) wrote to a
+    project, so it can drop what it cached for it
+    """
+
+    @abstractmethod
+    def bump(self, project_name: str) -> None:
+        """Records a write to the project"""
+
+    @abstractmethod
+    def changed(self, project_name: str | None = None) -> List[str]:
+        """
+        Projects written since the previous call, among `project_name` or, when
+        it is None, among all projects
+        """
+
+
+class VectorStore(ABC):
+    """
+    Repository interface for document retrieval
+    Principle: Dependency Inversion - the application depends on this
+    abstraction, not on a concrete search backend
+    Caches layered on top of the store (e.g. of generated answers) register
+    an invalidation listener to be dropped along with its cached results.
+    """
+
+    def __init__(self, generations: CacheGenerations | None = None):
+        """
+        Args:
+            generations: Optional write counters shared with the other
+                processes using the same documents
+        """
+        self.generations = generations
+        self._invalidation_listeners: List[Callable[[str], None]] = []
+
+    @abstractmethod
+    async def embed_query(self, query: str) -> List[float]:
+        """Embeds a query with the model the documents were indexed with"""
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeds several queries; backends override it to send a single batch
+        Later embed_query calls for the same texts hit the embedding cache
+        """
+        return list(await asyncio.gather(*(self.embed_query(query) for query in queries)))
+
+    @abstractmethod
+    async def similarity_search(
+        self, query: str, k: int = 5, project_name: str | None = None
+    ) -> List[RetrievedSection]:
+        """Returns the k sections most similar to the query, optionally within a project"""
+
+    async def similarity_search_many(
+        self, queries: List[str], k: int = 5, project_name: str | None = None
+    ) -> List[List[RetrievedSection]]:
+        """
+        Runs several searches concurrently, one result list per query
+        Backends override it to embed all the queries in a single batch
+        """
+        return list(
+            await asyncio.gather(
+                *(self.similarity_search(query, k, project_name) for query in queries)
+            )
+        )
+
+    @abstractmethod
+    async def add_documents(
+        self, project_name: str, documents: List[dict], vectors: List[List[float]]
+    ) -> None:
+        """
+        Indexes documents ({"id", "content", "type"}) of a project with their embeddings
+        Adding an id that is already indexed does not duplicate it
+        """
+
+    @abstractmethod
+    async def delete_documents(self, project_name: str, ids: List[str]) -> None:
+        """Removes documents of a project by id; unknown ids are ignored"""
+
+    def add_invalidation_listener(self, listener: Callable[[str], None]) -> None:
+        """Registers a callback run with the project name whenever its cache is dropped"""
+        self._invalidation_listeners.append(listener)
+
+    def invalidate_cache(self, project_name: str) -> None:
+        """
+        Drops the cached results of a project, here and (through the shared
+        generations) in the other processes; backends call it after every
+        write to the project
+        """
+        self._drop_cache(project_name)
+        if self.generations is not None:
+            self.generations.bump(project_name)
+
+    def check_invalidations(self, project_name: str | None = None) -> None:
+        """
+        Drops the cached results of the projects another process wrote to
+        since the last check (of any project when `project_name` is None);
+        called before serving anything cached
+        """
+        if self.generations is not None:
+            for name in self.generations.changed(project_name):
+                self._drop_cache(name)
+
+    def clear_cache(self, project_name: str) -> None:
+        """Drops the backend's own cached results of a project, if it caches any"""
+
+    def _drop_cache(self, project_name: str) -> None:
+        self.clear_cache(project_name)
+        for listener in self._invalidation_listeners:
+            listener(project_name)
+
+    def stats(self) -> dict[str, Any]:
+        """Operational counters of the backend"""
+        return {}
+
+    async def close(self) -> None:
+        """Releases the resources held by the backend"""
@@ -1,11 +1,113 @@
 """Infrastructure Layer - Initialization"""
-from src.infrastructure.config import Settings, get_settings
-from src.infrastructure.vector_store import AzureAISearchVectorStore
-from src.infrastructure.llm import OpenAILLM
+from src.infrastructure.config import RetrievalOptions, Settings, get_settings
+from src.infrastructure.checkpoint import (
+    BoundedMemorySaver,
+    RedisCheckpointSaver,
+    create_checkpointer,
+)
+from src.infrastructure.admission import (
+    AdmissionQueue,
+    LimitedEmbeddings,
+    TokenBucket,
+    UpstreamLimiter,
+    create_upstream_limiter,
+    get_admission_queue,
+    get_batch_limiter,
+)
+from src.infrastructure.cache import (
+    FileCacheGenerations,
+    RetrievalCache,
+    SemanticAnswerCache,
+    SingleFlight,
+    create_cache_generations,
+    history_fingerprint,
+)
+from src.infrastructure.cassette import (
+    Cassette,
+    CassetteChatModel,
+    CassetteEmbeddings,
+    CassetteMiss,
+    CassetteSearchClient,
+    get_cassette,
+)
+from src.infrastructure.deadline import Deadline, LatencyTracker, hedged
+from src.infrastructure.embeddings import (
+    CachedEmbeddings,
+    EmbeddingBatcher,
+    MmapEmbeddingStore,
+    create_document_embeddings,
+    create_embeddings,
+)
+from src.infrastructure.ingestion import (
+    ChunkManifest,
+    IngestionPipeline,
+    IngestionReport,
+    chunk_text,
+)
+from src.infrastructure.vector_store import (
+    AzureAISearchVectorStore,
+    BM25Index,
+    LocalVectorStore,
+    create_vector_store,
+    reciprocal_rank_fusion,
+)
+from src.infrastructure.llm import OpenAILLM, create_token_counter
+from src.infrastructure.metrics import (
+    MetricsRegistry,
+    format_server_timing,
+    get_metrics,
+    instrument_checkpointer,
+    start_server_timing,
+)
 
 __all__ = [
+    "RetrievalOptions",
     "Settings",
     "get_settings",
+    "BoundedMemorySaver",
+    "RedisCheckpointSaver",
+    "create_checkpointer",
+    "AdmissionQueue",
+    "LimitedEmbeddings",
+    "TokenBucket",
+    "UpstreamLimiter",
+    "create_upstream_limiter",
+    "get_admission_queue",
+    "get_batch_limiter",
+    "FileCacheGenerations",
+    "RetrievalCache",
+    "SemanticAnswerCache",
+    "SingleFlight",
+    "create_cache_generations",
+    "history_fingerprint",
+    "Cassette",
+    "CassetteChatModel",
+    "CassetteEmbeddings",
+    "CassetteMiss",
+    "CassetteSearchClient",
+    "get_cassette",
+    "Deadline",
+    "LatencyTracker",
+    "hedged",
+    "CachedEmbeddings",
+    "EmbeddingBatcher",
+    "MmapEmbeddingStore",
+    "create_document_embeddings",
+    "create_embeddings",
+    "ChunkManifest",
+    "IngestionPipeline",
+    "IngestionReport",
+    "chunk_text",
     "AzureAISearchVectorStore",
+    "BM25Index",
+    "LocalVectorStore",
+    "create_vector_store",
+    "reciprocal_rank_fusion",
     "OpenAILLM",
+    "create_token_counter",
+    "MetricsRegistry",
+    "format_server_timing",
+    "get_metrics",
+    "instrument_checkpointer",
+    "start_server_timing",
 ]
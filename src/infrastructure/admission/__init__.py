@@ -0,0 +1,307 @@
+"""
+Infrastructure Layer - Admission Control
+Bounded concurrency and rate limits for the upstream calls, and the bounded
+request queue in front of the API, so that bursts are shed quickly instead
+of piling up on OpenAI and Azure AI Search
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, List
+
+from langchain_core.embeddings import Embeddings
+
+from src.domain import ServiceOverloadedException
+from src.infrastructure.config import Settings, get_settings
+from src.infrastructure.metrics import get_metrics
+
+
+class TokenBucket:
+    """
+    Calls-per-second limiter
+    Tokens are reserved ahead (the balance may go negative), so every caller
+    knows at once how long it has to wait for its turn.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        """
+        Args:
+            rate: Tokens added per second
+            burst: Capacity of the bucket, i.e. calls allowed back to back
+        """
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Takes a token; returns the seconds until it is actually available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(-self.tokens / self.rate, 0.0)
+
+    def cancel(self) -> None:
+        """Gives back a reserved token that will not be used"""
+        self.tokens += 1
+
+
+class UpstreamLimiter:
+    """
+    Bounds the calls to one upstream service
+    At most `max_concurrency` calls are in flight and at most `rate` start per
+    second. A call that could not start within `max_wait` seconds fails fast
+    with ServiceOverloadedException instead of queueing on, so a burst is
+    shed rather than turned into upstream rate limit errors and retries.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, rate: float, max_wait: float):
+        """
+        Args:
+            name: Upstream name, used in the metrics and errors
+            max_concurrency: Calls in flight (0 = no limit)
+            rate: Calls started per second, in bursts of up to one second's
+                worth (0 = no limit)
+            max_wait: Longest time a call may wait for its turn, in seconds
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.metrics = get_metrics()
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+        self._bucket = TokenBucket(rate, burst=max(rate, 1.0)) if rate > 0 else None
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Holds one of the upstream's call slots for the duration of the block"""
+        started = time.perf_counter()
+        delay = self._bucket.reserve() if self._bucket else 0.0
+        if delay > self.max_wait:
+            self._bucket.cancel()  # type: ignore[union-attr]
+            self.rejected += 1
+            raise ServiceOverloadedException(
+                f"Rate limit of {self.name} reached", retry_after=delay
+            )
+
+        self.waiting += 1
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._semaphore is not None:
+                try:
+                    async with asyncio.timeout(max(self.max_wait - delay, 0.0)):
+                        await self._semaphore.acquire()
+                except TimeoutError:
+                    self.rejected += 1
+                    raise ServiceOverloadedException(
+                        f"Too many concurrent calls to {self.name}",
+                        retry_after=self.max_wait,
+                    ) from None
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - started
+        self.wait_seconds += waited
+        if self.metrics.enabled:
+            self.metrics.upstream_wait.observe(waited, self.name)
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            if self._semaphore is not None:
+                self._semaphore.release()
+
+    def stats(self) -> dict[str, Any]:
+        """Calls in flight and waiting, and how many were shed"""
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls": self.calls,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds / self.calls * 1000, 3) if self.calls else 0.0,
+        }
+
+
+class LimitedEmbeddings(Embeddings):
+    """
+    Decorator Pattern - runs the async calls of an embedding model through an
+    UpstreamLimiter
+    Sits below the query embedding cache and batcher, so only the requests
+    actually sent to OpenAI take a slot.
+    """
+
+    def __init__(self, embeddings: Embeddings, limiter: UpstreamLimiter):
+        self.embeddings = embeddings
+        self.limiter = limiter
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        async with self.limiter.slot():
+            return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        async with self.limiter.slot():
+            return await self.embeddings.aembed_query(text)
+
+    def stats(self) -> dict[str, Any]:
+        return self.limiter.stats()
+
+
+class AdmissionQueue:
+    """
+    Bounded queue of the requests waiting to be processed
+    At most `max_concurrency` requests are processed at a time and at most
+    `max_queue` wait for a turn, first come first served. Once the queue is
+    full, callers are expected to reject requests at once (see `full`); a
+    request that waited `timeout` seconds without a turn is rejected too. The
+    Retry-After estimate comes from the average processing time.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, timeout: float):
+        """
+        Args:
+            max_concurrency: Requests processed at a time
+            max_queue: Requests waiting for a turn
+            timeout: Longest wait for a turn, in seconds
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._waiters: deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        # Moving average of the processing time, seconds
+        self.service_time = 1.0
+
+    @property
+    def full(self) -> bool:
+        """Whether a new request would neither run nor fit in the queue"""
+        return self.in_flight >= self.max_concurrency and len(self._waiters) >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Whole seconds until the queue is expected to have room again"""
+        drain = self.service_time * (len(self._waiters) + 1) / self.max_concurrency
+        return max(math.ceil(drain), 1)
+
+    def reject(self) -> ServiceOverloadedException:
+        """Counts a request turned away because the queue is full"""
+        self.rejected += 1
+        return ServiceOverloadedException(
+            "Too many requests in progress", retry_after=self.retry_after()
+        )
+
+    async def enter(self) -> None:
+        """
+        Waits for a turn; raises ServiceOverloadedException when the queue is
+        full or the turn does not come within the timeout
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.full:
+            raise self.reject()
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            async with asyncio.timeout(self.timeout):
+                await future
+        except BaseException as e:
+            if future.done() and not future.cancelled():
+                # The turn was handed over just as the wait ended
+                if isinstance(e, TimeoutError):
+                    self.admitted += 1
+                    return
+                self.leave()
+                raise
+            try:
+                self._waiters.remove(future)
+            except ValueError:
+                pass
+            if isinstance(e, TimeoutError):
+                self.timed_out += 1
+                raise ServiceOverloadedException(
+                    "Timed out waiting for a turn", retry_after=self.retry_after()
+                ) from None
+            raise
+        self.admitted += 1
+
+    def leave(self, service_time: float | None = None) -> None:
+        """Ends a turn, handing it over to the longest-waiting request"""
+        if service_time is not None:
+            self.service_time += 0.1 * (service_time - self.service_time)
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        """Requests processed and queued, and how many were shed"""
+        return {
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "service_time_ms": round(self.service_time * 1000, 1),
+        }
+
+
+def create_upstream_limiter(upstream: str, settings: Settings | None = None) -> UpstreamLimiter:
+    """
+    Factory method for the limiter of an upstream service
+    Pattern: Factory - "openai_chat", "openai_embedding" or "azure_search",
+    with the limits configured for it
+    """
+    settings = settings or get_settings()
+    return UpstreamLimiter(
+        upstream,
+        max_concurrency=getattr(settings, f"{upstream}_max_concurrency"),
+        rate=getattr(settings, f"{upstream}_rate_limit"),
+        max_wait=settings.upstream_max_wait_ms / 1000,
+    )
+
+
+@lru_cache
+def get_batch_limiter() -> asyncio.Semaphore:
+    """
+    Returns the process-wide bound on the batch conversations in progress
+    A batch request takes a single turn of the admission queue, so its
+    conversations are bounded here instead, across every batch at once.
+    """
+    return asyncio.Semaphore(get_settings().batch_concurrency)
+
+
+@lru_cache
+def get_admission_queue() -> AdmissionQueue | None:
+    """Returns the process-wide API request queue (None when admission control is off)"""
+    settings = get_settings()
+    if settings.api_max_concurrency <= 0:
+        return None
+    return AdmissionQueue(
+        max_concurrency=settings.api_max_concurrency,
+        max_queue=settings.api_max_queue,
+        timeout=settings.api_queue_timeout_ms / 1000,
+    )
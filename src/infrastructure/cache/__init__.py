@@ -0,0 +1,409 @@
+"""
+Infrastructure Layer - Caches
+In-process caches for results that are expensive to recompute, and the
+write counters that tell the processes of a host when to drop them
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, List, TypeVar
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from src.domain import CacheGenerations
+from src.infrastructure.config import Settings, get_settings
+
+T = TypeVar("T")
+
+
+def history_fingerprint(history: List[dict], clarification_count: int = 0) -> str:
+    """Hash of the conversation so far; answers are only reused for the same one"""
+    payload = json.dumps(
+        [[m["role"].lower(), m["content"]] for m in history] + [clarification_count],
+        ensure_ascii=False,
+    )
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    """A generated answer and everything needed to replay it"""
+
+    response: str
+    is_clarification: bool
+    sections: List[dict]
+    project_name: str
+    fingerprint: str
+    vector: np.ndarray
+    created_at: float = field(default_factory=time.monotonic)
+
+
+class SemanticAnswerCache:
+    """
+    Cache of generated answers looked up by query similarity
+    An answer is reused when a query of the same project, with the same
+    conversation fingerprint, has a cosine similarity of at least
+    `threshold` with the query that produced it.
+    """
+
+    def __init__(self, threshold: float = 0.97, ttl_seconds: int = 3600, max_entries: int = 10_000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # entry ID -> answer, least recently used first
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        # (project, fingerprint) -> entry IDs, plus their stacked unit vectors
+        self._buckets: dict[tuple[str, str], List[int]] = {}
+        self._matrices: dict[tuple[str, str], np.ndarray] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(
+        self, project_name: str, fingerprint: str, vector: List[float]
+    ) -> CachedAnswer | None:
+        """Returns the most similar live answer above the threshold, if any"""
+        query = _unit(vector)
+        key = (project_name, fingerprint)
+        with self._lock:
+            self._expire(key)
+            ids = self._buckets.get(key)
+            if ids:
+                matrix = self._matrices.get(key)
+                if matrix is None:
+                    matrix = self._matrices[key] = np.stack(
+                        [self._entries[i].vector for i in ids]
+                    )
+                similarities = matrix @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._entries.move_to_end(ids[best])
+                    self.hits += 1
+                    return self._entries[ids[best]]
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        project_name: str,
+        fingerprint: str,
+        vector: List[float],
+        response: str,
+        is_clarification: bool,
+        sections: List[dict],
+    ) -> None:
+        """Adds an answer, evicting the least recently used ones over the size bound"""
+        entry = CachedAnswer(
+            response=response,
+            is_clarification=is_clarification,
+            sections=sections,
+            project_name=project_name,
+            fingerprint=fingerprint,
+            vector=_unit(vector),
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = entry
+            self._buckets.setdefault((project_name, fingerprint), []).append(entry_id)
+            self._matrices.pop((project_name, fingerprint), None)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, project_name: str) -> None:
+        """Drops every answer of a project, e.g. after its documents changed"""
+        with self._lock:
+            for key in [k for k in self._buckets if k[0] == project_name]:
+                for entry_id in self._buckets.pop(key):
+                    del self._entries[entry_id]
+                self._matrices.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        """Cache counters and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def _expire(self, key: tuple[str, str]) -> None:
+        """Drops the answers of a bucket that outlived the TTL"""
+        if not self.ttl_seconds:
+            return
+        deadline = time.monotonic() - self.ttl_seconds
+        for entry_id in [
+            i for i in self._buckets.get(key, ()) if self._entries[i].created_at < deadline
+        ]:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        key = (entry.project_name, entry.fingerprint)
+        ids = self._buckets[key]
+        ids.remove(entry_id)
+        if not ids:
+            del self._buckets[key]
+        self._matrices.pop(key, None)
+
+
+class RetrievalCache:
+    """
+    Cache of top-k search results, LRU-bounded with a TTL
+    Keyed on the project, k and the query embedding quantized to 8 bits, so
+    that the tiny float differences between two embeddings of the same text
+    do not cause misses; searches that also match the query text (lexical and
+    hybrid modes) add the normalized text to the key.
+
+    The last results of each query text are also kept past the TTL (within
+    the same size bound), for turns whose search fails or runs out of time
+    to fall back on; see `latest`.
+    """
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 10_000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (created at, sections), least recently used first
+        self._entries: OrderedDict[tuple, tuple[float, List[Any]]] = OrderedDict()
+        # (project, k, query text) -> last results, least recently used first
+        self._latest: OrderedDict[tuple, List[Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.latest_hits = 0
+        # Bumped by every invalidation; results of searches that started
+        # before one are not stored
+        self.generation = 0
+
+    @staticmethod
+    def key(
+        project_name: str | None, k: int, vector: List[float] | None, text: str | None = None
+    ) -> tuple:
+        """Cache key of a search; `text` only for searches that match the query text"""
+        digest = None
+        if vector is not None:
+            quantized = np.round(_unit(vector) * 127).astype(np.int8)
+            digest = hashlib.sha1(quantized.tobytes()).hexdigest()
+        return (project_name, k, digest, text)
+
+    def get(self, key: tuple) -> List[Any] | None:
+        """The cached results of a search, if still fresh"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                not self.ttl_seconds or time.monotonic() - entry[0] < self.ttl_seconds
+            ):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return list(entry[1])
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(
+        self, key: tuple, sections: List[Any], generation: int, text: str | None = None
+    ) -> None:
+        """
+        Stores the results of a search, evicting the least recently used over
+        the bound; `generation` is the one read before the search started,
+        and `text` the normalized query, to keep them as its latest results
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic(), list(sections))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if text is not None:
+                latest_key = (key[0], key[1], text)
+                self._latest[latest_key] = list(sections)
+                self._latest.move_to_end(latest_key)
+                while len(self._latest) > self.max_entries:
+                    self._latest.popitem(last=False)
+
+    def latest(self, project_name: str | None, k: int, text: str) -> List[Any] | None:
+        """The last results stored for a query text, however old"""
+        with self._lock:
+            sections = self._latest.get((project_name, k, text))
+            if sections is None:
+                return None
+            self._latest.move_to_end((project_name, k, text))
+            self.latest_hits += 1
+            return list(sections)
+
+    def invalidate(self, project_name: str) -> None:
+        """
+        Drops every result of a project, e.g. after its documents changed,
+        along with those of searches across all projects
+        """
+        with self._lock:
+            for key in [k for k in self._entries if k[0] in (project_name, None)]:
+                del self._entries[key]
+            for key in [k for k in self._latest if k[0] in (project_name, None)]:
+                del self._latest[key]
+            self.generation += 1
+
+    def stats(self) -> dict[str, Any]:
+        """Cache counters and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.generation,
+            "latest_hits": self.latest_hits,
+        }
+
+
+class FileCacheGenerations(CacheGenerations):
+    """
+    Per-project write counters shared by the processes of a host
+    Each project has a file in `directory` that every write appends one byte
+    to, so its size is the number of writes so far; appends are atomic, and
+    a check is a single stat. Projects are compared with the sizes seen by
+    the previous check, or at startup.
+    """
+
+    SUFFIX = ".generation"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        # project -> size seen by the last check
+        self._seen: dict[str, int] = {
+            name: self._size(name) for name in self._project_names()
+        }
+
+    def bump(self, project_name: str) -> None:
+        """Appends a byte to the project's file"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd = os.open(self._path(project_name), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, b".")
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        with self._lock:
+            # This process dropped its caches already, unless another write
+            # came in since the last check
+            if size == self._seen.get(project_name, 0) + 1:
+                self._seen[project_name] = size
+
+    def changed(self, project_name: str | None = None) -> List[str]:
+        """Projects whose file grew since the last check"""
+        changed = []
+        with self._lock:
+            # Projects whose file was removed count as changed too
+            names = (
+                [project_name]
+                if project_name is not None
+                else sorted(set(self._project_names()) | set(self._seen))
+            )
+            for name in names:
+                size = self._size(name)
+                if size != self._seen.get(name, 0):
+                    self._seen[name] = size
+                    changed.append(name)
+        return changed
+
+    def _path(self, project_name: str) -> str:
+        return os.path.join(self.directory, quote(project_name, safe="") + self.SUFFIX)
+
+    def _size(self, project_name: str) -> int:
+        try:
+            return os.stat(self._path(project_name)).st_size
+        except FileNotFoundError:
+            return 0
+
+    def _project_names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [
+            unquote(name[: -len(self.SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.endswith(self.SUFFIX)
+        ]
+
+
+def create_cache_generations(settings: Settings | None = None) -> FileCacheGenerations | None:
+    """The write counters in CACHE_GENERATION_DIR, or None when it is empty"""
+    settings = settings or get_settings()
+    if not settings.cache_generation_dir:
+        return None
+    return FileCacheGenerations(settings.cache_generation_dir)
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls
+    While a call for a key is running, further calls with the same key wait
+    for it and receive its result (or exception) instead of starting their
+    own. Nothing is kept once the call finishes. A call every caller has
+    given up on (cancelled, e.g. by a timeout) is cancelled too, so it does
+    not keep running and holding an upstream slot for nobody.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        # Callers still waiting for each running call
+        self._waiters: dict[asyncio.Future, int] = {}
+        self.calls = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        """Runs call(), or joins the running call for the same key"""
+        future = self._calls.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(lambda f: self._forget(key, f))
+        else:
+            self.shared += 1
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # A cancelled caller must not cancel the call the others are waiting for
+            return await asyncio.shield(future)
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+                # ...but the last one to go does
+                if not future.done():
+                    self.abandoned += 1
+                    future.cancel()
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Mark the exception as retrieved when every caller has gone away
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> dict[str, Any]:
+        """Upstream calls, the calls that joined one of them and the calls nobody waited for"""
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "shared": self.shared,
+            "abandoned": self.abandoned,
+        }
+
+
+def _unit(vector: List[float] | np.ndarray) -> np.ndarray:
+    array = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(array)
+    return array / norm if norm else array
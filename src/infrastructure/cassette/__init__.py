@@ -0,0 +1,393 @@
+"""
+Infrastructure Layer - Record/Replay Cassette
+Records the calls to the upstream services (OpenAI chat and embeddings, Azure
+AI Search) with their latency, and serves them back offline
+"""
+
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import IO, Any, AsyncIterator, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+
+from src.infrastructure.cache import RetrievalCache
+from src.infrastructure.config import get_settings
+
+# Buffered lines are flushed every this many records (and on exit)
+FLUSH_EVERY = 100
+
+
+class CassetteMiss(LookupError):
+    """A replayed call that is not in the cassette"""
+
+
+class Cassette:
+    """
+    Append-only log of upstream calls, one JSON object per line (gzipped when
+    the path ends in .gz): the kind of call, a key identifying its request,
+    its latency in seconds and its response or error. Incoming conversation
+    turns are logged too, with their arrival time, so that a day of traffic
+    can be replayed through the graph.
+
+    In replay, calls are looked up by key; a key recorded several times is
+    served its responses in the recorded order, starting over at the end.
+    Each reply waits the recorded latency times `latency_scale`. A call that
+    was not recorded raises CassetteMiss, which the adapters report like an
+    upstream error; background summaries, whose input depends on timing, are
+    the usual ones.
+    """
+
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        """
+        Args:
+            path: Log file
+            mode: "record" appends to it, "replay" serves from it
+            latency_scale: Factor applied to the recorded latencies in replay
+                (0 answers at once)
+        """
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+        self._file: IO[str] | None = None
+        self._entries: dict[tuple[str, str], deque] = {}
+        if mode == "replay":
+            for entry in self.entries():
+                self._entries.setdefault((entry["kind"], entry["key"]), deque()).append(entry)
+        else:
+            self._file = self._open("at")
+            atexit.register(self.close)
+
+    def _open(self, mode: str) -> IO[str]:
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode, encoding="utf-8")  # type: ignore[return-value]
+        return open(self.path, mode, encoding="utf-8")
+
+    def entries(self) -> Iterator[dict]:
+        """Every entry of the log, in recorded order"""
+        with self._open("rt") as log:
+            for line in log:
+                if line.strip():
+                    yield json.loads(line)
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    def record(
+        self,
+        kind: str,
+        key: str,
+        latency: float,
+        response: Any = None,
+        error: BaseException | None = None,
+    ) -> None:
+        """Appends a call to the log"""
+        entry = {"kind": kind, "key": key, "latency": round(latency, 6), "response": response}
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.recorded += 1
+            if self.recorded % FLUSH_EVERY == 0:
+                self._file.flush()
+
+    def record_turn(self, helpdesk_id: int, project_name: str, messages: List[dict]) -> None:
+        """Logs an incoming conversation turn with its arrival time"""
+        self.record(
+            "turn",
+            str(helpdesk_id),
+            time.monotonic() - self._started,
+            {"helpdesk_id": helpdesk_id, "project_name": project_name, "messages": messages},
+        )
+
+    def turns(self) -> List[dict]:
+        """The recorded turns, with their arrival time (seconds since recording started)"""
+        return [
+            {**entry["response"], "arrival": entry["latency"]}
+            for entry in self.entries()
+            if entry["kind"] == "turn"
+        ]
+
+    def lookup(self, kind: str, key: str) -> dict:
+        """The next recorded reply to a call"""
+        replies = self._entries.get((kind, key))
+        if not replies:
+            self.misses += 1
+            raise CassetteMiss(f"No recorded {kind} call with key {key} in {self.path}")
+        entry = replies[0]
+        replies.rotate(-1)
+        self.replayed += 1
+        return entry
+
+    async def wait(self, latency: float) -> None:
+        """Spends a recorded latency, scaled"""
+        if self.latency_scale > 0 and latency > 0:
+            await asyncio.sleep(latency * self.latency_scale)
+
+    async def replay(self, kind: str, key: str) -> Any:
+        """Waits the recorded latency of a call and returns its response (or raises its error)"""
+        entry = self.lookup(kind, key)
+        await self.wait(entry["latency"])
+        if "error" in entry:
+            raise RuntimeError(f"Recorded upstream error: {entry['error']}")
+        return entry["response"]
+
+    def stats(self) -> dict[str, Any]:
+        """Calls recorded, replayed and missing from the log"""
+        return {
+            "mode": self.mode,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        """Flushes and closes the log (recording only)"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class CassetteChatModel:
+    """
+    Decorator Pattern - records or replays the completions of a LangChain chat
+    model (ainvoke and astream, the calls OpenAILLM makes); anything else is
+    delegated to the wrapped model
+    """
+
+    def __init__(self, llm: Any, cassette: Cassette):
+        self.llm = llm
+        self.cassette = cassette
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    def _key(self, messages: List[BaseMessage], kwargs: dict) -> str:
+        payload = json.dumps(
+            [
+                getattr(self.llm, "model_name", ""),
+                [[m.type, m.content] for m in messages],
+                sorted(kwargs.items()),
+            ],
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        key = self._key(messages, kwargs)
+        if not self.cassette.recording:
+            reply = await self.cassette.replay("chat", key)
+            return AIMessage(content=reply["content"], usage_metadata=reply["usage"])
+
+        started = time.perf_counter()
+        try:
+            response = await self.llm.ainvoke(messages, **kwargs)
+        except Exception as e:
+            self.cassette.record("chat", key, time.perf_counter() - started, error=e)
+            raise
+        self.cassette.record(
+            "chat",
+            key,
+            time.perf_counter() - started,
+            {"content": response.content, "usage": response.usage_metadata},
+        )
+        return response
+
+    async def astream(
+        self, messages: List[BaseMessage], **kwargs: Any
+    ) -> AsyncIterator[AIMessageChunk]:
+        """Streams the chunks; in replay, with their recorded pacing"""
+        key = self._key(messages, kwargs)
+        if not self.cassette.recording:
+            entry = self.cassette.lookup("chat_stream", key)
+            await self.cassette.wait(entry["latency"])
+            if "error" in entry:
+                raise RuntimeError(f"Recorded upstream error: {entry['error']}")
+            # Chunks are logged as (delay since the previous one, text)
+            for delay, text in entry["response"]["chunks"]:
+                await self.cassette.wait(delay)
+                yield AIMessageChunk(content=text)
+            yield AIMessageChunk(content="", usage_metadata=entry["response"]["usage"])
+            return
+
+        started = last = time.perf_counter()
+        first_chunk: float | None = None
+        chunks: List[tuple[float, str]] = []
+        usage = None
+        try:
+            async for chunk in self.llm.astream(messages, **kwargs):
+                now = time.perf_counter()
+                if first_chunk is None:
+                    first_chunk = now - started
+                chunks.append((round(now - last, 6) if chunks else 0.0, chunk.text))
+                last = now
+                usage = chunk.usage_metadata or usage
+                yield chunk
+        except Exception as e:
+            self.cassette.record("chat_stream", key, time.perf_counter() - started, error=e)
+            raise
+        # The latency is the time to the first chunk; the rest is in the chunks
+        self.cassette.record(
+            "chat_stream",
+            key,
+            first_chunk if first_chunk is not None else last - started,
+            {"chunks": chunks, "usage": usage},
+        )
+
+
+class CassetteEmbeddings(Embeddings):
+    """
+    Decorator Pattern - records or replays the embeddings of a LangChain model
+    Vectors are logged per text (as base64 float32), so batches made up
+    differently in replay are still served; a batch waits the longest
+    recorded latency among its texts.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, cassette: Cassette):
+        self.embeddings = embeddings
+        self.model = model
+        self.cassette = cassette
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model}\0{text}".encode()).hexdigest()
+
+    def _record(self, texts: List[str], vectors: List[List[float]], latency: float) -> None:
+        for text, vector in zip(texts, vectors):
+            encoded = base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes())
+            self.cassette.record("embedding", self._key(text), latency, encoded.decode())
+
+    def _replay(self, texts: List[str]) -> tuple[List[List[float]], float]:
+        entries = [self.cassette.lookup("embedding", self._key(text)) for text in texts]
+        vectors = [
+            np.frombuffer(base64.b64decode(entry["response"]), dtype=np.float32).tolist()
+            for entry in entries
+        ]
+        return vectors, max((entry["latency"] for entry in entries), default=0.0)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not self.cassette.recording:
+            vectors, latency = self._replay(texts)
+            time.sleep(latency * self.cassette.latency_scale)
+            return vectors
+        started = time.perf_counter()
+        vectors = self.embeddings.embed_documents(texts)
+        self._record(texts, vectors, time.perf_counter() - started)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not self.cassette.recording:
+            vectors, latency = self._replay(texts)
+            await self.cassette.wait(latency)
+            return vectors
+        started = time.perf_counter()
+        vectors = await self.embeddings.aembed_documents(texts)
+        self._record(texts, vectors, time.perf_counter() - started)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+class _Results:
+    """Async iterator over a list of search results, like the SDK's paged results"""
+
+    def __init__(self, results: List[dict]):
+        self._results = iter(results)
+
+    def __aiter__(self) -> "_Results":
+        return self
+
+    async def __anext__(self) -> dict:
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class CassetteSearchClient:
+    """
+    Decorator Pattern - records or replays the searches of an Azure AI Search
+    SearchClient. Searches are keyed like the RetrievalCache (query vector
+    quantized to 8 bits), so the float noise of the vectors does not matter.
+    Writes go to the service when recording and are dropped in replay.
+    """
+
+    def __init__(self, search_client: Any, cassette: Cassette):
+        self.search_client = search_client
+        self.cassette = cassette
+
+    @staticmethod
+    def _key(kwargs: dict) -> str:
+        vector_queries = kwargs.get("vector_queries") or []
+        vector = vector_queries[0].vector if vector_queries else None
+        key = RetrievalCache.key(
+            kwargs.get("filter"), kwargs.get("top"), vector, kwargs.get("search_text")
+        )
+        extra = [
+            [q.k_nearest_neighbors, q.weight] for q in vector_queries
+        ] + [kwargs.get("select")]
+        return hashlib.sha1(json.dumps([key, extra], default=str).encode()).hexdigest()
+
+    async def search(self, **kwargs: Any) -> _Results:
+        key = self._key(kwargs)
+        if not self.cassette.recording:
+            return _Results(await self.cassette.replay("search", key))
+
+        started = time.perf_counter()
+        try:
+            # Results are paged in lazily; the latency includes reading them all
+            results = [dict(result) async for result in await self.search_client.search(**kwargs)]
+        except Exception as e:
+            self.cassette.record("search", key, time.perf_counter() - started, error=e)
+            raise
+        self.cassette.record("search", key, time.perf_counter() - started, results)
+        return _Results(results)
+
+    async def upload_documents(self, documents: List[dict]) -> List[Any]:
+        if not self.cassette.recording:
+            return []
+        return await self.search_client.upload_documents(documents=documents)
+
+    async def delete_documents(self, documents: List[dict]) -> List[Any]:
+        if not self.cassette.recording:
+            return []
+        return await self.search_client.delete_documents(documents=documents)
+
+    async def close(self) -> None:
+        await self.search_client.close()
+
+
+@lru_cache
+def get_cassette() -> Cassette | None:
+    """Returns the process-wide cassette, or None when CASSETTE_MODE is off"""
+    settings = get_settings()
+    if settings.cassette_mode == "off":
+        return None
+    return Cassette(
+        settings.cassette_path,
+        settings.cassette_mode,
+        latency_scale=settings.cassette_latency_scale,
+    )
@@ -0,0 +1,524 @@
+"""
+Infrastructure Layer - Checkpoint Backends
+Provides the LangGraph checkpointer selected in the settings
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Sequence
+
+import ormsgpack
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.infrastructure.config import Settings, get_settings
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-process checkpointer with bounded memory usage
+    Keeps the MemorySaver semantics and adds eviction on top of it
+
+    - Threads idle for more than `ttl_seconds` are evicted (0 disables)
+    - At most `max_threads` threads are kept, least recently active first out (0 disables)
+    - Only the newest `max_versions` checkpoints of each thread are kept (0 disables)
+    """
+
+    def __init__(self, ttl_seconds: int = 0, max_threads: int = 0, max_versions: int = 0):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds
+        self.max_threads = max_threads
+        self.max_versions = max_versions
+        # thread ID -> last write time, ordered from least to most recently active
+        self._last_activity: OrderedDict[str, float] = OrderedDict()
+        # thread ID -> keys of its channel blobs, so a thread can be dropped
+        # without scanning every blob of every thread
+        self._blob_keys: defaultdict[str, set[tuple]] = defaultdict(set)
+        # The sync API may be used from several threads
+        self._lock = threading.RLock()
+        # Running totals behind stats(), kept up to date by every write and
+        # deletion so that a metrics scrape does not walk the whole storage
+        self._checkpoints = 0
+        self._bytes = 0
+        self.evicted_threads = 0
+        self.pruned_checkpoints = 0
+
+    def get_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            self._evict()
+            result = super().get_tuple(config)
+            # MemorySaver.storage is a defaultdict: reading an unknown thread creates it
+            if thread_id not in self._last_activity:
+                self.storage.pop(thread_id, None)
+            return result
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        blob_keys = [
+            (thread_id, checkpoint_ns, channel, version)
+            for channel, version in new_versions.items()
+        ]
+        with self._lock:
+            checkpoints = self.storage.get(thread_id, {}).get(checkpoint_ns, {})
+            replaced = checkpoints.get(checkpoint["id"])
+            self._bytes -= sum(_blob_size(self.blobs.get(key)) for key in blob_keys)
+            self._bytes -= _checkpoint_size(replaced)
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._bytes += sum(_blob_size(self.blobs.get(key)) for key in blob_keys)
+            self._bytes += _checkpoint_size(
+                self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            )
+            if replaced is None:
+                self._checkpoints += 1
+            self._blob_keys[thread_id].update(blob_keys)
+            self._last_activity[thread_id] = time.monotonic()
+            self._last_activity.move_to_end(thread_id)
+            if self.max_versions:
+                self._prune_versions(thread_id, checkpoint_ns)
+            self._evict()
+            return result
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        key = (
+            config["configurable"]["thread_id"],
+            config["configurable"].get("checkpoint_ns", ""),
+            config["configurable"]["checkpoint_id"],
+        )
+        with self._lock:
+            self._bytes -= _writes_size(self.writes.get(key))
+            super().put_writes(config, writes, task_id, task_path)
+            self._bytes += _writes_size(self.writes.get(key))
+
+    def delete_thread(self, thread_id: str) -> None:
+        """Deletes a thread using the per-thread indexes instead of full scans"""
+        with self._lock:
+            for checkpoint_ns, checkpoints in self.storage.pop(thread_id, {}).items():
+                for checkpoint_id, saved in checkpoints.items():
+                    self._checkpoints -= 1
+                    self._bytes -= _checkpoint_size(saved)
+                    self._bytes -= _writes_size(
+                        self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                    )
+            for key in self._blob_keys.pop(thread_id, ()):
+                self._bytes -= _blob_size(self.blobs.pop(key, None))
+            self._last_activity.pop(thread_id, None)
+
+    def stats(self) -> dict[str, int]:
+        """Gauges describing the memory held by the saver, from running totals"""
+        with self._lock:
+            return {
+                "threads": len(self._last_activity),
+                "checkpoints": self._checkpoints,
+                "blobs": len(self.blobs),
+                "bytes": self._bytes,
+                "evicted_threads": self.evicted_threads,
+                "pruned_checkpoints": self.pruned_checkpoints,
+            }
+
+    def _evict(self) -> None:
+        """Evicts expired threads, then the least recently active ones over the cap"""
+        if self.ttl_seconds:
+            deadline = time.monotonic() - self.ttl_seconds
+            while self._last_activity:
+                thread_id, last_activity = next(iter(self._last_activity.items()))
+                if last_activity > deadline:
+                    break
+                self.delete_thread(thread_id)
+                self.evicted_threads += 1
+
+        if self.max_threads:
+            while len(self._last_activity) > self.max_threads:
+                self.delete_thread(next(iter(self._last_activity)))
+                self.evicted_threads += 1
+
+    def _prune_versions(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drops old checkpoints of a thread and the blobs only they referenced"""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_versions:
+            return
+
+        for checkpoint_id in sorted(checkpoints)[: -self.max_versions]:
+            self._bytes -= _checkpoint_size(checkpoints.pop(checkpoint_id))
+            self._bytes -= _writes_size(
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            )
+            self._checkpoints -= 1
+            self.pruned_checkpoints += 1
+
+        referenced = {
+            (thread_id, checkpoint_ns, channel, version)
+            for saved, _, _ in checkpoints.values()
+            for channel, version in self.serde.loads_typed(saved)[
+                "channel_versions"
+            ].items()
+        }
+        blob_keys = self._blob_keys[thread_id]
+        for key in [k for k in blob_keys if k[1] == checkpoint_ns and k not in referenced]:
+            blob_keys.discard(key)
+            self._bytes -= _blob_size(self.blobs.pop(key, None))
+
+
+def _checkpoint_size(saved: tuple | None) -> int:
+    """Bytes of a stored (checkpoint, metadata, parent) entry"""
+    return len(saved[0][1]) + len(saved[1][1]) if saved is not None else 0
+
+
+def _blob_size(blob: tuple | None) -> int:
+    return len(blob[1]) if blob is not None else 0
+
+
+def _writes_size(writes: dict | None) -> int:
+    """Bytes of the pending writes of a checkpoint"""
+    return sum(len(write[2][1]) for write in writes.values()) if writes else 0
+
+
+class RedisCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Repository Pattern - stores LangGraph checkpoints in Redis
+    Principle: Dependency Inversion - works with any redis.asyncio compatible client
+
+    Only plain hash/sorted-set commands are used, so any Redis-compatible server
+    (or an in-process stand-in such as fakeredis) can back it. Thread IDs must
+    not contain ":".
+
+    Layout, per thread and namespace:
+        {prefix}:{thread}:{ns}:ids              sorted set of checkpoint IDs
+        {prefix}:{thread}:{ns}:cp:{id}          hash with checkpoint, metadata and parent
+        {prefix}:{thread}:{ns}:writes:{id}      hash with the pending writes
+
+    Every write refreshes the expiry of the thread keys, so idle threads are
+    removed by Redis itself after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        prefix: str = "chatrag:checkpoint",
+        ttl_seconds: int = 0,
+        max_versions: int = 0,
+    ):
+        """
+        Args:
+            client: redis.asyncio.Redis (or compatible) client
+            prefix: Key prefix shared by every checkpoint key
+            ttl_seconds: Expiry of idle threads (0 disables)
+            max_versions: Checkpoints kept per thread, newest first (0 keeps all)
+        """
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds
+        self.max_versions = max_versions
+
+    def _key(self, thread_id: str, checkpoint_ns: str, *parts: str) -> str:
+        return ":".join((self.prefix, thread_id, checkpoint_ns, *parts))
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        """Gets the requested checkpoint, or the latest one of the thread"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            latest = await self.client.zrange(
+                self._key(thread_id, checkpoint_ns, "ids"), -1, -1
+            )
+            if not latest:
+                return None
+            checkpoint_id = _decode(latest[0])
+
+        return await self._load_tuple(thread_id, checkpoint_ns, checkpoint_id)
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        """Lists checkpoints, newest first"""
+        if config is not None:
+            thread_id = str(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is None:
+                locations = await self._namespaces(thread_id)
+            else:
+                locations = [(thread_id, checkpoint_ns)]
+        else:
+            locations = await self._namespaces("*")
+
+        before_id = get_checkpoint_id(before) if before else None
+        remaining = limit
+
+        for thread_id, checkpoint_ns in locations:
+            ids = await self.client.zrange(
+                self._key(thread_id, checkpoint_ns, "ids"), 0, -1
+            )
+            for raw_id in reversed(ids):
+                checkpoint_id = _decode(raw_id)
+                if before_id and checkpoint_id >= before_id:
+                    continue
+                if config and (wanted := get_checkpoint_id(config)):
+                    if checkpoint_id != wanted:
+                        continue
+
+                checkpoint_tuple = await self._load_tuple(
+                    thread_id, checkpoint_ns, checkpoint_id
+                )
+                if checkpoint_tuple is None:
+                    continue
+                if filter and not all(
+                    checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()
+                ):
+                    continue
+
+                yield checkpoint_tuple
+
+                if remaining is not None:
+                    remaining -= 1
+                    if remaining <= 0:
+                        return
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        """Stores a checkpoint and registers it as the latest of the thread"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        )
+
+        ids_key = self._key(thread_id, checkpoint_ns, "ids")
+        checkpoint_key = self._key(thread_id, checkpoint_ns, "cp", checkpoint["id"])
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(
+                checkpoint_key,
+                mapping={
+                    "type": type_,
+                    "checkpoint": serialized_checkpoint,
+                    "metadata": serialized_metadata,
+                    "parent": config["configurable"].get("checkpoint_id") or "",
+                },
+            )
+            pipe.zadd(ids_key, {checkpoint["id"]: 0})
+            if self.ttl_seconds:
+                pipe.expire(checkpoint_key, self.ttl_seconds)
+                pipe.expire(ids_key, self.ttl_seconds)
+            await pipe.execute()
+
+        if self.max_versions:
+            await self._prune_versions(thread_id, checkpoint_ns)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        """Stores the intermediate writes of a task"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = str(config["configurable"]["checkpoint_id"])
+        key = self._key(thread_id, checkpoint_ns, "writes", checkpoint_id)
+
+        # Special writes (errors, interrupts...) replace; regular ones are kept once
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        async with self.client.pipeline(transaction=True) as pipe:
+            for idx, (channel, value) in enumerate(writes):
+                write_idx = WRITES_IDX_MAP.get(channel, idx)
+                type_, serialized_value = self.serde.dumps_typed(value)
+                record = ormsgpack.packb(
+                    [task_id, task_path, write_idx, channel, type_, serialized_value]
+                )
+                field = f"{task_id}:{write_idx}"
+                if replace:
+                    pipe.hset(key, field, record)
+                else:
+                    pipe.hsetnx(key, field, record)
+            if self.ttl_seconds:
+                pipe.expire(key, self.ttl_seconds)
+            await pipe.execute()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        """Deletes every checkpoint and write of a thread"""
+        keys = [
+            key async for key in self.client.scan_iter(match=f"{self.prefix}:{thread_id}:*")
+        ]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def _prune_versions(self, thread_id: str, checkpoint_ns: str) -> None:
+        """Drops every checkpoint of a thread but the newest `max_versions`"""
+        ids_key = self._key(thread_id, checkpoint_ns, "ids")
+        stale = await self.client.zrange(ids_key, 0, -(self.max_versions + 1))
+        if not stale:
+            return
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            for raw_id in stale:
+                checkpoint_id = _decode(raw_id)
+                pipe.delete(
+                    self._key(thread_id, checkpoint_ns, "cp", checkpoint_id),
+                    self._key(thread_id, checkpoint_ns, "writes", checkpoint_id),
+                )
+            pipe.zrem(ids_key, *stale)
+            await pipe.execute()
+
+    async def _namespaces(self, thread_id: str) -> list[tuple[str, str]]:
+        """Finds the (thread, namespace) pairs matching a thread ID or pattern"""
+        locations = []
+        async for raw_key in self.client.scan_iter(
+            match=f"{self.prefix}:{thread_id}:*:ids"
+        ):
+            key = _decode(raw_key)[len(self.prefix) + 1 : -len(":ids")]
+            thread, _, checkpoint_ns = key.partition(":")
+            locations.append((thread, checkpoint_ns))
+        return sorted(locations)
+
+    async def _load_tuple(
+        self, thread_id: str, checkpoint_ns: str, checkpoint_id: str
+    ) -> CheckpointTuple | None:
+        """Loads a checkpoint with its pending writes"""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._key(thread_id, checkpoint_ns, "cp", checkpoint_id))
+            pipe.hvals(self._key(thread_id, checkpoint_ns, "writes", checkpoint_id))
+            saved, raw_writes = await pipe.execute()
+
+        if not saved:
+            return None
+        saved = {_decode(k): v for k, v in saved.items()}
+
+        records = sorted(
+            (ormsgpack.unpackb(raw) for raw in raw_writes),
+            key=lambda r: writes_sort_key(r[1], r[0], r[2]),
+        )
+        parent_checkpoint_id = _decode(saved["parent"])
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self.serde.loads_typed(
+                (_decode(saved["type"]), saved["checkpoint"])
+            ),
+            metadata=json.loads(saved["metadata"]),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((type_, value)))
+                for task_id, _, _, channel, type_, value in records
+            ],
+        )
+
+
+def _decode(value: bytes | str) -> str:
+    """Redis clients return bytes unless decode_responses is set"""
+    return value.decode() if isinstance(value, bytes) else value
+
+
+@asynccontextmanager
+async def create_checkpointer(
+    settings: Settings | None = None,
+) -> AsyncIterator[BaseCheckpointSaver]:
+    """
+    Factory method for the checkpointer configured in the settings
+    Pattern: Factory - the backend is chosen by `checkpoint_backend`
+
+    Usage:
+        async with create_checkpointer() as checkpointer:
+            graph = ConversationGraph(checkpointer=checkpointer)
+    """
+    settings = settings or get_settings()
+
+    if settings.checkpoint_backend == "sqlite":
+        # Imported lazily so the default backend does not pay for the drivers
+        from src.infrastructure.checkpoint.sqlite import PrunedSqliteSaver
+
+        # The saver switches the database to WAL mode on setup, letting several
+        # workers read while one of them writes
+        async with PrunedSqliteSaver.connect(
+            settings.checkpoint_sqlite_path,
+            ttl_seconds=settings.checkpoint_ttl_seconds,
+            max_versions=settings.checkpoint_max_versions,
+        ) as saver:
+            await saver.setup()
+            yield saver
+
+    elif settings.checkpoint_backend == "redis":
+        from redis.asyncio import Redis
+
+        client = Redis.from_url(settings.checkpoint_redis_url)
+        try:
+            yield RedisCheckpointSaver(
+                client,
+                prefix=settings.checkpoint_redis_prefix,
+                ttl_seconds=settings.checkpoint_ttl_seconds,
+                max_versions=settings.checkpoint_max_versions,
+            )
+        finally:
+            await client.aclose()
+
+    else:
+        yield BoundedMemorySaver(
+            ttl_seconds=settings.checkpoint_ttl_seconds,
+            max_threads=settings.checkpoint_max_threads,
+            max_versions=settings.checkpoint_max_versions,
+        )
@@ -0,0 +1,153 @@
+"""
+Infrastructure Layer - SQLite Checkpoint Backend
+AsyncSqliteSaver with the same expiry and version pruning as the memory and
+Redis backends; imported only when the sqlite backend is selected
+"""
+
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+# Seconds between two sweeps of the expired threads
+SWEEP_INTERVAL = 60.0
+
+
+class PrunedSqliteSaver(AsyncSqliteSaver):
+    """
+    SQLite checkpointer with a bounded database size
+    Keeps the AsyncSqliteSaver schema and adds pruning on top of it
+
+    - Threads idle for more than `ttl_seconds` are deleted (0 disables). The
+      last write of every thread is kept in a thread_activity table, which
+      every worker sharing the database sweeps at most once a minute
+    - Only the newest `max_versions` checkpoints of each thread are kept,
+      with their pending writes (0 keeps all)
+    """
+
+    def __init__(
+        self, conn: aiosqlite.Connection, ttl_seconds: int = 0, max_versions: int = 0
+    ):
+        """
+        Args:
+            conn: Open aiosqlite connection
+            ttl_seconds: Idle time after which a thread is deleted (0 disables)
+            max_versions: Checkpoints kept per thread, newest first (0 keeps all)
+        """
+        super().__init__(conn)
+        self.ttl_seconds = ttl_seconds
+        self.max_versions = max_versions
+        self._activity_ready = False
+        self._last_sweep = 0.0
+        self.evicted_threads = 0
+        self.pruned_checkpoints = 0
+
+    @classmethod
+    @asynccontextmanager
+    async def connect(
+        cls, path: str, ttl_seconds: int = 0, max_versions: int = 0
+    ) -> AsyncIterator["PrunedSqliteSaver"]:
+        """Opens the database at `path` for the lifetime of the context"""
+        async with aiosqlite.connect(path) as conn:
+            yield cls(conn, ttl_seconds=ttl_seconds, max_versions=max_versions)
+
+    async def setup(self) -> None:
+        """Creates the checkpoint tables and the thread activity one"""
+        await super().setup()
+        if self._activity_ready:
+            return
+        async with self.lock:
+            await self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS thread_activity "
+                "(thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            # Threads written before the table existed expire a TTL from now
+            await self.conn.execute(
+                "INSERT OR IGNORE INTO thread_activity (thread_id, updated_at) "
+                "SELECT DISTINCT thread_id, ? FROM checkpoints",
+                (time.time(),),
+            )
+            await self.conn.commit()
+            self._activity_ready = True
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        await self.setup()
+        await self._sweep()
+        return await super().aget_tuple(config)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        result = await super().aput(config, checkpoint, metadata, new_versions)
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        async with self.lock, self.conn.cursor() as cur:
+            await cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            if self.max_versions:
+                await self._prune_versions(cur, thread_id, checkpoint_ns)
+            await self.conn.commit()
+        return result
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute(
+                "DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),)
+            )
+            await self.conn.commit()
+
+    def stats(self) -> dict[str, int]:
+        """Threads and checkpoints deleted by this worker"""
+        return {
+            "evicted_threads": self.evicted_threads,
+            "pruned_checkpoints": self.pruned_checkpoints,
+        }
+
+    async def _prune_versions(
+        self, cur: aiosqlite.Cursor, thread_id: str, checkpoint_ns: str
+    ) -> None:
+        """Drops every checkpoint of a thread but the newest `max_versions`, and their writes"""
+        await cur.execute(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id NOT IN (SELECT checkpoint_id FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.max_versions),
+        )
+        self.pruned_checkpoints += max(cur.rowcount, 0)
+        await cur.execute(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? "
+            "AND checkpoint_id NOT IN (SELECT checkpoint_id FROM checkpoints "
+            "WHERE thread_id = ? AND checkpoint_ns = ?)",
+            (thread_id, checkpoint_ns, thread_id, checkpoint_ns),
+        )
+
+    async def _sweep(self) -> None:
+        """Deletes the threads idle for longer than the TTL, once per interval"""
+        now = time.monotonic()
+        if not self.ttl_seconds or now - self._last_sweep < SWEEP_INTERVAL:
+            return
+        self._last_sweep = now
+        expired = (time.time() - self.ttl_seconds,)
+        stale = "SELECT thread_id FROM thread_activity WHERE updated_at < ?"
+        async with self.lock, self.conn.cursor() as cur:
+            await cur.execute(f"DELETE FROM checkpoints WHERE thread_id IN ({stale})", expired)
+            await cur.execute(f"DELETE FROM writes WHERE thread_id IN ({stale})", expired)
+            await cur.execute("DELETE FROM thread_activity WHERE updated_at < ?", expired)
+            self.evicted_threads += max(cur.rowcount, 0)
+            await self.conn.commit()
@@ -3,10 +3,30 @@ Infrastructure Layer - Configuration
 Manages application settings using Pydantic Settings
 """
 
-from pydantic import Field
+from typing import Any, Literal
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class RetrievalOptions(BaseModel):
+    """
+    How the documents of a project are retrieved
+    "vector" ranks by embedding similarity, "lexical" by keyword match (BM25
+    on the local index) and "hybrid" fuses both rankings by reciprocal rank
+    """
+
+    model_config = ConfigDict(extra="forbid")
+
+    mode: Literal["vector", "lexical", "hybrid"] = "vector"
+    # Results taken from each ranking before fusion
+    candidates: int = Field(default=50, gt=0)
+    # Reciprocal rank fusion constant (Azure AI Search always uses 60)
+    rrf_k: int = Field(default=60, gt=0)
+    vector_weight: float = Field(default=1.0, gt=0)
+    lexical_weight: float = Field(default=1.0, gt=0)
+
+
 class Settings(BaseSettings):
     """
     Application settings loaded from environment variables
@@ -16,19 +36,198 @@ class Settings(BaseSettings):
     openai_api_key: str = Field(...)
     openai_embedding_model: str = "text-embedding-3-large"
     openai_chat_model: str = "gpt-4o-mini"
+    # Alternative OpenAI-compatible endpoint ("" uses the official API)
+    openai_base_url: str = ""
+
+    # Query embedding cache: in-memory LRU entries (0 disables the cache) and an
+    # optional on-disk tier shared by the workers of a host ("" disables it)
+    embedding_cache_size: int = 10_000
+    embedding_cache_path: str = ""
+    embedding_cache_dtype: Literal["float16", "float32"] = "float16"
+    # Micro-batching of concurrent query embeddings (a window of 0 disables it)
+    embedding_batch_window_ms: float = 5.0
+    embedding_batch_max_size: int = 64
 
     azure_search_endpoint: str = Field(...)
     azure_search_key: str = Field(...)
     azure_search_index_name: str = Field(...)
 
+    # Retrieval backend: "azure" (Azure AI Search) or "local", an in-process
+    # index memory-mapped from local_index_path with one partition per project
+    vector_store_backend: Literal["azure", "local"] = "azure"
+    local_index_path: str = "local_index"
+    local_index_dtype: Literal["float32", "int8"] = "float32"
+    # Inverted lists scanned per query when a partition has an IVF index
+    # (0 always searches exactly)
+    local_index_ivf_probes: int = 8
+
+    # Retrieval defaults (see RetrievalOptions), and per-project overrides as
+    # JSON, e.g. {"tesla_motors": {"mode": "hybrid", "lexical_weight": 2}}
+    retrieval_mode: Literal["vector", "lexical", "hybrid"] = "vector"
+    retrieval_candidates: int = 50
+    retrieval_rrf_k: int = 60
+    retrieval_vector_weight: float = 1.0
+    retrieval_lexical_weight: float = 1.0
+    retrieval_projects: dict[str, dict[str, Any]] = {}
+
+    # Prompt context assembly: retrieved sections are ordered by MMR (relevance
+    # vs novelty, lambda 1 ignores novelty), sections at least this similar to
+    # an earlier one are dropped and the rest packed into the token budget
+    # (0 = no limit)
+    context_token_budget: int = 3000
+    context_mmr_lambda: float = 0.7
+    context_duplicate_threshold: float = 0.95
+
+    # Document ingestion (python -m src.infrastructure.ingestion)
+    ingestion_chunk_size: int = 1000
+    ingestion_chunk_overlap: int = 200
+    ingestion_batch_size: int = 256
+    ingestion_concurrency: int = 4
+    ingestion_max_retries: int = 5
+    ingestion_manifest_dir: str = "ingestion_manifests"
+
+    # Semantic answer cache (opt-in): reuses an answer of the same project and
+    # conversation history when the query embeddings are similar enough
+    answer_cache_enabled: bool = False
+    answer_cache_threshold: float = 0.97
+    answer_cache_ttl_seconds: int = 3600
+    answer_cache_max_entries: int = 10_000
+    # Per-project write counters shared by the processes of a host (API
+    # workers, the ingestion CLI): a write from any of them drops the cached
+    # answers and search results of the project in all of them ("" disables
+    # it, leaving writes from other processes to the cache TTLs)
+    cache_generation_dir: str = "cache_generations"
+
+    # Azure AI Search result cache: top-k results of repeated queries, dropped
+    # when a project's documents are written by this process or, through
+    # cache_generation_dir, by another one (e.g. the ingestion CLI)
+    retrieval_cache_enabled: bool = True
+    retrieval_cache_ttl_seconds: int = 300
+    retrieval_cache_max_entries: int = 10_000
+
+    # /conversations/completions:batch: conversations per request and how many
+    # of them are processed at a time, across every batch of the process (a
+    # batch request takes a single turn of the admission queue)
+    batch_max_conversations: int = 1000
+    batch_concurrency: int = 16
+
+    # Latency histograms and token counters at /metrics (Prometheus text
+    # format), and the stage timings of each request in a Server-Timing header
+    metrics_enabled: bool = True
+    server_timing_enabled: bool = False
+
+    # Record/replay of the upstream calls (OpenAI chat and query embeddings,
+    # Azure AI Search) and of the incoming turns: "record" appends them, with
+    # their latency, to cassette_path; "replay" serves them back from it without
+    # network access, waiting the recorded latencies times the scale (0 = none)
+    cassette_mode: Literal["off", "record", "replay"] = "off"
+    cassette_path: str = "cassette.jsonl.gz"
+    cassette_latency_scale: float = 1.0
+
+    # Admission control of the /conversations routes: requests processed at a
+    # time (0 disables it) and waiting for a turn; a full queue rejects at once
+    # with 429, a wait past the timeout with 503, both with Retry-After
+    api_max_concurrency: int = 64
+    api_max_queue: int = 256
+    api_queue_timeout_ms: int = 10_000
+
+    # Upstream limits: calls in flight (0 = no limit) and calls started per
+    # second (0 = no limit, bursts of up to one second's worth) per service; a
+    # call that cannot start within upstream_max_wait_ms fails with a 503
+    # instead of queueing on
+    openai_chat_max_concurrency: int = 64
+    openai_chat_rate_limit: float = 0.0
+    openai_embedding_max_concurrency: int = 16
+    openai_embedding_rate_limit: float = 0.0
+    azure_search_max_concurrency: int = 32
+    azure_search_rate_limit: float = 0.0
+    upstream_max_wait_ms: int = 5000
+
     app_host: str = "0.0.0.0"
     app_port: int = 8000
     max_clarifications: int = 2
+    # "delta" appends only the messages the checkpoint has not seen yet;
+    # "append" stores the client history as sent, every turn
+    history_merge_mode: Literal["delta", "append"] = "delta"
+    # Prompt history: the last history_window_turns turns are sent verbatim and
+    # older messages folded into a rolling summary (0 sends the whole history);
+    # the history section never exceeds history_max_tokens (0 = no limit)
+    history_window_turns: int = 4
+    history_max_tokens: int = 2000
+    history_summary_max_tokens: int = 300
+
+    # Starts the search for the last user message while the checkpoint is read
+    speculative_retrieval: bool = True
+
+    # Tail latency: a turn has request_deadline_ms to answer (0 = no deadline),
+    # of which retrieval (and an inline history summary) may take
+    # retrieval_budget_ms; generation gets what is left. A turn whose search
+    # fails or misses its budget is answered from the last results cached for
+    # the query or, without them, with degraded_message, instead of an error
+    request_deadline_ms: int = 30_000
+    retrieval_budget_ms: int = 3000
+    degraded_message: str = (
+        "I couldn't look up the documentation right now. Could you tell me a bit more "
+        "about your question, or send it again in a moment?"
+    )
+    # Hedged searches: a search still running after the p95 latency of the
+    # recent ones (at least retrieval_hedge_min_ms) is sent again, and the
+    # first response is used
+    retrieval_hedge_enabled: bool = True
+    retrieval_hedge_min_ms: int = 20
+
+    # Multi-query retrieval (opt-in): the LLM rewrites each question into
+    # query_rewrite_count search queries, fused with the plain one; past
+    # query_rewrite_budget_ms the plain query's results are used alone
+    query_rewrite_enabled: bool = False
+    query_rewrite_count: int = 3
+    query_rewrite_budget_ms: int = 1500
+
+    # Turn router: short greetings/thanks skip the vector search, and turns of
+    # a ticket already handed over get handover_message without an LLM call
+    router_enabled: bool = True
+    router_small_talk_max_words: int = 6
+    router_handover_message: str = (
+        "Your ticket has been forwarded to a human specialist, who will get back to you soon."
+    )
+
+    # Checkpoint backend: "memory" is per process, "sqlite" and "redis" are
+    # shared by every worker/replica pointing at the same database
+    checkpoint_backend: Literal["memory", "sqlite", "redis"] = "memory"
+    checkpoint_sqlite_path: str = "checkpoints.db"
+    checkpoint_redis_url: str = "redis://localhost:6379/0"
+    checkpoint_redis_prefix: str = "chatrag:checkpoint"
+    # Eviction of idle helpdesk threads (0 disables each limit); max_threads
+    # only applies to the memory backend, Redis relies on key expiry and
+    # SQLite sweeps the expired threads once a minute instead
+    checkpoint_ttl_seconds: int = 7 * 24 * 60 * 60
+    checkpoint_max_threads: int = 100_000
+    checkpoint_max_versions: int = 2
 
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False
     )
 
+    def retrieval_options(self, project_name: str | None = None) -> RetrievalOptions:
+        """Retrieval defaults merged with the overrides of a project"""
+        defaults = {
+            "mode": self.retrieval_mode,
+            "candidates": self.retrieval_candidates,
+            "rrf_k": self.retrieval_rrf_k,
+            "vector_weight": self.retrieval_vector_weight,
+            "lexical_weight": self.retrieval_lexical_weight,
+        }
+        return RetrievalOptions(
+            **{**defaults, **self.retrieval_projects.get(project_name or "", {})}
+        )
+
+    @model_validator(mode="after")
+    def _validate_retrieval_projects(self) -> "Settings":
+        # Fail at startup, not at the first search of a misconfigured project
+        for project_name in self.retrieval_projects:
+            self.retrieval_options(project_name)
+        return self
+
 
 # Singleton pattern for settings
 _settings: Settings | None = None
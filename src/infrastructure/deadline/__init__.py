@@ -0,0 +1,114 @@
+"""
+Infrastructure Layer - Deadlines and Hedging
+Time budgets of a request and its stages, and hedged calls that bound the
+tail latency of an upstream
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class Deadline:
+    """
+    Point in time by which a request must be answered
+    Its stages take their time budget from it, so one slow stage leaves less
+    for the next instead of pushing the whole request past its deadline.
+    """
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: Time from now (0 = no deadline)
+        """
+        self.expires_at = time.monotonic() + seconds if seconds > 0 else math.inf
+
+    def remaining(self) -> float | None:
+        """Seconds left (never negative), or None without a deadline"""
+        if self.expires_at == math.inf:
+            return None
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def budget(self, seconds: float) -> float | None:
+        """
+        Time a stage may take: its own budget (0 = none), capped by what
+        is left of the deadline; None when neither applies
+        """
+        remaining = self.remaining()
+        if seconds <= 0:
+            return remaining
+        return seconds if remaining is None else min(seconds, remaining)
+
+
+class LatencyTracker:
+    """
+    Latency quantiles over a sliding window of recent calls
+    Used to pick the hedging delay; until `min_samples` calls were seen
+    there is no estimate.
+    """
+
+    def __init__(self, window: int = 1000, min_samples: int = 50):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """The q-quantile (0..1) of the window, or None with too few samples"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]],
+    delay: float | None,
+    on_hedge: Callable[[bool], None] | None = None,
+) -> T:
+    """
+    Runs call(), starting a second one if the first is still running after
+    `delay` seconds; the first to succeed wins and the other is cancelled
+
+    Only for idempotent calls. An attempt that fails while the other is still
+    running is ignored; if both fail, the first error is raised.
+
+    Args:
+        call: Starts one attempt
+        delay: Seconds before the hedge (None = never hedge)
+        on_hedge: Called once a hedged call is decided, with whether the
+            hedge won
+    """
+    first = asyncio.ensure_future(call())
+    if delay is None:
+        return await first
+
+    attempts = [first]
+    try:
+        done, _ = await asyncio.wait(attempts, timeout=delay)
+        if not done:
+            attempts.append(asyncio.ensure_future(call()))
+        error: BaseException | None = None
+        pending = set(attempts)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                if attempt.exception() is None:
+                    if len(attempts) > 1 and on_hedge is not None:
+                        on_hedge(attempt is not first)
+                    return attempt.result()
+                error = error or attempt.exception()
+        assert error is not None
+        raise error
+    finally:
+        for attempt in attempts:
+            if not attempt.done():
+                attempt.cancel()
+            elif not attempt.cancelled():
+                # Mark the losing attempt's error as retrieved
+                attempt.exception()
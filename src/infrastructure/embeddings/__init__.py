@@ -0,0 +1,542 @@
+"""
+Infrastructure Layer - Embeddings
+Builds the embedding model used for queries, with caching in front of it
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+import tiktoken
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from pydantic import SecretStr
+
+from src.infrastructure.admission import LimitedEmbeddings, create_upstream_limiter
+from src.infrastructure.cassette import CassetteEmbeddings, get_cassette
+from src.infrastructure.config import Settings, get_settings
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes a query so trivially different spellings share a cache entry"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+class MmapEmbeddingStore:
+    """
+    Persistent embedding tier shared by every worker on the same host
+    Vectors live in a memory-mapped array file and the keys in an append-only
+    index file; row N of the array belongs to line N of the index. A write
+    interrupted by a crash may leave a row without its index line, or half a
+    line; the next write overwrites both, so rows and lines stay aligned.
+
+    Files, per model:
+        {model}.vectors   contiguous float16/float32 rows
+        {model}.index     one hex key per line
+        {model}.json      dimension and dtype of the rows
+    """
+
+    def __init__(self, directory: str, model: str, dtype: str = "float16"):
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]", "_", model)
+        self.vectors_path = os.path.join(directory, f"{slug}.vectors")
+        self.index_path = os.path.join(directory, f"{slug}.index")
+        self.meta_path = os.path.join(directory, f"{slug}.json")
+        self.dtype = np.dtype(dtype)
+        self.dimension: int | None = None
+        self._rows: dict[str, int] = {}
+        self._lines = 0
+        self._index_offset = 0
+        self._matrix: np.memmap | None = None
+        self._lock = threading.Lock()
+
+        if os.path.exists(self.meta_path):
+            self._load_meta()
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Returns the stored vector, picking up rows appended by other workers"""
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                self._refresh_index()
+                row = self._rows.get(key)
+                if row is None:
+                    return None
+            return self._row(row)
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        """
+        Appends a vector; the index line is written last, so readers never see
+        a partial row. The row goes right after the last indexed one rather
+        than at the end of the file, which may hold a row left by a crash.
+        """
+        # POSIX only, like the shared memory-mapped files themselves
+        import fcntl
+
+        # The file lock is taken first, so lookups (which only need the
+        # in-process lock) do not wait while another worker holds it
+        with open(self.index_path, "a+b") as index:
+            fcntl.flock(index, fcntl.LOCK_EX)
+            try:
+                with self._lock:
+                    self._refresh_index()
+                    if key in self._rows:
+                        return
+                    if self.dimension is None:
+                        self.dimension = len(vector)
+                        with open(self.meta_path, "w") as meta:
+                            json.dump(
+                                {"dimension": self.dimension, "dtype": self.dtype.name}, meta
+                            )
+
+                    mode = "r+b" if os.path.exists(self.vectors_path) else "wb"
+                    with open(self.vectors_path, mode) as vectors:
+                        vectors.seek(self._lines * self.dtype.itemsize * self.dimension)
+                        vectors.write(np.asarray(vector, dtype=self.dtype).tobytes())
+                    # Drops half a line left by a crash
+                    index.truncate(self._index_offset)
+                    index.seek(0, os.SEEK_END)
+                    index.write(f"{key}\n".encode())
+                    index.flush()
+                    self._refresh_index()
+            finally:
+                fcntl.flock(index, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load_meta(self) -> None:
+        with open(self.meta_path) as meta:
+            info = json.load(meta)
+        self.dimension = info["dimension"]
+        self.dtype = np.dtype(info["dtype"])
+
+    def _refresh_index(self) -> None:
+        """Reads the index lines appended since the last refresh"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "rb") as index:
+            index.seek(self._index_offset)
+            tail = index.read()
+        # Ignore a line another worker is still writing
+        complete = tail[: tail.rfind(b"\n") + 1]
+        for line in complete.splitlines():
+            self._rows.setdefault(line.decode(), self._lines)
+            self._lines += 1
+        self._index_offset += len(complete)
+        if self.dimension is None and os.path.exists(self.meta_path):
+            self._load_meta()
+
+    def _row(self, row: int) -> np.ndarray:
+        """Reads a row, remapping the file when it has grown past the current map"""
+        if self._matrix is None or row >= self._matrix.shape[0]:
+            rows = os.path.getsize(self.vectors_path) // (self.dtype.itemsize * self.dimension)
+            self._matrix = np.memmap(
+                self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dimension)
+            )
+        return np.asarray(self._matrix[row], dtype=np.float32)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Decorator Pattern - adds caching to any LangChain embedding model
+    Lookups go through an in-memory LRU first, then the optional disk tier,
+    and only then to the wrapped model. Keys are the model name plus the
+    normalized text. On the async path the disk tier is read in a worker
+    thread and written in the background, so its file I/O and the lock it
+    shares with other workers never block the event loop.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        max_entries: int = 10_000,
+        disk_store: MmapEmbeddingStore | None = None,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries
+        self.disk_store = disk_store
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        # Background disk writes, referenced until they finish. They get their
+        # own thread, so writes waiting on the file lock never hold up the
+        # default pool that serves disk lookups
+        self._disk_writes: set[asyncio.Future] = set()
+        self._disk_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-disk")
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def _lookup(self, key: str) -> np.ndarray | None:
+        vector = self._memory_lookup(key)
+        if vector is None and self.disk_store is not None:
+            vector = self._disk_hit(key, self.disk_store.get(key))
+        if vector is None:
+            self.misses += 1
+        return vector
+
+    async def _alookup(self, key: str) -> np.ndarray | None:
+        """Same as _lookup, reading the disk tier off the event loop"""
+        vector = self._memory_lookup(key)
+        if vector is None and self.disk_store is not None:
+            vector = self._disk_hit(key, await asyncio.to_thread(self.disk_store.get, key))
+        if vector is None:
+            self.misses += 1
+        return vector
+
+    def _memory_lookup(self, key: str) -> np.ndarray | None:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def _disk_hit(self, key: str, vector: np.ndarray | None) -> np.ndarray | None:
+        if vector is not None:
+            self._remember(key, vector)
+            self.disk_hits += 1
+        return vector
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _store(self, key: str, vector: List[float]) -> None:
+        array = np.asarray(vector, dtype=np.float32)
+        self._remember(key, array)
+        if self.disk_store is not None:
+            self.disk_store.put(key, array)
+
+    def _astore(self, items: List[tuple[str, List[float]]]) -> None:
+        """Same as _store for many vectors, writing the disk tier in the writer thread"""
+        arrays = [(key, np.asarray(vector, dtype=np.float32)) for key, vector in items]
+        for key, array in arrays:
+            self._remember(key, array)
+        if self.disk_store is not None and arrays:
+            disk_store = self.disk_store
+            task = asyncio.get_running_loop().run_in_executor(
+                self._disk_writer, lambda: [disk_store.put(key, array) for key, array in arrays]
+            )
+            self._disk_writes.add(task)
+            task.add_done_callback(self._disk_write_done)
+
+    def _disk_write_done(self, task: asyncio.Future) -> None:
+        self._disk_writes.discard(task)
+        # A failed write only costs a future disk hit
+        if not task.cancelled():
+            task.exception()
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached.tolist()
+        vector = self.embeddings.embed_query(text)
+        self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = self._key(text)
+        cached = await self._alookup(key)
+        if cached is not None:
+            return cached.tolist()
+        vector = await self.embeddings.aembed_query(text)
+        self._astore([(key, vector)])
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, results, missing = self._partition(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            self._fill(keys, results, missing, vectors)
+        return results  # type: ignore[return-value]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(text) for text in texts]
+        cached = [self._memory_lookup(key) for key in keys]
+        unknown = [i for i, vector in enumerate(cached) if vector is None]
+        if unknown and self.disk_store is not None:
+            # One worker thread reads the whole batch from disk
+            stored = await asyncio.to_thread(
+                lambda: [self.disk_store.get(keys[i]) for i in unknown]  # type: ignore[union-attr]
+            )
+            for i, vector in zip(unknown, stored):
+                cached[i] = self._disk_hit(keys[i], vector)
+        results: List[List[float] | None] = [
+            vector.tolist() if vector is not None else None for vector in cached
+        ]
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        self.misses += len(missing)
+        if missing:
+            vectors = await self.embeddings.aembed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, vectors):
+                results[i] = vector
+            self._astore([(keys[i], vector) for i, vector in zip(missing, vectors)])
+        return results  # type: ignore[return-value]
+
+    def _partition(
+        self, texts: List[str]
+    ) -> tuple[List[str], List[List[float] | None], List[int]]:
+        """Splits a batch into cached results and the positions still to embed"""
+        keys = [self._key(text) for text in texts]
+        results: List[List[float] | None] = []
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self._lookup(key)
+            results.append(cached.tolist() if cached is not None else None)
+            if cached is None:
+                missing.append(i)
+        return keys, results, missing
+
+    def _fill(
+        self,
+        keys: List[str],
+        results: List[List[float] | None],
+        missing: List[int],
+        vectors: List[List[float]],
+    ) -> None:
+        for i, vector in zip(missing, vectors):
+            self._store(keys[i], vector)
+            results[i] = vector
+
+    def stats(self) -> dict[str, float]:
+        """Cache counters and hit rate"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._memory),
+            "disk_entries": len(self.disk_store) if self.disk_store is not None else 0,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+class EmbeddingBatcher(Embeddings):
+    """
+    Decorator Pattern - coalesces concurrent single-query embeddings into batches
+    Queries awaited within `window_ms` of the first pending one (or until
+    `max_batch_size` are pending) are sent as a single embed_documents call
+    and each caller receives its own vector. Identical texts in a batch are
+    embedded once. Synchronous calls and explicit batches pass through.
+    Callers cancelled before their batch is sent are left out of it, and a
+    batch whose callers have all been cancelled is cancelled too.
+    """
+
+    def __init__(
+        self, embeddings: Embeddings, window_ms: float = 5.0, max_batch_size: int = 64
+    ):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending: List[tuple[str, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        # Keeps the in-flight batch tasks referenced until they finish
+        self._tasks: set[asyncio.Task] = set()
+        self.queries = 0
+        self.upstream_calls = 0
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.upstream_calls += 1
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future = loop.create_future()
+        self._pending.append((text, future))
+        self.queries += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        """Sends the pending queries as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = [(text, future) for text, future in self._pending if not future.done()]
+        self._pending = []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._send(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+            def abandon(_: asyncio.Future) -> None:
+                if all(future.done() for _, future in batch):
+                    task.cancel()
+
+            for _, future in batch:
+                future.add_done_callback(abandon)
+
+    async def _send(self, batch: List[tuple[str, asyncio.Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = await self.aembed_documents(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"Expected {len(texts)} embeddings in the batch, got {len(vectors)}"
+                )
+            by_text = dict(zip(texts, vectors))
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            # No caller may be left waiting, whatever went wrong
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for text, future in batch:
+            # Callers that were cancelled meanwhile are skipped
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict[str, float]:
+        """Batching counters"""
+        return {
+            "queries": self.queries,
+            "upstream_calls": self.upstream_calls,
+            "mean_batch_size": self.queries / self.upstream_calls if self.upstream_calls else 0.0,
+        }
+
+
+def embedding_stats(embeddings: Embeddings) -> dict[str, dict]:
+    """Collects the counters of the cache, batcher and limit layers wrapping a model"""
+    stats: dict[str, dict] = {
+        "embedding_cache": {},
+        "embedding_batcher": {},
+        "openai_embedding_limit": {},
+    }
+    layer: Embeddings | None = embeddings
+    while layer is not None:
+        if isinstance(layer, CachedEmbeddings):
+            stats["embedding_cache"] = layer.stats()
+        elif isinstance(layer, EmbeddingBatcher):
+            stats["embedding_batcher"] = layer.stats()
+        elif isinstance(layer, LimitedEmbeddings):
+            stats["openai_embedding_limit"] = layer.stats()
+        layer = getattr(layer, "embeddings", None)
+    return stats
+
+
+def create_document_embeddings(settings: Settings | None = None) -> Embeddings:
+    """
+    Factory method for the embedding model used at ingestion
+    Documents are embedded in explicit batches, so the batcher does not apply.
+    With a disk cache configured, text embedded before (a chunk moved to another
+    file, a re-ingested project) is read from it instead of sent again. Chunks
+    are far below the model context, so the token length check (and its
+    tokenizer download) is skipped.
+    """
+    settings = settings or get_settings()
+    embeddings: Embeddings = OpenAIEmbeddings(
+        api_key=SecretStr(settings.openai_api_key),
+        model=settings.openai_embedding_model,
+        base_url=settings.openai_base_url or None,
+        check_embedding_ctx_length=False,
+    )
+    if settings.embedding_cache_path:
+        embeddings = CachedEmbeddings(
+            embeddings,
+            model=settings.openai_embedding_model,
+            max_entries=settings.embedding_cache_size,
+            disk_store=MmapEmbeddingStore(
+                settings.embedding_cache_path,
+                model=settings.openai_embedding_model,
+                dtype=settings.embedding_cache_dtype,
+            ),
+        )
+    return embeddings
+
+
+def create_embeddings(settings: Settings | None = None) -> Embeddings:
+    """
+    Factory method for the query embedding model
+    Pattern: Factory - wraps OpenAI embeddings with the configured limits,
+    batching and cache tiers; cache misses are the ones that get batched
+    """
+    settings = settings or get_settings()
+
+    embeddings: Embeddings = OpenAIEmbeddings(
+        api_key=SecretStr(settings.openai_api_key),
+        model=settings.openai_embedding_model,
+        base_url=settings.openai_base_url or None,
+        # Splitting over-long queries needs the tokenizer, which is downloaded
+        # on first use; offline, queries are sent as they are
+        check_embedding_ctx_length=_has_tokenizer(settings.openai_embedding_model),
+    )
+
+    cassette = get_cassette()
+    if cassette is not None:
+        # Below the batcher and the cache, so that they work the same in replay
+        embeddings = CassetteEmbeddings(embeddings, settings.openai_embedding_model, cassette)
+
+    # Only the requests that reach OpenAI count against its limits
+    embeddings = LimitedEmbeddings(
+        embeddings, create_upstream_limiter("openai_embedding", settings)
+    )
+
+    if settings.embedding_batch_window_ms > 0:
+        embeddings = EmbeddingBatcher(
+            embeddings,
+            window_ms=settings.embedding_batch_window_ms,
+            max_batch_size=settings.embedding_batch_max_size,
+        )
+
+    if settings.embedding_cache_size > 0:
+        disk_store = None
+        if settings.embedding_cache_path:
+            disk_store = MmapEmbeddingStore(
+                settings.embedding_cache_path,
+                model=settings.openai_embedding_model,
+                dtype=settings.embedding_cache_dtype,
+            )
+        embeddings = CachedEmbeddings(
+            embeddings,
+            model=settings.openai_embedding_model,
+            max_entries=settings.embedding_cache_size,
+            disk_store=disk_store,
+        )
+
+    return embeddings
+
+
+def _has_tokenizer(model: str) -> bool:
+    """Whether the tokenizer OpenAIEmbeddings splits queries with can be loaded"""
+    try:
+        try:
+            tiktoken.encoding_for_model(model)
+        except KeyError:
+            tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return False
+    return True
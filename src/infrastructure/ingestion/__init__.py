@@ -0,0 +1,364 @@
+"""
+Infrastructure Layer - Ingestion
+Loads documents into the vector store: chunking, batched embedding, bulk upload
+and incremental updates
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterator, List, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+from src.domain import VectorStore
+
+T = TypeVar("T")
+
+DEFAULT_EXTENSIONS = (".txt", ".md", ".markdown", ".rst")
+
+
+def chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
+    """
+    Splits a text into chunks of at most chunk_size characters
+    Consecutive chunks share about `overlap` characters, and chunks end at
+    whitespace when there is some in their second half.
+    """
+    text = text.strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        if end < len(text):
+            cut = max(
+                text.rfind(" ", start + chunk_size // 2, end),
+                text.rfind("\n", start + chunk_size // 2, end),
+            )
+            if cut > start:
+                end = cut
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+        # Do not start the next chunk in the middle of a word
+        while start < end and not text[start - 1].isspace():
+            start += 1
+    return chunks
+
+
+def iter_files(
+    paths: List[str], extensions: tuple[str, ...] = DEFAULT_EXTENSIONS
+) -> Iterator[str]:
+    """Yields the files under the given paths, in a stable order"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, files in os.walk(path):
+                directories.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(extensions):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+async def retry(
+    call: Callable[[], Awaitable[T]], attempts: int = 5, base_delay: float = 0.5
+) -> T:
+    """Runs call(), retrying failures with exponential backoff and jitter"""
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            await asyncio.sleep(base_delay * 2**attempt * (0.5 + random.random()))
+    raise AssertionError("unreachable")
+
+
+class ChunkManifest:
+    """
+    What a project's index holds, so a run only sends what changed
+    Append-only JSONL log replayed on open:
+    {"uploaded": [ids]} after each uploaded batch,
+    {"file": path, "version": v, "chunks": [ids]} once every chunk of a file
+    version is in the index, {"removed": path} for files gone from disk and
+    {"deleted": [ids]} once ids are deleted from the index. compact() rewrites
+    it as one line per file.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        # path -> (version, chunk ids)
+        self.files: dict[str, tuple[str, List[str]]] = {}
+        # Every id in the index, including chunks of files not recorded yet
+        self.uploaded: set[str] = set()
+        if path and os.path.exists(path):
+            with open(path) as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A line cut short by an interruption
+                        continue
+                    self._apply(entry)
+
+    def _apply(self, entry: dict) -> None:
+        if "file" in entry:
+            self.files[entry["file"]] = (entry["version"], entry["chunks"])
+            self.uploaded.update(entry["chunks"])
+        elif "removed" in entry:
+            self.files.pop(entry["removed"], None)
+        elif "deleted" in entry:
+            self.uploaded.difference_update(entry["deleted"])
+        else:
+            self.uploaded.update(entry.get("uploaded", ()))
+
+    def _append(self, entry: dict) -> None:
+        self._apply(entry)
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a") as log:
+                log.write(json.dumps(entry) + "\n")
+
+    def add_uploaded(self, ids: List[str]) -> None:
+        self._append({"uploaded": ids})
+
+    def set_file(self, path: str, version: str, ids: List[str]) -> None:
+        self._append({"file": path, "version": version, "chunks": ids})
+
+    def remove_file(self, path: str) -> None:
+        self._append({"removed": path})
+
+    def add_deleted(self, ids: List[str]) -> None:
+        self._append({"deleted": ids})
+
+    def stale(self) -> List[str]:
+        """Ids in the index that no recorded file version references"""
+        referenced = {i for _, ids in self.files.values() for i in ids}
+        return sorted(self.uploaded - referenced)
+
+    def compact(self) -> None:
+        """Rewrites the log as its current state"""
+        if not self.path:
+            return
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as log:
+            for path, (version, ids) in sorted(self.files.items()):
+                log.write(
+                    json.dumps({"file": path, "version": version, "chunks": ids}) + "\n"
+                )
+            if stale := self.stale():
+                log.write(json.dumps({"uploaded": stale}) + "\n")
+        os.replace(temporary, self.path)
+
+
+@dataclass
+class IngestionReport:
+    """Counters of an ingestion run"""
+
+    files: int = 0
+    skipped_files: int = 0
+    removed_files: int = 0
+    chunks: int = 0
+    skipped_chunks: int = 0
+    deleted_chunks: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.files} files ({self.skipped_files} unchanged, "
+            f"{self.removed_files} removed), "
+            f"{self.chunks} chunks ({self.skipped_chunks} unchanged, "
+            f"{self.deleted_chunks} deleted) "
+            f"in {self.seconds:.1f}s: {self.files_per_second:.1f} docs/s, "
+            f"{self.chunks_per_second:.1f} chunks/s"
+        )
+
+
+@dataclass
+class _Chunk:
+    path: str
+    document: dict
+
+
+class IngestionPipeline:
+    """
+    Pipeline Pattern - files -> chunks -> embedding batches -> bulk upload
+    Files are read and chunked one at a time while `concurrency` workers embed
+    and upload batches of `batch_size` chunks; the bounded queue between them
+    keeps memory flat on large corpora. Embedding and upload calls are retried
+    with backoff.
+
+    Runs are incremental: chunk ids are derived from their content, and the
+    manifest records the chunks of every file version in the index. Unchanged
+    files are skipped, only the new chunks of changed files are embedded, and
+    once everything is uploaded the chunks no file references any more (edited
+    out, or of files removed under the ingested paths) are deleted.
+    """
+
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        embeddings: Embeddings,
+        project_name: str,
+        document_type: str = "document",
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        batch_size: int = 256,
+        concurrency: int = 4,
+        max_retries: int = 5,
+        manifest_path: str | None = None,
+        on_progress: Callable[[IngestionReport], None] | None = None,
+    ):
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.project_name = project_name
+        self.document_type = document_type
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.manifest = ChunkManifest(manifest_path)
+        self.on_progress = on_progress
+        self.report = IngestionReport()
+        # path -> (version, chunk ids) of the files being ingested
+        self._versions: dict[str, tuple[str, List[str]]] = {}
+        # Chunks of each file still to upload
+        self._remaining: dict[str, int] = {}
+
+    async def run(self, paths: List[str]) -> IngestionReport:
+        """Brings the index in line with the files under the given paths"""
+        started = time.perf_counter()
+        queue: asyncio.Queue[List[_Chunk] | None] = asyncio.Queue(
+            maxsize=self.concurrency * 2
+        )
+        seen: set[str] = set()
+        try:
+            async with asyncio.TaskGroup() as group:
+                for _ in range(self.concurrency):
+                    group.create_task(self._worker(queue, started))
+                group.create_task(self._produce(paths, queue, seen))
+        except ExceptionGroup as e:
+            raise e.exceptions[0]
+
+        roots = [os.path.abspath(path) for path in paths]
+        for path in [p for p in self.manifest.files if p not in seen]:
+            if any(path == root or path.startswith(root + os.sep) for root in roots):
+                self.manifest.remove_file(path)
+                self.report.removed_files += 1
+        await self._delete_stale()
+        if self.report.chunks or self.report.deleted_chunks:
+            # Results cached while the run was writing are stale as a whole;
+            # the API workers learn about it through the shared write counters
+            # (CACHE_GENERATION_DIR), as their caches are not in this process
+            self.vector_store.invalidate_cache(self.project_name)
+        self.manifest.compact()
+        self.report.seconds = time.perf_counter() - started
+        return self.report
+
+    @staticmethod
+    def _version(path: str) -> str:
+        stat = os.stat(path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _chunk_file(self, path: str) -> List[_Chunk]:
+        with open(path, encoding="utf-8", errors="replace") as source:
+            text = source.read()
+        chunks = []
+        occurrences: dict[str, int] = {}
+        for content in chunk_text(text, self.chunk_size, self.chunk_overlap):
+            # Content-addressed, so a chunk keeps its id while it is unchanged
+            occurrence = occurrences[content] = occurrences.get(content, -1) + 1
+            chunk_id = hashlib.sha1(
+                f"{self.project_name}\0{path}\0{occurrence}\0{content}".encode()
+            ).hexdigest()
+            document = {"id": chunk_id, "content": content, "type": self.document_type}
+            chunks.append(_Chunk(path=path, document=document))
+        return chunks
+
+    async def _produce(
+        self, paths: List[str], queue: asyncio.Queue, seen: set[str]
+    ) -> None:
+        batch: List[_Chunk] = []
+        for path in map(os.path.abspath, iter_files(paths)):
+            seen.add(path)
+            version = self._version(path)
+            recorded = self.manifest.files.get(path)
+            if recorded is not None and recorded[0] == version:
+                self.report.skipped_files += 1
+                self.report.skipped_chunks += len(recorded[1])
+                continue
+
+            chunks = await asyncio.to_thread(self._chunk_file, path)
+            pending = [c for c in chunks if c.document["id"] not in self.manifest.uploaded]
+            self.report.skipped_chunks += len(chunks) - len(pending)
+            self._versions[path] = (version, [c.document["id"] for c in chunks])
+            self._remaining[path] = len(pending)
+            if not pending:
+                self._file_done(path)
+
+            for chunk in pending:
+                batch.append(chunk)
+                if len(batch) == self.batch_size:
+                    await queue.put(batch)
+                    batch = []
+        if batch:
+            await queue.put(batch)
+        for _ in range(self.concurrency):
+            await queue.put(None)
+
+    async def _worker(self, queue: asyncio.Queue, started: float) -> None:
+        while (batch := await queue.get()) is not None:
+            documents = [chunk.document for chunk in batch]
+            texts = [document["content"] for document in documents]
+            vectors = await retry(
+                lambda: self.embeddings.aembed_documents(texts), attempts=self.max_retries
+            )
+            await retry(
+                lambda: self.vector_store.add_documents(
+                    self.project_name, documents, vectors
+                ),
+                attempts=self.max_retries,
+            )
+
+            self.manifest.add_uploaded([d["id"] for d in documents])
+            self.report.chunks += len(batch)
+            for chunk in batch:
+                self._remaining[chunk.path] -= 1
+                if not self._remaining[chunk.path]:
+                    self._file_done(chunk.path)
+            if self.on_progress is not None:
+                self.report.seconds = time.perf_counter() - started
+                self.on_progress(self.report)
+
+    def _file_done(self, path: str) -> None:
+        del self._remaining[path]
+        self.manifest.set_file(path, *self._versions.pop(path))
+        self.report.files += 1
+
+    async def _delete_stale(self) -> None:
+        """Deletes the chunks no recorded file version references"""
+        stale = self.manifest.stale()
+        for start in range(0, len(stale), self.batch_size):
+            ids = stale[start : start + self.batch_size]
+            await retry(
+                lambda: self.vector_store.delete_documents(self.project_name, ids),
+                attempts=self.max_retries,
+            )
+            self.manifest.add_deleted(ids)
+            self.report.deleted_chunks += len(ids)
@@ -0,0 +1,76 @@
+"""
+Infrastructure Layer - Ingestion CLI
+Loads a folder of documents into the configured vector store; running it again
+only sends what changed since the last run
+
+Usage:
+    python -m src.infrastructure.ingestion --project tesla_motors docs/tesla
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import time
+
+from src.infrastructure.config import get_settings
+from src.infrastructure.embeddings import create_document_embeddings
+from src.infrastructure.ingestion import IngestionPipeline, IngestionReport
+from src.infrastructure.vector_store import create_vector_store
+
+
+def parse_args() -> argparse.Namespace:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Ingests documents into the vector store")
+    parser.add_argument("paths", nargs="+", help="Files or folders to ingest")
+    parser.add_argument("--project", required=True, help="projectName of the documents")
+    parser.add_argument("--type", default="document", help="type field of the documents")
+    parser.add_argument("--chunk-size", type=int, default=settings.ingestion_chunk_size)
+    parser.add_argument("--chunk-overlap", type=int, default=settings.ingestion_chunk_overlap)
+    parser.add_argument("--batch-size", type=int, default=settings.ingestion_batch_size)
+    parser.add_argument("--concurrency", type=int, default=settings.ingestion_concurrency)
+    parser.add_argument("--max-retries", type=int, default=settings.ingestion_max_retries)
+    parser.add_argument(
+        "--manifest",
+        help="Chunks already indexed (default: one file per project in INGESTION_MANIFEST_DIR)",
+    )
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> None:
+    settings = get_settings()
+    manifest = args.manifest or os.path.join(
+        settings.ingestion_manifest_dir,
+        re.sub(r"[^A-Za-z0-9_.-]", "_", args.project) + ".jsonl",
+    )
+    last_print = 0.0
+
+    def on_progress(report: IngestionReport) -> None:
+        nonlocal last_print
+        if time.monotonic() - last_print >= 1:
+            last_print = time.monotonic()
+            print(report, flush=True)
+
+    vector_store = create_vector_store(settings)
+    try:
+        pipeline = IngestionPipeline(
+            vector_store=vector_store,
+            embeddings=create_document_embeddings(settings),
+            project_name=args.project,
+            document_type=args.type,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            max_retries=args.max_retries,
+            manifest_path=manifest,
+            on_progress=on_progress,
+        )
+        report = await pipeline.run(args.paths)
+    finally:
+        await vector_store.close()
+    print(f"Done: {report}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -3,14 +3,39 @@ Infrastructure Layer - LLM (OpenAI Chat Model)
 Implements the interface with the OpenAI chat model
 """
 
-from typing import Dict, List
+import hashlib
+import json
+import re
+from typing import Any, Callable, Dict, List
 
-from langchain_core.messages import HumanMessage, SystemMessage
+import tiktoken
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
 from langchain_openai import ChatOpenAI
 from pydantic import SecretStr
 
-from src.domain import LLMException
+from src.domain import LLMException, ServiceOverloadedException
+from src.infrastructure.admission import create_upstream_limiter
+from src.infrastructure.cache import SingleFlight
+from src.infrastructure.cassette import CassetteChatModel, get_cassette
 from src.infrastructure.config import get_settings
+from src.infrastructure.metrics import get_metrics
+
+
+def create_token_counter(model: str) -> Callable[[str], int]:
+    """
+    Counts tokens with the tokenizer of a chat model
+    The tokenizer is downloaded on first use; when that is not possible (e.g.
+    offline) tokens are estimated at 4 characters each.
+    """
+    try:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return lambda text: (len(text) + 3) // 4
+
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
 
 
 class OpenAILLM:
@@ -30,26 +55,56 @@ IMPORTANT INSTRUCTIONS:
 
 Your response format should be natural and conversational."""
 
+    SUMMARY_PROMPT = """You maintain the running summary of a customer support conversation.
+
+Merge the new messages into the current summary. Keep the customer's problem, product
+details, identifiers (order numbers, error codes, SKUs), what was already tried or
+answered and any open question. Be concise and factual, and write in the language of
+the conversation."""
+
+    REWRITE_PROMPT = """You write search queries for the knowledge base of a customer support team.
+
+Given the conversation and the current user message, write up to {count} search queries, one
+per line, without numbering or any other text:
+1. First, the current message rewritten as a standalone query, resolving references such as
+   "it" or "the other model" with details from the conversation.
+2. Then reformulations of it with different words (synonyms, product or error names).
+Write in the language of the conversation."""
+
     def __init__(self):
         """Initializes the OpenAI chat model"""
         settings = get_settings()
+        self.metrics = get_metrics()
+        # Concurrent identical prompts share one completion (non-streaming only)
+        self._completions = SingleFlight()
+        # Calls in flight and per second to the chat model
+        self.limiter = create_upstream_limiter("openai_chat", settings)
 
         try:
             self.llm = ChatOpenAI(
                 api_key=SecretStr(settings.openai_api_key),
                 model=settings.openai_chat_model,
+                base_url=settings.openai_base_url or None,
                 temperature=0.7,
+                # Token usage of streamed completions, for the metrics
+                stream_usage=True,
             )
         except Exception as e:
             raise LLMException(f"Error initializing OpenAI LLM: {str(e)}")
 
-    def generate_response(
+        cassette = get_cassette()
+        if cassette is not None:
+            self.llm = CassetteChatModel(self.llm, cassette)  # type: ignore[assignment]
+
+    async def generate_response(
         self,
         user_message: str,
         context: str,
         conversation_history: List[Dict[str, str]],
         clarification_count: int,
         max_clarifications: int,
+        on_token: Callable[[str], None] | None = None,
+        history_summary: str = "",
     ) -> tuple[str, bool]:
         """
         Generates agent response based on context and history
@@ -60,46 +115,202 @@ Your response format should be natural and conversational."""
             conversation_history: Conversation history
             clarification_count: Current number of clarifications
             max_clarifications: Maximum number of clarifications allowed
+            on_token: Optional callback; when given the completion is streamed
+                and each token is passed to it as soon as it is produced
+            history_summary: Summary of the messages older than conversation_history
 
         Returns:
             Tuple with (generated_response, is_clarification)
         """
         try:
-            # Prepare the prompt with context
-            context_prompt = f"""RETRIEVED CONTEXT:
-{context}
+            messages = self._build_messages(
+                user_message=user_message,
+                context=context,
+                conversation_history=conversation_history,
+                clarification_count=clarification_count,
+                max_clarifications=max_clarifications,
+                history_summary=history_summary,
+            )
 
-CONVERSATION HISTORY:
-{self._format_history(conversation_history)}
+            # Generate the response
+            if on_token is None:
+                response_text = await self._completions.do(
+                    self._prompt_key(messages), lambda: self._complete(messages)
+                )
+            else:
+                tokens = []
+                usage = None
+                async with self.limiter.slot():
+                    with self.metrics.upstream("openai", "completion_stream"):
+                        async for chunk in self.llm.astream(messages):
+                            token = chunk.text
+                            if token:
+                                tokens.append(token)
+                                on_token(token)
+                            # Only the last chunk carries the usage
+                            usage = chunk.usage_metadata or usage
+                self.metrics.record_tokens("completion_stream", usage)
+                response_text = "".join(tokens)
 
-CURRENT USER MESSAGE:
-{user_message}
+            is_clarification = self._is_clarification(response_text)
 
-CLARIFICATIONS MADE: {clarification_count}/{max_clarifications}"""
+            return response_text, is_clarification
 
-            if clarification_count >= max_clarifications - 1:
-                context_prompt += "\n\nWARNING: This is your last chance for clarification. If you need more information after this, inform that the ticket will be escalated."
+        except ServiceOverloadedException:
+            raise
+        except Exception as e:
+            raise LLMException(f"Error generating LLM response: {str(e)}")
 
-            messages = [
-                SystemMessage(content=self.SYSTEM_PROMPT),
-                HumanMessage(content=context_prompt),
-            ]
+    async def _complete(self, messages: List[BaseMessage]) -> str:
+        """Runs a non-streaming completion"""
+        async with self.limiter.slot():
+            with self.metrics.upstream("openai", "completion"):
+                response = await self.llm.ainvoke(messages)
+        self.metrics.record_tokens("completion", response.usage_metadata)
+        # Ensure response_text is always a string
+        return (
+            response.content
+            if isinstance(response.content, str)
+            else str(response.content)
+        )
 
-            # Generate the response
-            response = self.llm.invoke(messages)
-            # Ensure response_text is always a string
-            response_text = (
+    async def summarize(
+        self, summary: str, messages: List[Dict[str, str]], max_tokens: int = 300
+    ) -> str:
+        """
+        Folds messages into a rolling conversation summary
+
+        Args:
+            summary: Current summary ("" when there is none yet)
+            messages: Messages to add to it, oldest first
+            max_tokens: Length limit of the new summary
+
+        Returns:
+            The updated summary
+        """
+        try:
+            async with self.limiter.slot():
+                with self.metrics.upstream("openai", "summary"):
+                    response = await self.llm.ainvoke(
+                        [
+                            SystemMessage(content=self.SUMMARY_PROMPT),
+                            HumanMessage(
+                                content=f"CURRENT SUMMARY:\n{summary or 'None yet.'}\n\n"
+                                f"NEW MESSAGES:\n{self._format_history(messages)}"
+                            ),
+                        ],
+                        max_tokens=max_tokens,
+                    )
+            self.metrics.record_tokens("summary", response.usage_metadata)
+            return (
                 response.content
                 if isinstance(response.content, str)
                 else str(response.content)
             )
+        except ServiceOverloadedException:
+            raise
+        except Exception as e:
+            raise LLMException(f"Error summarizing conversation history: {str(e)}")
 
-            is_clarification = self._is_clarification(response_text)
+    async def rewrite_queries(
+        self,
+        user_message: str,
+        conversation_history: List[Dict[str, str]],
+        history_summary: str = "",
+        count: int = 3,
+    ) -> List[str]:
+        """
+        Generates search queries for the current message, standalone one first
 
-            return response_text, is_clarification
+        Args:
+            user_message: Current user message
+            conversation_history: Recent messages, oldest first
+            history_summary: Summary of the messages older than conversation_history
+            count: Maximum number of queries
 
+        Returns:
+            Up to `count` distinct queries
+        """
+        summary_section = (
+            f"SUMMARY OF EARLIER MESSAGES:\n{history_summary}\n\n" if history_summary else ""
+        )
+        try:
+            async with self.limiter.slot():
+                with self.metrics.upstream("openai", "rewrite"):
+                    response = await self.llm.ainvoke(
+                        [
+                            SystemMessage(content=self.REWRITE_PROMPT.format(count=count)),
+                            HumanMessage(
+                                content=f"{summary_section}CONVERSATION HISTORY:\n"
+                                f"{self._format_history(conversation_history)}\n\n"
+                                f"CURRENT USER MESSAGE:\n{user_message}"
+                            ),
+                        ],
+                        max_tokens=60 * count,
+                        temperature=0,
+                    )
+            self.metrics.record_tokens("rewrite", response.usage_metadata)
+        except ServiceOverloadedException:
+            raise
         except Exception as e:
-            raise LLMException(f"Error generating LLM response: {str(e)}")
+            raise LLMException(f"Error rewriting the search query: {str(e)}")
+
+        text = response.content if isinstance(response.content, str) else str(response.content)
+        queries: List[str] = []
+        for line in text.splitlines():
+            # Models number or bullet the lines now and then despite the prompt
+            query = re.sub(r"^\s*(?:\d+[.)]|[-*•])\s*", "", line).strip().strip('"')
+            if query and query.lower() not in (q.lower() for q in queries):
+                queries.append(query)
+        return queries[:count]
+
+    def _prompt_key(self, messages: List[BaseMessage]) -> str:
+        """Hash of the model and the exact prompt"""
+        payload = json.dumps(
+            [getattr(self.llm, "model_name", "")]
+            + [[m.type, m.content] for m in messages],
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def stats(self) -> dict[str, Any]:
+        """Completion coalescing and chat model limit counters"""
+        return {
+            "completion_coalescing": self._completions.stats(),
+            "openai_chat_limit": self.limiter.stats(),
+        }
+
+    def _build_messages(
+        self,
+        user_message: str,
+        context: str,
+        conversation_history: List[Dict[str, str]],
+        clarification_count: int,
+        max_clarifications: int,
+        history_summary: str = "",
+    ) -> List[BaseMessage]:
+        """Builds the prompt messages with context, history and clarification state"""
+        summary_section = (
+            f"SUMMARY OF EARLIER MESSAGES:\n{history_summary}\n\n" if history_summary else ""
+        )
+        context_prompt = f"""RETRIEVED CONTEXT:
+{context}
+
+{summary_section}CONVERSATION HISTORY:
+{self._format_history(conversation_history)}
+
+CURRENT USER MESSAGE:
+{user_message}
+
+CLARIFICATIONS MADE: {clarification_count}/{max_clarifications}"""
+
+        if clarification_count >= max_clarifications - 1:
+            context_prompt += "\n\nWARNING: This is your last chance for clarification. If you need more information after this, inform that the ticket will be escalated."
+
+        return [
+            SystemMessage(content=self.SYSTEM_PROMPT),
+            HumanMessage(content=context_prompt),
+        ]
 
     def _format_history(self, history: List[Dict[str, str]]) -> str:
         """Formats the conversation history for the prompt"""
@@ -0,0 +1,299 @@
+"""
+Infrastructure Layer - Metrics
+Latency histograms and counters of the graph nodes and upstream calls,
+exposed in the Prometheus text format
+"""
+
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Iterator, List, Sequence
+
+from src.infrastructure.config import get_settings
+
+# Seconds; from a cache hit up to a slow completion
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# (name, milliseconds) of the stages timed during the current request, when
+# the Server-Timing header is enabled
+_server_timings: ContextVar[List[tuple[str, float]] | None] = ContextVar(
+    "server_timings", default=None
+)
+
+
+class Histogram:
+    """
+    Cumulative latency histogram with a fixed set of labels
+    Updated from the event loop only, so it takes no lock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        """
+        Args:
+            name: Metric name
+            documentation: HELP text
+            labelnames: Names of the labels, in the order observe takes their values
+            buckets: Upper bounds of the buckets, ascending (+Inf is implicit)
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series: dict[tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """Records a value for the label values, given in the order of labelnames"""
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labelvalues, (counts, total) in sorted(self._series.items()):
+            labels = _labels(self.labelnames, labelvalues)
+            cumulative = 0
+            for bound, count in zip([*map(_number, self.buckets), "+Inf"], counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}'
+            yield f"{self.name}_sum{{{labels}}} {_number(total)}"
+            yield f"{self.name}_count{{{labels}}} {cumulative}"
+
+
+class Counter:
+    """Monotonic counter with a fixed set of labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float, *labelvalues: str) -> None:
+        """Adds to the counter of the label values, given in the order of labelnames"""
+        self._series[labelvalues] = self._series.get(labelvalues, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labelvalues, value in sorted(self._series.items()):
+            yield f"{self.name}{{{_labels(self.labelnames, labelvalues)}}} {_number(value)}"
+
+
+class _Timer:
+    """
+    Context manager observing the time spent in its block into a histogram,
+    with an outcome label (ok or error), and into the Server-Timing entries
+    """
+
+    __slots__ = ("histogram", "labelvalues", "timing", "started")
+
+    def __init__(
+        self, histogram: Histogram | None, labelvalues: tuple[str, ...], timing: str
+    ):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+        self.timing = timing
+
+    def __enter__(self) -> "_Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        elapsed = time.perf_counter() - self.started
+        if self.histogram is not None:
+            self.histogram.observe(
+                elapsed, *self.labelvalues, "ok" if exc_type is None else "error"
+            )
+        timings = _server_timings.get()
+        if timings is not None:
+            timings.append((self.timing, elapsed * 1000))
+
+
+class MetricsRegistry:
+    """
+    Process-wide instruments of the application
+    Pattern: Registry - the adapters, the graph and the API share one set of
+    metrics, rendered together at /metrics
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Args:
+            enabled: When False nothing is recorded (timers only feed Server-Timing)
+        """
+        self.enabled = enabled
+        self.node_duration = Histogram(
+            "chatrag_graph_node_duration_seconds",
+            "Time spent in each node of the conversation graph",
+            ("node", "outcome"),
+        )
+        self.upstream_duration = Histogram(
+            "chatrag_upstream_duration_seconds",
+            "Time spent in calls to OpenAI, Azure AI Search and the checkpoint backend",
+            ("upstream", "operation", "outcome"),
+        )
+        self.upstream_wait = Histogram(
+            "chatrag_upstream_wait_seconds",
+            "Time calls to OpenAI and Azure AI Search wait for their upstream's limits",
+            ("upstream",),
+        )
+        self.request_duration = Histogram(
+            "chatrag_http_request_duration_seconds",
+            "Time until the response headers of each API route are sent",
+            ("method", "route", "status"),
+        )
+        self.llm_tokens = Counter(
+            "chatrag_llm_tokens_total",
+            "Prompt and completion tokens reported by the chat model",
+            ("operation", "kind"),
+        )
+        self.stage_timeouts = Counter(
+            "chatrag_stage_timeouts_total",
+            "Graph stages cut short by their share of the request deadline",
+            ("stage",),
+        )
+        self.degraded_answers = Counter(
+            "chatrag_degraded_answers_total",
+            "Turns answered from cached search results or with the degraded message",
+            ("reason",),
+        )
+        self.hedged_calls = Counter(
+            "chatrag_hedged_calls_total",
+            "Upstream calls that were sent a second time, by the attempt that answered",
+            ("upstream", "winner"),
+        )
+
+    def node(self, node: str) -> _Timer:
+        """Times a graph node"""
+        return _Timer(self.node_duration if self.enabled else None, (node,), node)
+
+    def upstream(self, upstream: str, operation: str) -> _Timer:
+        """Times a call to an upstream service"""
+        return _Timer(
+            self.upstream_duration if self.enabled else None,
+            (upstream, operation),
+            f"{upstream}.{operation}",
+        )
+
+    def record_tokens(self, operation: str, usage: dict | None) -> None:
+        """Counts the tokens of a completion from its LangChain usage metadata"""
+        if not self.enabled or not usage:
+            return
+        self.llm_tokens.inc(usage.get("input_tokens", 0), operation, "prompt")
+        self.llm_tokens.inc(usage.get("output_tokens", 0), operation, "completion")
+
+    def record_timeout(self, stage: str) -> None:
+        """Counts a stage that ran out of its time budget"""
+        if self.enabled:
+            self.stage_timeouts.inc(1, stage)
+
+    def record_degraded(self, reason: str) -> None:
+        """Counts a turn answered without fresh search results"""
+        if self.enabled:
+            self.degraded_answers.inc(1, reason)
+
+    def record_hedge(self, upstream: str, hedge_won: bool) -> None:
+        """Counts a hedged call and which attempt answered it"""
+        if self.enabled:
+            self.hedged_calls.inc(1, upstream, "hedge" if hedge_won else "original")
+
+    def render(self, stats: dict[str, Any] | None = None) -> str:
+        """
+        The metrics in the Prometheus text format (version 0.0.4)
+
+        Args:
+            stats: Runtime statistics (e.g. ConversationGraph.stats()); their
+                numeric values are exported as gauges, which covers the cache
+                hit rates and the checkpoint store size
+        """
+        lines: List[str] = []
+        for metric in (
+            self.request_duration,
+            self.node_duration,
+            self.upstream_duration,
+            self.upstream_wait,
+            self.llm_tokens,
+            self.stage_timeouts,
+            self.degraded_answers,
+            self.hedged_calls,
+        ):
+            lines.extend(metric.render())
+        for name, value in _flatten("chatrag", stats or {}):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def instrument_checkpointer(checkpointer: Any, metrics: "MetricsRegistry") -> None:
+    """
+    Times the reads and writes LangGraph makes to a checkpoint saver
+    The saver's methods are wrapped in place, once; any backend works.
+    """
+    if not metrics.enabled or getattr(checkpointer, "_instrumented", False):
+        return
+
+    def timed(operation: str) -> Callable[..., Awaitable[Any]]:
+        method = getattr(checkpointer, operation)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            with metrics.upstream("checkpoint", operation):
+                return await method(*args, **kwargs)
+
+        return call
+
+    for operation in ("aget_tuple", "aput", "aput_writes"):
+        setattr(checkpointer, operation, timed(operation))
+    checkpointer._instrumented = True
+
+
+def start_server_timing() -> List[tuple[str, float]]:
+    """Starts collecting the stage timings of the current request"""
+    timings: List[tuple[str, float]] = []
+    _server_timings.set(timings)
+    return timings
+
+
+def format_server_timing(timings: List[tuple[str, float]]) -> str:
+    """Server-Timing header value; repeated stages are added up"""
+    totals: dict[str, float] = {}
+    for name, milliseconds in timings:
+        totals[name] = totals.get(name, 0.0) + milliseconds
+    return ", ".join(f"{name};dur={milliseconds:.1f}" for name, milliseconds in totals.items())
+
+
+@lru_cache
+def get_metrics() -> MetricsRegistry:
+    """Returns the process-wide metrics registry"""
+    return MetricsRegistry(enabled=get_settings().metrics_enabled)
+
+
+def _flatten(prefix: str, stats: dict[str, Any]) -> Iterator[tuple[str, float]]:
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
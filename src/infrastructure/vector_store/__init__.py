@@ -3,33 +3,85 @@ Infrastructure Layer - Vector Store (Azure AI Search)
 Implements the interface with Azure AI Search for document retrieval
 """
 
+import asyncio
+import time
 from typing import List
 
 from azure.core.credentials import AzureKeyCredential
-from azure.search.documents import SearchClient
+from azure.search.documents.aio import SearchClient
 from azure.search.documents.models import VectorizedQuery
-from langchain_openai import OpenAIEmbeddings
-from pydantic import SecretStr
+from langchain_core.embeddings import Embeddings
 
-from src.domain import RetrievedSection, VectorStoreException
-from src.infrastructure.config import get_settings
+from src.domain import (
+    RetrievedSection,
+    ServiceOverloadedException,
+    VectorStore,
+    VectorStoreException,
+)
+from src.infrastructure.admission import create_upstream_limiter
+from src.infrastructure.cache import RetrievalCache, SingleFlight, create_cache_generations
+from src.infrastructure.cassette import CassetteSearchClient, get_cassette
+from src.infrastructure.config import Settings, get_settings
+from src.infrastructure.deadline import LatencyTracker, hedged
+from src.infrastructure.metrics import get_metrics
+from src.infrastructure.embeddings import (
+    create_embeddings,
+    embedding_stats,
+    normalize_text,
+)
+from src.infrastructure.vector_store.hybrid import BM25Index, reciprocal_rank_fusion
+from src.infrastructure.vector_store.local import LocalVectorStore
 
+# Documents per upload request; keeps requests with 3072-dimension vectors
+# well below the Azure AI Search payload limit
+UPLOAD_BATCH_SIZE = 100
 
-class AzureAISearchVectorStore:
+
+class AzureAISearchVectorStore(VectorStore):
     """
     Repository Pattern - encapsulates Azure AI Search access
     Principle: Dependency Inversion - depends on abstractions (interfaces) not concrete implementations
+    Hybrid projects send the query text along with the vector query, and the
+    service fuses both rankings by reciprocal rank. Results of repeated
+    queries are served from a RetrievalCache when enabled, and dropped when
+    the project is written by this or another process. A search still
+    running after the p95 latency of the recent ones is sent again, and the
+    first response is used (hedging).
     """
 
-    def __init__(self):
-        """Initializes the connection with Azure AI Search"""
+    def __init__(self, embeddings: Embeddings | None = None):
+        """
+        Initializes the connection with Azure AI Search
+
+        Args:
+            embeddings: Optional query embedding model (defaults to the cached
+                OpenAI embeddings from create_embeddings)
+        """
         settings = get_settings()
+        super().__init__(create_cache_generations(settings))
+        self.retrieval_options = settings.retrieval_options
+        self.metrics = get_metrics()
+        # Concurrent identical searches share one embedding and search call
+        self._searches = SingleFlight()
+        # Searches in flight and per second; query embeddings are limited by
+        # the embedding model (see create_embeddings)
+        self.limiter = create_upstream_limiter("azure_search", settings)
+        self.hedging = settings.retrieval_hedge_enabled
+        self.hedge_min_delay = settings.retrieval_hedge_min_ms / 1000
+        self.search_latency = LatencyTracker()
+        self.hedged = 0
+        self.hedges_won = 0
+        self.result_cache = (
+            RetrievalCache(
+                ttl_seconds=settings.retrieval_cache_ttl_seconds,
+                max_entries=settings.retrieval_cache_max_entries,
+            )
+            if settings.retrieval_cache_enabled
+            else None
+        )
 
         try:
-            self.embeddings = OpenAIEmbeddings(
-                api_key=SecretStr(settings.openai_api_key),
-                model=settings.openai_embedding_model,
-            )
+            self.embeddings = embeddings or create_embeddings(settings)
 
             # Initialize Azure Search client
             credential = AzureKeyCredential(settings.azure_search_key)
@@ -42,7 +94,47 @@ class AzureAISearchVectorStore:
         except Exception as e:
             raise VectorStoreException(f"Error initializing Azure AI Search: {str(e)}")
 
-    def similarity_search(
+        self.cassette = get_cassette()
+        if self.cassette is not None:
+            self.search_client = CassetteSearchClient(self.search_client, self.cassette)  # type: ignore[assignment]
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embeds a query with the same (cached) model used for retrieval
+
+        Args:
+            query: User query
+
+        Returns:
+            Query embedding
+        """
+        try:
+            with self.metrics.upstream("openai", "embed_query"):
+                return await self.embeddings.aembed_query(query)
+        except ServiceOverloadedException:
+            raise
+        except Exception as e:
+            raise VectorStoreException(f"Error embedding query: {str(e)}")
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embeds queries in one batch through the (cached) query embedding model
+
+        Args:
+            queries: User queries
+
+        Returns:
+            Query embeddings, in the order of the queries
+        """
+        try:
+            with self.metrics.upstream("openai", "embed_queries"):
+                return await self.embeddings.aembed_documents(queries)
+        except ServiceOverloadedException:
+            raise
+        except Exception as e:
+            raise VectorStoreException(f"Error embedding queries: {str(e)}")
+
+    async def similarity_search(
         self, query: str, k: int = 5, project_name: str | None = None
     ) -> List[RetrievedSection]:
         """
@@ -56,40 +148,261 @@ class AzureAISearchVectorStore:
         Returns:
             List of retrieved sections with score
         """
+        key = (project_name, k, normalize_text(query))
+        sections = await self._searches.do(
+            key, lambda: self._search(query, k, project_name)
+        )
+        # Every coalesced caller gets its own list
+        return list(sections)
+
+    async def similarity_search_many(
+        self, queries: List[str], k: int = 5, project_name: str | None = None
+    ) -> List[List[RetrievedSection]]:
+        """
+        Embeds the queries in one batch and runs their searches concurrently
+
+        Args:
+            queries: User queries
+            k: Number of documents to return per query
+            project_name: Optional project name to filter results
+
+        Returns:
+            One list of retrieved sections per query
+        """
+        vectors: List[List[float] | None] = [None] * len(queries)
+        if self.retrieval_options(project_name).mode != "lexical":
+            vectors = list(await self.embed_queries(queries))
+        return list(
+            await asyncio.gather(
+                *(
+                    self._search(query, k, project_name, vector)
+                    for query, vector in zip(queries, vectors)
+                )
+            )
+        )
+
+    async def _search(
+        self,
+        query: str,
+        k: int,
+        project_name: str | None,
+        query_vector: List[float] | None = None,
+    ) -> List[RetrievedSection]:
+        """
+        Embeds the query (unless its embedding is given) and runs the vector,
+        keyword or hybrid search against Azure AI Search
+        """
         try:
-            # Generate embeddings for the query
-            query_vector = self.embeddings.embed_query(query)
+            options = self.retrieval_options(project_name)
 
             # Build filter expression for Azure AI Search
             filter_expression = None
             if project_name:
                 filter_expression = f"projectName eq '{project_name}'"
 
-            # Build vector query using VectorizedQuery
-            vector_query = VectorizedQuery(
-                vector=query_vector,
-                k_nearest_neighbors=k,
-                fields="embeddings",
-            )
+            if options.mode != "lexical" and query_vector is None:
+                # Generate embeddings for the query
+                with self.metrics.upstream("openai", "embed_query"):
+                    query_vector = await self.embeddings.aembed_query(query)
 
-            # Perform vector search using Azure Search SDK
-            results = self.search_client.search(
-                search_text=None,
-                vector_queries=[vector_query],
-                filter=filter_expression,
-                select=["content", "type"],
-                top=k,
-            )
+            cache_key, generation = None, 0
+            if self.result_cache is not None:
+                # Drops the results of projects written by another process
+                self.check_invalidations(project_name)
+                cache_key = self.result_cache.key(
+                    project_name,
+                    k,
+                    query_vector,
+                    None if options.mode == "vector" else normalize_text(query),
+                )
+                cached = self.result_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+                generation = self.result_cache.generation
 
-            # Convert to domain format
-            sections = []
-            for result in results:
-                # Azure Cognitive Search returns @search.score
-                score = result.get("@search.score", 0.0)
-                content = result.get("content", "")
-                sections.append(RetrievedSection(score=score, content=content))
+            vector_queries = None
+            if options.mode != "lexical":
+                # Build vector query using VectorizedQuery; in hybrid mode it
+                # brings `candidates` results to the fusion, weighted against
+                # the text query (whose weight is always 1)
+                hybrid = options.mode == "hybrid"
+                vector_queries = [
+                    VectorizedQuery(
+                        vector=query_vector,
+                        k_nearest_neighbors=max(k, options.candidates) if hybrid else k,
+                        fields="embeddings",
+                        weight=options.vector_weight / options.lexical_weight
+                        if hybrid
+                        else None,
+                    )
+                ]
+
+            sections = await hedged(
+                lambda: self._query(query, k, options.mode, vector_queries, filter_expression),
+                self._hedge_delay(),
+                self._count_hedge,
+            )
 
+            if cache_key is not None:
+                self.result_cache.put(
+                    cache_key, sections, generation, text=normalize_text(query)
+                )
             return sections
 
+        except ServiceOverloadedException:
+            raise
         except Exception as e:
             raise VectorStoreException(f"Error in vector search: {str(e)}")
+
+    async def _query(
+        self,
+        query: str,
+        k: int,
+        mode: str,
+        vector_queries: List[VectorizedQuery] | None,
+        filter_expression: str | None,
+    ) -> List[RetrievedSection]:
+        """One search request to Azure AI Search"""
+        started = time.perf_counter()
+        # Perform the search using Azure Search SDK; results are paged in
+        # lazily, so the timing covers the iteration too
+        async with self.limiter.slot():
+            with self.metrics.upstream("azure_search", mode):
+                results = await self.search_client.search(
+                    search_text=None if mode == "vector" else query,
+                    vector_queries=vector_queries,
+                    filter=filter_expression,
+                    select=["content", "type"],
+                    top=k,
+                )
+
+                # Convert to domain format
+                sections = []
+                async for result in results:
+                    # Azure Cognitive Search returns @search.score
+                    score = result.get("@search.score", 0.0)
+                    content = result.get("content", "")
+                    sections.append(RetrievedSection(score=score, content=content))
+
+        self.search_latency.observe(time.perf_counter() - started)
+        return sections
+
+    def _hedge_delay(self) -> float | None:
+        """p95 of the recent searches, or None when hedging is off or not yet calibrated"""
+        if not self.hedging:
+            return None
+        p95 = self.search_latency.quantile(0.95)
+        return None if p95 is None else max(p95, self.hedge_min_delay)
+
+    def _count_hedge(self, hedge_won: bool) -> None:
+        self.hedged += 1
+        self.hedges_won += hedge_won
+        self.metrics.record_hedge("azure_search", hedge_won)
+
+    def cached_search(
+        self, query: str, k: int = 5, project_name: str | None = None
+    ) -> List[RetrievedSection] | None:
+        """
+        The last results of a query from the result cache, however old,
+        without calling Azure AI Search; for turns whose search failed
+        """
+        if self.result_cache is None:
+            return None
+        self.check_invalidations(project_name)
+        return self.result_cache.latest(project_name, k, normalize_text(query))
+
+    async def add_documents(
+        self, project_name: str, documents: List[dict], vectors: List[List[float]]
+    ) -> None:
+        """
+        Uploads documents with their embeddings and project in bulk
+
+        Args:
+            project_name: Value of the projectName field searches filter on
+            documents: Documents ({"id", "content", "type"}), in the order of the vectors
+            vectors: Document embeddings, stored in the "embeddings" vector field
+        """
+        batch = [
+            {
+                **document,
+                "projectName": project_name,
+                "embeddings": [float(value) for value in vector],
+            }
+            for document, vector in zip(documents, vectors, strict=True)
+        ]
+        try:
+            for start in range(0, len(batch), UPLOAD_BATCH_SIZE):
+                results = await self.search_client.upload_documents(
+                    documents=batch[start : start + UPLOAD_BATCH_SIZE]
+                )
+                failed = [result.key for result in results if not result.succeeded]
+                if failed:
+                    raise VectorStoreException(
+                        f"Failed to upload {len(failed)} documents, e.g. {failed[0]}"
+                    )
+        except VectorStoreException:
+            raise
+        except Exception as e:
+            raise VectorStoreException(f"Error uploading documents: {str(e)}")
+        finally:
+            self.invalidate_cache(project_name)
+
+    async def delete_documents(self, project_name: str, ids: List[str]) -> None:
+        """
+        Deletes documents by key in bulk
+
+        Args:
+            project_name: Project of the documents (keys are unique across projects)
+            ids: Keys of the documents; unknown keys are ignored by the service
+        """
+        try:
+            for start in range(0, len(ids), UPLOAD_BATCH_SIZE):
+                await self.search_client.delete_documents(
+                    documents=[{"id": id_} for id_ in ids[start : start + UPLOAD_BATCH_SIZE]]
+                )
+        except Exception as e:
+            raise VectorStoreException(f"Error deleting documents: {str(e)}")
+        finally:
+            self.invalidate_cache(project_name)
+
+    def clear_cache(self, project_name: str) -> None:
+        """Drops the cached results of a project"""
+        if self.result_cache is not None:
+            self.result_cache.invalidate(project_name)
+
+    def stats(self) -> dict:
+        """Search coalescing and limit counters, plus the cache and batcher ones when configured"""
+        return {
+            **embedding_stats(self.embeddings),
+            "search_coalescing": self._searches.stats(),
+            "azure_search_limit": self.limiter.stats(),
+            "search_hedging": {
+                "hedged": self.hedged,
+                "hedges_won": self.hedges_won,
+                "delay_ms": round((self._hedge_delay() or 0.0) * 1000, 1),
+            },
+            "retrieval_cache": self.result_cache.stats() if self.result_cache else {},
+            "cassette": self.cassette.stats() if self.cassette else {},
+        }
+
+    async def close(self) -> None:
+        """Closes the underlying Azure AI Search HTTP session"""
+        await self.search_client.close()
+
+
+def create_vector_store(settings: Settings | None = None) -> VectorStore:
+    """
+    Factory method for the retrieval backend selected in the settings
+    Pattern: Factory - "azure" is Azure AI Search, "local" the in-process index
+    """
+    settings = settings or get_settings()
+
+    if settings.vector_store_backend == "local":
+        return LocalVectorStore(
+            directory=settings.local_index_path,
+            dtype=settings.local_index_dtype,
+            ivf_probes=settings.local_index_ivf_probes,
+            retrieval_options=settings.retrieval_options,
+            generations=create_cache_generations(settings),
+        )
+    return AzureAISearchVectorStore()
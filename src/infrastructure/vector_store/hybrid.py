@@ -0,0 +1,115 @@
+"""
+Infrastructure Layer - Vector Store (hybrid retrieval)
+Lexical scoring and rank fusion combined with the vector results
+"""
+
+import math
+import re
+from array import array
+from collections import Counter
+from typing import Hashable, List, Sequence, TypeVar
+
+import numpy as np
+
+H = TypeVar("H", bound=Hashable)
+
+# Words, plus identifiers joined by - _ . : / such as ERR-4021 or v2.1.3
+_TOKEN = re.compile(r"\w+(?:[-_.:/]\w+)*")
+_SEPARATOR = re.compile(r"[-_.:/]")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms of a text
+    Compound identifiers are kept whole and also split into their parts, so
+    "ERR-4021" matches both "err-4021" and "4021".
+    """
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if _SEPARATOR.search(token):
+            tokens.extend(part for part in _SEPARATOR.split(token) if part)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory inverted index scored with Okapi BM25
+    Documents are numbered by insertion order, matching the rows of the
+    partition they index. Postings are compact arrays of (row, term frequency).
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> (rows, term frequencies)
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+
+    @property
+    def rows(self) -> int:
+        """Documents indexed so far"""
+        return len(self._lengths)
+
+    def add(self, text: str) -> None:
+        """Indexes the next row"""
+        row = len(self._lengths)
+        terms = Counter(tokenize(text))
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("I"), array("I"))
+            postings[0].append(row)
+            postings[1].append(frequency)
+        length = sum(terms.values())
+        self._lengths.append(length)
+        self._total_length += length
+
+    def search(
+        self, query: str, n: int, excluded: np.ndarray | None = None
+    ) -> List[tuple[int, float]]:
+        """
+        The n best matching rows as (row, score), best first
+        Rows flagged in `excluded` (e.g. deleted ones) are left out.
+        """
+        if not self.rows:
+            return []
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / self.rows))
+        scores = np.zeros(self.rows, dtype=np.float32)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            rows = np.frombuffer(postings[0], dtype=np.uint32)
+            frequencies = np.frombuffer(postings[1], dtype=np.uint32).astype(np.float32)
+            idf = math.log(1 + (self.rows - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += (
+                idf * frequencies * (self.k1 + 1) / (frequencies + length_norm[rows])
+            )
+        if excluded is not None:
+            scores[excluded[: self.rows]] = 0
+        matched = np.flatnonzero(scores > 0)
+        if len(matched) > n:
+            matched = matched[np.argpartition(-scores[matched], n)[:n]]
+        matched = matched[np.argsort(-scores[matched])]
+        return [(int(row), float(scores[row])) for row in matched]
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[H]],
+    weights: Sequence[float] | None = None,
+    k: int = 60,
+) -> List[tuple[H, float]]:
+    """
+    Fuses ranked lists: every item scores sum(weight / (k + rank)) over the
+    lists it appears in (ranks start at 1). Returns (item, score), best first.
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: dict[H, float] = {}
+    for ranking, weight in zip(rankings, weights, strict=True):
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda entry: -entry[1])
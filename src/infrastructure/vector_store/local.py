@@ -0,0 +1,822 @@
+"""
+Infrastructure Layer - Vector Store (local index)
+In-process NumPy index, memory-mapped from disk, for offline and low-latency retrieval
+"""
+
+import asyncio
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.domain import (
+    CacheGenerations,
+    RetrievedSection,
+    ServiceOverloadedException,
+    VectorStore,
+    VectorStoreException,
+)
+from src.infrastructure.cache import SingleFlight
+from src.infrastructure.config import RetrievalOptions, get_settings
+from src.infrastructure.embeddings import (
+    create_embeddings,
+    embedding_stats,
+    normalize_text,
+)
+from src.infrastructure.metrics import get_metrics
+from src.infrastructure.vector_store.hybrid import BM25Index, reciprocal_rank_fusion
+
+GENERATION_FILES = (
+    "vectors.{g}.bin",
+    "scales.{g}.bin",
+    "documents.{g}.jsonl",
+    "deleted.{g}.bin",
+    "ivf.{g}.npz",
+)
+
+# Rows scored per matrix multiply; small enough for the float32 copy of an int8
+# block to stay in the CPU cache
+BLOCK_ROWS = 4096
+
+
+class IndexPartition:
+    """
+    The documents of one project, stored in a directory
+
+    Files (g is the generation, bumped by every compaction):
+        meta.json          project, dimension, dtype, generation, row counts
+        vectors.{g}.bin    contiguous float32 or int8 rows, L2-normalized
+        scales.{g}.bin     float32 dequantization scale per row (int8 only)
+        documents.{g}.jsonl  one JSON document (id, content, type) per row
+        deleted.{g}.bin    int64 numbers of the deleted rows (tombstones)
+        ivf.{g}.npz        IVF centroids and the rows of each list (optional)
+
+    Writers append first and replace meta.json last, so a reader never maps a
+    partially written row. Readers pick up changes, from this or another
+    process, when meta.json changes. Deleted rows are masked until enough of
+    them pile up for compact() to rewrite the live rows as a new generation.
+    """
+
+    def __init__(self, directory: str, project_name: str, dtype: str = "float32"):
+        self.directory = directory
+        self.project_name = project_name
+        self.dtype = np.dtype(dtype)
+        self.dimension = 0
+        self.generation = 0
+        self.count = 0
+        self.deleted = 0
+        self.ivf_rows = 0
+        self.ivf_lists = 0
+        self._meta_version: tuple[int, int] | None = None
+        self._reset()
+        self._lock = threading.RLock()
+
+    def _reset(self) -> None:
+        """Forgets the state read from the files of the current generation"""
+        if getattr(self, "_documents_file", None) is not None:
+            self._documents_file.close()
+        self._vectors: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+        self._documents_file = None
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._ids: List[str] = []
+        self._rows_by_id: dict[str, int] = {}
+        self._deleted_mask = np.zeros(0, dtype=bool)
+        self._deleted_loaded = 0
+        self._centroids: np.ndarray | None = None
+        self._ivf_order: np.ndarray | None = None
+        self._ivf_offsets: np.ndarray | None = None
+        self._lexical: BM25Index | None = None
+
+    def _path(self, name: str, generation: int | None = None) -> str:
+        if "{g}" in name:
+            name = name.format(g=self.generation if generation is None else generation)
+        return os.path.join(self.directory, name)
+
+    @property
+    def live(self) -> int:
+        """Rows that are not deleted"""
+        return self.count - self.deleted
+
+    def refresh(self) -> None:
+        """Remaps the files when another writer changed the partition"""
+        # A compaction in another process may delete the files of the
+        # generation just read from meta.json; read it again in that case
+        for attempt in range(3):
+            try:
+                self._refresh()
+                return
+            except FileNotFoundError:
+                if attempt == 2:
+                    raise
+                self._meta_version = None
+
+    def _refresh(self) -> None:
+        try:
+            stat = os.stat(self._path("meta.json"))
+        except FileNotFoundError:
+            return
+        # meta.json is replaced, never rewritten in place, so the inode changes too
+        version = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if version == self._meta_version:
+                return
+            with open(self._path("meta.json")) as meta_file:
+                meta = json.load(meta_file)
+            if meta["generation"] != self.generation or self._documents_file is None:
+                self._reset()
+                self.generation = meta["generation"]
+                if meta["count"]:
+                    self._documents_file = open(self._path("documents.{g}.jsonl"), "rb")
+            self.dimension = meta["dimension"]
+            self.dtype = np.dtype(meta["dtype"])
+            self.count = meta["count"]
+            self.deleted = meta["deleted"]
+            self.ivf_rows = meta["ivf_rows"]
+            self.ivf_lists = meta["ivf_lists"]
+
+            self._vectors = self._scales = None
+            if self.count:
+                self._vectors = np.memmap(
+                    self._path("vectors.{g}.bin"),
+                    dtype=self.dtype,
+                    mode="r",
+                    shape=(self.count, self.dimension),
+                )
+                if self.dtype == np.int8:
+                    self._scales = np.memmap(
+                        self._path("scales.{g}.bin"),
+                        dtype=np.float32,
+                        mode="r",
+                        shape=(self.count,),
+                    )
+            self._load_documents()
+            self._load_deleted()
+            self._load_ivf()
+            self._meta_version = version
+
+    def _load_documents(self) -> None:
+        """Indexes the offset and id of every document line not indexed yet"""
+        known = len(self._offsets) - 1
+        if known >= self.count:
+            return
+        data = os.pread(
+            self._documents_file.fileno(),
+            os.fstat(self._documents_file.fileno()).st_size - int(self._offsets[-1]),
+            int(self._offsets[-1]),
+        )
+        ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n"))
+        ends = ends[: self.count - known] + 1
+        start = 0
+        for row, end in enumerate(ends.tolist(), start=known):
+            document_id = json.loads(data[start:end])["id"]
+            self._ids.append(document_id)
+            self._rows_by_id[document_id] = row
+            start = end
+        self._offsets = np.concatenate([self._offsets, ends + self._offsets[-1]])
+
+    def _load_deleted(self) -> None:
+        """Masks the rows deleted since the last refresh"""
+        if len(self._deleted_mask) < self.count:
+            self._deleted_mask = np.concatenate(
+                [self._deleted_mask, np.zeros(self.count - len(self._deleted_mask), bool)]
+            )
+        if self._deleted_loaded >= self.deleted:
+            return
+        itemsize = np.dtype(np.int64).itemsize
+        with open(self._path("deleted.{g}.bin"), "rb") as deleted_file:
+            deleted_file.seek(self._deleted_loaded * itemsize)
+            data = deleted_file.read((self.deleted - self._deleted_loaded) * itemsize)
+        for row in np.frombuffer(data, dtype=np.int64).tolist():
+            self._deleted_mask[row] = True
+            if self._rows_by_id.get(self._ids[row]) == row:
+                del self._rows_by_id[self._ids[row]]
+        self._deleted_loaded = self.deleted
+
+    def _load_ivf(self) -> None:
+        self._centroids = self._ivf_order = self._ivf_offsets = None
+        if self.ivf_rows and os.path.exists(self._path("ivf.{g}.npz")):
+            with np.load(self._path("ivf.{g}.npz")) as ivf:
+                self._centroids = ivf["centroids"]
+                self._ivf_order = ivf["order"]
+                self._ivf_offsets = ivf["offsets"]
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Serializes writers of this partition across threads and processes"""
+        # POSIX only, like the shared memory-mapped files themselves
+        import fcntl
+
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock, open(self._path(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                self._truncate_uncommitted()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+        self.refresh()
+
+    def append(self, documents: List[dict], vectors: np.ndarray) -> None:
+        """Appends documents and their embeddings, skipping ids already indexed"""
+        vectors = _normalize(vectors)
+        with self._writing():
+            # Last position of every id not indexed yet
+            positions = {
+                document["id"]: i
+                for i, document in enumerate(documents)
+                if document["id"] not in self._rows_by_id
+            }
+            if not positions:
+                return
+            new = sorted(positions.values())
+            documents = [documents[i] for i in new]
+            vectors = vectors[new]
+            if not self.dimension:
+                self.dimension = vectors.shape[1]
+            elif vectors.shape[1] != self.dimension:
+                raise VectorStoreException(
+                    f"Embedding dimension {vectors.shape[1]} does not match "
+                    f"the index dimension {self.dimension}"
+                )
+
+            with open(self._path("vectors.{g}.bin"), "ab") as vectors_file:
+                if self.dtype == np.int8:
+                    quantized, scales = _quantize(vectors)
+                    vectors_file.write(quantized.tobytes())
+                    with open(self._path("scales.{g}.bin"), "ab") as scales_file:
+                        scales_file.write(scales.tobytes())
+                else:
+                    vectors_file.write(vectors.astype(self.dtype).tobytes())
+            with open(self._path("documents.{g}.jsonl"), "ab") as documents_file:
+                for document in documents:
+                    line = json.dumps(document, ensure_ascii=False)
+                    documents_file.write(line.encode() + b"\n")
+
+            self._write_meta(count=self.count + len(documents))
+
+    def delete(self, ids: List[str], compact_ratio: float = 0.2) -> int:
+        """
+        Deletes documents by id, returning how many were indexed
+        Compacts the partition once more than compact_ratio of its rows are deleted
+        """
+        with self._writing():
+            rows = sorted({self._rows_by_id[i] for i in ids if i in self._rows_by_id})
+            if not rows:
+                return 0
+            with open(self._path("deleted.{g}.bin"), "ab") as deleted_file:
+                deleted_file.write(np.asarray(rows, dtype=np.int64).tobytes())
+            self._write_meta(deleted=self.deleted + len(rows))
+            self.refresh()
+            if self.deleted > self.count * compact_ratio:
+                self._compact()
+        return len(rows)
+
+    def compact(self) -> None:
+        """Rewrites the live rows as a new generation, dropping the deleted ones"""
+        with self._writing():
+            if self.deleted:
+                self._compact()
+
+    def _compact(self) -> None:
+        old = self.generation
+        new = old + 1
+        live = ~self._deleted_mask[: self.count]
+
+        with open(self._path("vectors.{g}.bin", new), "wb") as vectors_file:
+            for start in range(0, self.count, BLOCK_ROWS):
+                end = min(start + BLOCK_ROWS, self.count)
+                vectors_file.write(self._vectors[start:end][live[start:end]].tobytes())
+        if self.dtype == np.int8:
+            with open(self._path("scales.{g}.bin", new), "wb") as scales_file:
+                scales_file.write(np.asarray(self._scales)[live].tobytes())
+        with open(self._path("documents.{g}.jsonl", new), "wb") as documents_file:
+            for row in np.flatnonzero(live).tolist():
+                documents_file.write(self._document_bytes(row))
+
+        ivf_lists = self.ivf_lists
+        self._write_meta(
+            generation=new, count=int(live.sum()), deleted=0, ivf_rows=0, ivf_lists=0
+        )
+        self.refresh()
+        if ivf_lists and self.count >= ivf_lists:
+            self._save_ivf(*self._cluster(ivf_lists))
+
+        # Readers that still map the old files keep them until they remap
+        for name in GENERATION_FILES:
+            if os.path.exists(self._path(name, old)):
+                os.remove(self._path(name, old))
+
+    def _truncate_uncommitted(self) -> None:
+        """Drops bytes past the committed rows, left by a writer that was interrupted"""
+        committed = {
+            "vectors.{g}.bin": self.count * self.dimension * self.dtype.itemsize,
+            "documents.{g}.jsonl": int(self._offsets[-1]),
+            "deleted.{g}.bin": self.deleted * np.dtype(np.int64).itemsize,
+        }
+        if self.dtype == np.int8:
+            committed["scales.{g}.bin"] = self.count * np.dtype(np.float32).itemsize
+        for name, size in committed.items():
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                os.truncate(path, size)
+
+    def _write_meta(self, **changes: Any) -> None:
+        meta = {
+            "project_name": self.project_name,
+            "dimension": self.dimension,
+            "dtype": self.dtype.name,
+            "generation": self.generation,
+            "count": self.count,
+            "deleted": self.deleted,
+            "ivf_rows": self.ivf_rows,
+            "ivf_lists": self.ivf_lists,
+            **changes,
+        }
+        tmp_path = self._path("meta.json.tmp")
+        with open(tmp_path, "w") as meta_file:
+            json.dump(meta, meta_file)
+        os.replace(tmp_path, self._path("meta.json"))
+
+    def build_ivf(self, n_lists: int) -> None:
+        """
+        Clusters the rows into n_lists inverted lists (spherical k-means)
+        Rows appended afterwards are scored exactly until the next build.
+        """
+        self.refresh()
+        if self.count < n_lists:
+            return
+        ivf = self._cluster(n_lists)
+        with self._writing():
+            # A compaction meanwhile renumbered the rows
+            if self.generation == ivf[3][1]:
+                self._save_ivf(*ivf)
+
+    def _cluster(
+        self, n_lists: int, iterations: int = 10, seed: int = 0
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, tuple[int, int]]:
+        """
+        Spherical k-means over a sample, then assignment of every row
+        Returns the centroids, the rows sorted by list, the list offsets and the
+        (row count, generation) the lists were computed for
+        """
+        count = self.count
+        rng = np.random.default_rng(seed)
+        sample_size = min(count, n_lists * 64)
+        sample = self._rows(np.sort(rng.choice(count, size=sample_size, replace=False)))
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for lst in range(n_lists):
+                members = sample[assignment == lst]
+                if len(members):
+                    centroids[lst] = members.sum(axis=0)
+            centroids = _normalize(centroids)
+
+        assignment = np.concatenate(
+            [
+                np.argmax(self._block(start, start + BLOCK_ROWS) @ centroids.T, axis=1)
+                for start in range(0, count, BLOCK_ROWS)
+            ]
+        )
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        return centroids, order, offsets, (count, self.generation)
+
+    def _save_ivf(
+        self,
+        centroids: np.ndarray,
+        order: np.ndarray,
+        offsets: np.ndarray,
+        snapshot: tuple[int, int],
+    ) -> None:
+        with open(self._path("ivf.npz.tmp"), "wb") as ivf_file:
+            np.savez(ivf_file, centroids=centroids, order=order, offsets=offsets)
+        os.replace(self._path("ivf.npz.tmp"), self._path("ivf.{g}.npz"))
+        # Only the rows clustered are in the lists
+        self._write_meta(ivf_rows=snapshot[0], ivf_lists=len(centroids))
+        self.refresh()
+
+    def search(
+        self, queries: np.ndarray, k: int, ivf_probes: int = 0
+    ) -> List[List[tuple[float, dict, np.ndarray]]]:
+        """
+        Top-k live documents of every query (rows of `queries`, unit length)
+        as (score, document, vector); exact unless an IVF index exists and
+        ivf_probes > 0
+        """
+        self.refresh()
+        # Held so a compaction cannot renumber the rows between scoring and reading
+        with self._lock:
+            return [self._hits(hits) for hits in self._search_rows(queries, k, ivf_probes)]
+
+    def _hits(self, hits: List[tuple[int, float]]) -> List[tuple[float, dict, np.ndarray]]:
+        """Reads the document and vector of every (row, score)"""
+        if not hits:
+            return []
+        vectors = self._rows(np.array([row for row, _ in hits]))
+        return [
+            (score, json.loads(self._document_bytes(row)), vector)
+            for (row, score), vector in zip(hits, vectors)
+        ]
+
+    def lexical_search(
+        self, texts: List[str], n: int
+    ) -> List[List[tuple[float, dict, np.ndarray]]]:
+        """
+        Top-n live documents of every query text by BM25, as (score, document, vector)
+        The keyword index is built in memory on first use and extended with the
+        rows appended since.
+        """
+        self.refresh()
+        with self._lock:
+            self._index_lexical()
+            excluded = self._deleted_mask if self.deleted else None
+            return [self._hits(self._lexical.search(text, n, excluded)) for text in texts]
+
+    def _index_lexical(self) -> None:
+        if self._lexical is None:
+            self._lexical = BM25Index()
+        start = self._lexical.rows
+        if start >= self.count:
+            return
+        base = int(self._offsets[start])
+        data = os.pread(
+            self._documents_file.fileno(), int(self._offsets[self.count]) - base, base
+        )
+        for row in range(start, self.count):
+            line = data[int(self._offsets[row]) - base : int(self._offsets[row + 1]) - base]
+            self._lexical.add(json.loads(line).get("content", ""))
+
+    def _search_rows(
+        self, queries: np.ndarray, k: int, ivf_probes: int
+    ) -> List[List[tuple[int, float]]]:
+        if not self.live:
+            return [[] for _ in queries]
+        if self._centroids is not None and ivf_probes > 0:
+            return [self._search_ivf(query, k, ivf_probes) for query in queries]
+
+        scores = np.empty((self.count, len(queries)), dtype=np.float32)
+        for start in range(0, self.count, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.count)
+            scores[start:end] = self._vectors[start:end] @ queries.T
+        if self.dtype == np.int8:
+            scores *= self._scales[:, None]
+        if self.deleted:
+            scores[self._deleted_mask[: self.count]] = -np.inf
+        rows = np.arange(self.count)
+        return [_top_k(rows, column, min(k, self.live)) for column in scores.T]
+
+    def _search_ivf(
+        self, query: np.ndarray, k: int, ivf_probes: int
+    ) -> List[tuple[int, float]]:
+        lists = np.argsort(-(self._centroids @ query))[:ivf_probes]
+        rows = np.concatenate(
+            [
+                self._ivf_order[self._ivf_offsets[lst] : self._ivf_offsets[lst + 1]]
+                for lst in lists
+            ]
+            # Rows appended since the IVF build are not in any list yet
+            + [np.arange(self.ivf_rows, self.count)]
+        )
+        rows.sort()
+        if self.deleted:
+            rows = rows[~self._deleted_mask[rows]]
+        return _top_k(rows, self._rows(rows) @ query, k)
+
+    def _block(self, start: int, end: int) -> np.ndarray:
+        """Contiguous rows as float32 (no copy for float32 partitions)"""
+        end = min(end, self.count)
+        block = self._vectors[start:end]
+        if self.dtype == np.int8:
+            return block.astype(np.float32) * self._scales[start:end, None]
+        return block
+
+    def _rows(self, rows: np.ndarray) -> np.ndarray:
+        """Arbitrary rows as float32"""
+        vectors = np.asarray(self._vectors[rows], dtype=np.float32)
+        if self.dtype == np.int8:
+            vectors *= self._scales[rows, None]
+        return vectors
+
+    def _document_bytes(self, row: int) -> bytes:
+        return os.pread(
+            self._documents_file.fileno(),
+            int(self._offsets[row + 1] - self._offsets[row]),
+            int(self._offsets[row]),
+        )
+
+    def nbytes(self) -> int:
+        """Size of the mapped vectors, deleted rows included"""
+        return int(self.count * self.dimension * self.dtype.itemsize)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Repository Pattern - in-process vector index, one partition per projectName
+    Searches are exact top-k by matrix multiply over memory-mapped rows, or
+    approximate over the IVF lists of a partition when one has been built
+    and ivf_probes > 0. Scores are cosine similarities, BM25 scores in
+    "lexical" mode and reciprocal rank fusion scores in "hybrid" mode.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        embeddings: Embeddings | None = None,
+        dtype: str = "float32",
+        ivf_probes: int = 8,
+        retrieval_options: Callable[[str | None], RetrievalOptions] | None = None,
+        generations: CacheGenerations | None = None,
+    ):
+        """
+        Args:
+            directory: Root directory of the partitions
+            embeddings: Optional query embedding model (defaults to create_embeddings)
+            dtype: Row storage of new partitions, "float32" or "int8"
+            ivf_probes: Inverted lists scanned per query (0 always searches exactly)
+            retrieval_options: Retrieval options of a project (defaults to vector
+                search for every project)
+            generations: Optional write counters shared with other processes
+        """
+        super().__init__(generations)
+        self.directory = directory
+        self.embeddings = embeddings or create_embeddings(get_settings())
+        self.dtype = dtype
+        self.ivf_probes = ivf_probes
+        self.retrieval_options = retrieval_options or (lambda _: RetrievalOptions())
+        self.metrics = get_metrics()
+        self._partitions: dict[str, IndexPartition] = {}
+        # Searches run in worker threads, which may open partitions concurrently
+        self._partitions_lock = threading.Lock()
+        self._searches = SingleFlight()
+
+    def partition(self, project_name: str) -> IndexPartition:
+        """Returns the partition of a project, creating it lazily"""
+        with self._partitions_lock:
+            partition = self._partitions.get(project_name)
+            if partition is None:
+                slug = re.sub(r"[^A-Za-z0-9_.-]", "_", project_name)
+                partition = IndexPartition(
+                    os.path.join(self.directory, slug), project_name, dtype=self.dtype
+                )
+                self._partitions[project_name] = partition
+            return partition
+
+    def project_names(self) -> List[str]:
+        """Projects with a partition on disk"""
+        if not os.path.isdir(self.directory):
+            return []
+        names = []
+        for slug in sorted(os.listdir(self.directory)):
+            meta_path = os.path.join(self.directory, slug, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as meta_file:
+                    names.append(json.load(meta_file)["project_name"])
+        return names
+
+    async def add_documents(
+        self,
+        project_name: str,
+        documents: List[dict],
+        vectors: List[List[float]] | np.ndarray,
+    ) -> None:
+        """
+        Appends documents ({"id", "content", "type"}) and their embeddings to a project
+
+        Args:
+            project_name: Partition to write to
+            documents: Documents, in the same order as the vectors
+            vectors: Document embeddings
+        """
+        if len(documents) != len(vectors):
+            raise VectorStoreException("Each document needs exactly one vector")
+        if documents:
+            try:
+                # File writes and the flock wait stay off the event loop
+                await asyncio.to_thread(
+                    self.partition(project_name).append,
+                    documents,
+                    np.asarray(vectors, dtype=np.float32),
+                )
+            finally:
+                self.invalidate_cache(project_name)
+
+    async def delete_documents(self, project_name: str, ids: List[str]) -> None:
+        """
+        Deletes documents of a project by id
+
+        Args:
+            project_name: Partition to delete from
+            ids: Ids of the documents; unknown ids are ignored
+        """
+        if ids:
+            try:
+                await asyncio.to_thread(self.partition(project_name).delete, ids)
+            finally:
+                self.invalidate_cache(project_name)
+
+    def build_ivf(self, project_name: str, n_lists: int) -> None:
+        """Builds (or rebuilds) the approximate index of a project"""
+        self.partition(project_name).build_ivf(n_lists)
+
+    async def embed_query(self, query: str) -> List[float]:
+        try:
+            with self.metrics.upstream("openai", "embed_query"):
+                return await self.embeddings.aembed_query(query)
+        except ServiceOverloadedException:
+            raise
+        except Exception as e:
+            raise VectorStoreException(f"Error embedding query: {str(e)}")
+
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        try:
+            with self.metrics.upstream("openai", "embed_queries"):
+                return await self.embeddings.aembed_documents(queries)
+        except ServiceOverloadedException:
+            raise
+        except Exception as e:
+            raise VectorStoreException(f"Error embedding queries: {str(e)}")
+
+    async def similarity_search(
+        self, query: str, k: int = 5, project_name: str | None = None
+    ) -> List[RetrievedSection]:
+        """
+        Performs similarity search in the local index with optional project filter
+
+        Args:
+            query: User query
+            k: Number of documents to return
+            project_name: Optional project name; without one every partition is searched
+
+        Returns:
+            List of retrieved sections with score
+        """
+        key = (project_name, k, normalize_text(query))
+        sections = await self._searches.do(
+            key, lambda: self._search(query, k, project_name)
+        )
+        return list(sections)
+
+    async def similarity_search_many(
+        self, queries: List[str], k: int = 5, project_name: str | None = None
+    ) -> List[List[RetrievedSection]]:
+        """Embeds the queries in one batch; vector-only searches share one pass per partition"""
+        options = self.retrieval_options(project_name)
+        vectors: List[List[float] | None] = [None] * len(queries)
+        if options.mode != "lexical":
+            vectors = list(await self.embed_queries(queries))
+        try:
+            # The scans and reads stay off the event loop
+            if options.mode == "vector":
+                return await asyncio.to_thread(
+                    self.search_vectors, vectors, k, project_name  # type: ignore[arg-type]
+                )
+            return await asyncio.to_thread(
+                lambda: [
+                    self.search_hybrid(query, vector, k, project_name, options)
+                    for query, vector in zip(queries, vectors)
+                ]
+            )
+        except Exception as e:
+            raise VectorStoreException(f"Error in vector search: {str(e)}")
+
+    async def _search(
+        self, query: str, k: int, project_name: str | None
+    ) -> List[RetrievedSection]:
+        options = self.retrieval_options(project_name)
+        query_vector = None if options.mode == "lexical" else await self.embed_query(query)
+        try:
+            # The scans and reads stay off the event loop
+            if query_vector is not None and options.mode == "vector":
+                results = await asyncio.to_thread(
+                    self.search_vectors, [query_vector], k, project_name
+                )
+                return results[0]
+            return await asyncio.to_thread(
+                self.search_hybrid, query, query_vector, k, project_name, options
+            )
+        except Exception as e:
+            raise VectorStoreException(f"Error in vector search: {str(e)}")
+
+    def search_vectors(
+        self,
+        vectors: List[List[float]] | np.ndarray,
+        k: int = 5,
+        project_name: str | None = None,
+    ) -> List[List[RetrievedSection]]:
+        """Top-k sections for a batch of query embeddings, one pass per partition"""
+        queries = _normalize(np.asarray(vectors, dtype=np.float32))
+        names = [project_name] if project_name else self.project_names()
+
+        hits: List[List[tuple[float, dict, np.ndarray]]] = [[] for _ in queries]
+        for name in names:
+            partition = self.partition(name)
+            for i, results in enumerate(partition.search(queries, k, self.ivf_probes)):
+                hits[i].extend(results)
+
+        return [
+            [
+                _section(score, document, vector)
+                for score, document, vector in sorted(query_hits, key=lambda hit: -hit[0])[:k]
+            ]
+            for query_hits in hits
+        ]
+
+    def search_hybrid(
+        self,
+        query: str,
+        vector: List[float] | None,
+        k: int,
+        project_name: str | None,
+        options: RetrievalOptions,
+    ) -> List[RetrievedSection]:
+        """
+        Top-k sections fusing the vector and BM25 rankings of the candidates
+        Without a vector (the "lexical" mode) the BM25 ranking is returned as is.
+        """
+        n = max(k, options.candidates)
+        names = [project_name] if project_name else self.project_names()
+        vector_hits: List[tuple[float, str, dict, np.ndarray]] = []
+        lexical_hits: List[tuple[float, str, dict, np.ndarray]] = []
+        for name in names:
+            partition = self.partition(name)
+            if vector is not None:
+                queries = _normalize(np.asarray([vector], dtype=np.float32))
+                vector_hits.extend(
+                    (score, name, document, embedding)
+                    for score, document, embedding in partition.search(queries, n, self.ivf_probes)[0]
+                )
+            lexical_hits.extend(
+                (score, name, document, embedding)
+                for score, document, embedding in partition.lexical_search([query], n)[0]
+            )
+
+        if vector is None:
+            return [
+                _section(score, document, embedding)
+                for score, _, document, embedding in sorted(lexical_hits, key=lambda hit: -hit[0])[:k]
+            ]
+
+        documents: dict[tuple[str, str], tuple[dict, np.ndarray]] = {}
+        rankings = []
+        for hits in (vector_hits, lexical_hits):
+            ranking = []
+            for _, name, document, embedding in sorted(hits, key=lambda hit: -hit[0])[:n]:
+                documents[(name, document["id"])] = (document, embedding)
+                ranking.append((name, document["id"]))
+            rankings.append(ranking)
+        fused = reciprocal_rank_fusion(
+            rankings, [options.vector_weight, options.lexical_weight], options.rrf_k
+        )
+        return [_section(score, *documents[key]) for key, score in fused[:k]]
+
+    def stats(self) -> dict[str, Any]:
+        """Index size, search coalescing and embedding counters"""
+        partitions = [self.partition(name) for name in self.project_names()]
+        for partition in partitions:
+            partition.refresh()
+        return {
+            "local_index": {
+                "partitions": len(partitions),
+                "vectors": sum(p.live for p in partitions),
+                "deleted": sum(p.deleted for p in partitions),
+                "bytes": sum(p.nbytes() for p in partitions),
+            },
+            **embedding_stats(self.embeddings),
+            "search_coalescing": self._searches.stats(),
+        }
+
+
+def _section(score: float, document: dict, vector: np.ndarray) -> RetrievedSection:
+    return RetrievedSection(
+        score=score, content=document.get("content", ""), embedding=vector.tolist()
+    )
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return (vectors / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+
+def _quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-row int8 quantization"""
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, k: int) -> List[tuple[int, float]]:
+    if len(scores) > k:
+        best = np.argpartition(-scores, k)[:k]
+    else:
+        best = np.arange(len(scores))
+    best = best[np.argsort(-scores[best])]
+    return [(int(rows[i]), float(scores[i])) for i in best]